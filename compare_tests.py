@@ -0,0 +1,148 @@
+#!/usr/bin/python
+""" Benchmark Results Comparator
+
+Licensed under the terms of the GNU GPL License version 2
+
+Compare two data files of sched_test.py, e.g. a CFS and a CBS run of the same
+test, or the same test on two kernel builds. For each number of instances
+tested by both, the average task time, run time and context switches of the
+new results (B) are compared with the reference ones (A), reporting their
+relative delta and its significance by Welch's t-test, computed from the
+moments stored into the data files. If both tests kept their raw samples
+(i.e. sched_test.py --keep-raw), the Mann-Whitney U test of the samples is
+used instead, which does not assume the metrics to be normally distributed.
+
+A metric regresses when it increases by more than the threshold and the
+increase is significant, i.e. its p-value is below alpha. The exit status is
+1 if any regression is found, thus the comparison can gate a kernel build.
+
+Usage: compare_tests.py [-t THRESHOLD] [-a ALPHA] A.dat B.dat
+
+  -t, --threshold  the relative increase of a metric which is a regression,
+                   in percent (default: 5)
+  -a, --alpha      the significance level (default: 0.01)
+"""
+
+import os
+import sys
+import getopt
+import stats
+import raw_samples
+from results_db import parse_test
+
+# The compared metrics, all of them being better when lower
+METRICS = (
+    ("tt",   "Task time"),
+    ("rt",   "Run time"),
+    ("ctxf", "Forced ctx switches"),
+    ("ctxv", "Voluntary ctx switches"),
+)
+
+# The regression threshold [%] and the significance level
+conf_thrs = 5.0
+conf_alpa = 0.01
+
+def load_rows(fname):
+    """Get the rows of a data file, by number of instances"""
+    (meta, names, rows) = parse_test(fname)
+    return (dict((row[0], dict(zip(names, row))) for row in rows), meta)
+
+def moments(row, metric, meta):
+    """Get the count, mean and sample variance of a metric of a row
+
+    The run time has a sample per run, other metrics one per instance and
+    run; rows not reporting their runs were measured on all the runs."""
+    runs = row.get("runs", meta.get("runs") or 0)
+    count = runs if metric == "rt" else runs * row["instances"]
+    var = row[metric + "_var"]
+    if (count > 1):
+        var *= float(count) / (count - 1)
+    return (count, row[metric + "_avg"], var)
+
+def load_raw(fname):
+    """Get the raw samples of a data file, None if not kept"""
+    if not os.path.isfile(raw_samples.raw_path(fname)):
+        return None
+    return raw_samples.load(raw_samples.raw_path(fname))
+
+def compare(fname_a, fname_b, threshold=conf_thrs, alpha=conf_alpa):
+    """Compare two data files, returning the report lines and regressions"""
+    (rows_a, meta_a) = load_rows(fname_a)
+    (rows_b, meta_b) = load_rows(fname_b)
+    (raw_a, raw_b) = (load_raw(fname_a), load_raw(fname_b))
+
+    lines = [
+        "# A: %s (%s, %s)\n" % (fname_a, meta_a.get("label"), meta_a.get("scheduler")),
+        "# B: %s (%s, %s)\n" % (fname_b, meta_b.get("label"), meta_b.get("scheduler")),
+        "# %5s %-22s %14s %14s %9s %5s %8s %8s\n" % (
+            "Insts", "Metric", "A", "B", "Delta[%]", "Test", "t/z", "p"),
+    ]
+    regressions = 0
+    for insts in sorted(set(rows_a) & set(rows_b)):
+        for (metric, name) in METRICS:
+            (count_a, mean_a, var_a) = moments(rows_a[insts], metric, meta_a)
+            (count_b, mean_b, var_b) = moments(rows_b[insts], metric, meta_b)
+            if (raw_a is not None and raw_b is not None):
+                (u, t, p) = stats.mann_whitney(
+                        raw_samples.samples(raw_a, insts, metric),
+                        raw_samples.samples(raw_b, insts, metric))
+                test = "mw"
+            else:
+                (t, df, p) = stats.welch_test(count_a, mean_a, var_a, count_b, mean_b, var_b)
+                test = "welch"
+            delta = 100.0 * (mean_b - mean_a) / mean_a if mean_a else 0.0
+            flag = ""
+            if (p < alpha and delta > threshold):
+                flag = " REGRESSION"
+                regressions += 1
+            elif (p < alpha and delta < -threshold):
+                flag = " improved"
+            lines.append("%7d %-22s %14.6f %14.6f %+9.2f %5s %8.2f %8.4f%s\n" % (
+                insts, name, mean_a, mean_b, delta, test, t, p, flag))
+    return (lines, regressions)
+
+################################################################################
+#   Main
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    global conf_thrs
+    global conf_alpa
+
+    if argv is None:
+        argv = sys.argv
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "a:ht:", ["alpha=", "help", "threshold="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-t", "--threshold"):
+                conf_thrs = float(a)
+            if o in ("-a", "--alpha"):
+                conf_alpa = float(a)
+        if len(args) != 2:
+            raise Usage("two data files are required")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    (lines, regressions) = compare(args[0], args[1], conf_thrs, conf_alpa)
+    sys.stdout.writelines(lines)
+    if regressions:
+        sys.stdout.write("# %d regressions beyond %.1f%% (p < %g)\n" % (
+            regressions, conf_thrs, conf_alpa))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
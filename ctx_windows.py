@@ -0,0 +1,160 @@
+#!/usr/bin/python
+""" Windowed Context Switches Analysis
+
+Licensed under the terms of the GNU GPL License version 2
+
+Count the context switches of each CPU in fixed time windows, from the
+latency table (whose records match 1:1 with the sched_switch events), rather
+than reducing them into a single average rate per CPU, which hides the
+bursts of thrashing within a long test.
+
+The table is read in chunks of a bounded number of rows, each chunk being
+binned by a single bincount over (window x CPU), thus tables of any length
+are processed in bounded memory, but the time x CPU counts matrix.
+
+The matrix is dumped as a table, with the start time of each window and the
+count of each CPU into a "Cnn" column, e.g.
+    cbs_table_TAG_Call_ctxwindows.dat
+while the statistics of the windows of each CPU (and of all CPUs, reported
+as CPU 9999) are reported to the standard output: the mean rate, its
+standard deviation, the peak rate and the time of its window.
+
+Usage: ctx_windows.py [-w WINDOW] [-c CHUNK] LATENCIES OUTPUT
+
+  -w, --window  the windows length [s] (default: 0.1)
+  -c, --chunk   the rows read per chunk (default: 1000000)
+"""
+
+import sys
+import getopt
+import numpy as np
+import trace_tables
+
+# The CPU id of the statistics of all the CPUs
+CPU_ALL = 9999
+
+class CtxWindows():
+    def __init__(self, window=0.1):
+        self.window = window
+        self.start = None
+        self.counts = np.zeros((0, 0), np.int64)
+
+    def add(self, times, cpus):
+        """Add the (timestamps [s], CPUs) of a set of context switches"""
+        if not len(times):
+            return
+        if self.start is None:
+            # Windows are aligned to multiples of their length
+            self.start = np.floor(times[0] / self.window) * self.window
+        index = np.floor((times - self.start) / self.window).astype(np.int64)
+        index = np.maximum(index, 0)
+        cpus = np.asarray(cpus, np.int64)
+        shape = (max(self.counts.shape[0], index.max() + 1),
+                 max(self.counts.shape[1], cpus.max() + 1))
+        if (shape != self.counts.shape):
+            counts = np.zeros(shape, np.int64)
+            counts[:self.counts.shape[0], :self.counts.shape[1]] = self.counts
+            self.counts = counts
+        self.counts += np.bincount(index * shape[1] + cpus,
+                minlength=shape[0] * shape[1]).reshape(shape)
+
+    def times(self):
+        """Get the start time of each window [s]"""
+        return (self.start or 0.0) + self.window * np.arange(self.counts.shape[0])
+
+    def peaks(self):
+        """Get the (cpu, count, mean, std, peak, peak time) rates [ctx/s] of
+        the windows of each CPU, and of all of them
+
+        The windows considered for each CPU are the ones from its first to its
+        last context switch."""
+        times = self.times()
+        result = []
+        columns = [(cpu, self.counts[:, cpu]) for cpu in range(self.counts.shape[1])]
+        columns.append((CPU_ALL, self.counts.sum(axis=1)))
+        for (cpu, counts) in columns:
+            active = np.nonzero(counts)[0]
+            if not len(active):
+                continue
+            rates = counts[active[0]:active[-1] + 1] / self.window
+            peak = rates.argmax()
+            result.append((cpu, counts.sum(), rates.mean(), rates.std(),
+                rates[peak], times[active[0] + peak]))
+        return result
+
+    def dump(self, fname):
+        """Dump the counts matrix, as text and columnar table"""
+        names = ["Time"] + ["C%02d" % cpu for cpu in range(self.counts.shape[1])]
+        arrays = {"Time": self.times()}
+        for (cpu, name) in enumerate(names[1:]):
+            arrays[name] = np.ascontiguousarray(self.counts[:, cpu])
+        with open(fname, "w") as fout:
+            fout.write("# Context Switches per %.3f [s] window\n" % self.window)
+            fout.write("# %12s" % "Time[s]" + "".join(" %8s" % n for n in names[1:]) + "\n")
+            for (time, row) in zip(arrays["Time"], self.counts):
+                fout.write("%14.6f" % time + "".join(" %8d" % c for c in row) + "\n")
+        trace_tables.write_columnar(trace_tables.columnar_path(fname),
+                "ctxwindows", names, arrays)
+
+    def report(self):
+        lines = ["# Context Switches Windows Analysis (%.3f [s] windows)\n" % self.window,
+                 "# %5s %13s %13s %13s %13s %13s\n" % (
+                     "CPU", "Count", "Rate[Ctx/s]", "Std[Ctx/s]", "Peak[Ctx/s]", "PeakTime[s]")]
+        if not self.counts.size:
+            lines.append("# No sched_switch data\n")
+        for (cpu, count, mean, std, peak, time) in self.peaks():
+            lines.append("%7d %13d %13.1f %13.1f %13.1f %13.6f\n" % (
+                cpu, count, mean, std, peak, time))
+        return lines
+
+def load(fname, window=0.1, chunk=1000000):
+    """Count the context switches of a latency table, in chunks"""
+    windows = CtxWindows(window)
+    for (columns, dicts) in trace_tables.read_chunks(fname, "latencies",
+            ("Time", "CPU"), chunk):
+        windows.add(columns["Time"], columns["CPU"])
+    return windows
+
+################################################################################
+#   Main
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    window = 0.1
+    chunk = 1000000
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "c:hw:", ["chunk=", "help", "window="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-c", "--chunk"):
+                chunk = int(a)
+            if o in ("-w", "--window"):
+                window = float(a)
+        if len(args) != 2:
+            raise Usage("the latency table and the output table are required")
+        if (window <= 0 or chunk <= 0):
+            raise Usage("the window and the chunk must be positive")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    windows = load(args[0], window, chunk)
+    windows.dump(args[1])
+    sys.stdout.writelines(windows.report())
+    return 0 if windows.counts.size else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
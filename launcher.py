@@ -0,0 +1,344 @@
+""" Barrier-Synchronized Instances Launcher
+
+Licensed under the terms of the GNU GPL License version 2
+
+Starting the instances of a test one after the other, each by a chain of
+helper execs, delays the start of the last one by tens of milliseconds.
+Instead, the Launcher forks all the instances upfront and keeps each of them
+blocked on a barrier, i.e. reading a pipe whose write end is held only by the
+launcher. Closing that write end wakes up all the instances at once: each one
+records its start time, reports it back on a shared pipe, and then execs its
+command.
+
+The start skew, i.e. the time between the first and the last instance start,
+is thus reduced to the wake-up latency of the blocked instances, and it is
+reported alongside the results.
+
+Instances can also be spawned directly, without helper execs: the CPU
+affinity and the scheduling policy (e.g. the CBS one, via sched_setattr) are
+set by the forked instance itself before blocking on the barrier, and the
+resources used by each instance are collected by wait4 once it exits.
+
+Optionally, the scheduling statistics of each instance (/proc/<pid>/schedstat
+and /proc/<pid>/sched) are collected too: an exited instance is first waited
+for by waitid(WNOWAIT), which leaves it a zombie whose statistics are still
+readable, and reaped just after. This gives the run-queue wait time, CPU
+time and timeslices of each instance from any kernel, without tracing.
+
+The instances are forked into a process group of their own, which is the one
+waited for: other children of the caller, e.g. a sampler running alongside
+the test, are neither reaped nor waited for by the launcher.
+"""
+
+import os
+import sys
+import time
+import fcntl
+import errno
+import signal
+import ctypes
+import ctypes.util
+import platform
+
+################################################################################
+### Scheduling Setup
+################################################################################
+
+# Scheduling policies, the CBS one as defined by the CBS patched kernel
+SCHED_NORMAL = 0
+SCHED_CBS    = 6
+
+# The sched_setattr syscall number of each architecture
+NR_SCHED_SETATTR = {
+    "x86_64":  314,
+    "i386":    351,
+    "i686":    351,
+    "armv7l":  380,
+    "aarch64": 274,
+}
+
+# The size of the CPUs mask of the affinity syscalls (glibc's cpu_set_t)
+CPU_SETSIZE = 1024
+
+class SchedAttr(ctypes.Structure):
+    _fields_ = [
+        ("size",           ctypes.c_uint32),
+        ("sched_policy",   ctypes.c_uint32),
+        ("sched_flags",    ctypes.c_uint64),
+        ("sched_nice",     ctypes.c_int32),
+        ("sched_priority", ctypes.c_uint32),
+        ("sched_runtime",  ctypes.c_uint64),
+        ("sched_deadline", ctypes.c_uint64),
+        ("sched_period",   ctypes.c_uint64),
+    ]
+
+libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+# The waitid arguments, for Python versions lacking os.waitid
+P_PGID  = 2
+WEXITED = 0x00000004
+WNOWAIT = 0x01000000
+
+class SigChld(ctypes.Structure):
+    _fields_ = [
+        ("si_pid",    ctypes.c_int),
+        ("si_uid",    ctypes.c_uint),
+        ("si_status", ctypes.c_int),
+        ("si_utime",  ctypes.c_long),
+        ("si_stime",  ctypes.c_long),
+    ]
+
+class SigInfoFields(ctypes.Union):
+    _fields_ = [
+        ("sigchld", SigChld),
+        ("pad",     ctypes.c_int * 28),
+    ]
+
+class SigInfo(ctypes.Structure):
+    _fields_ = [
+        ("si_signo", ctypes.c_int),
+        ("si_errno", ctypes.c_int),
+        ("si_code",  ctypes.c_int),
+        ("fields",   SigInfoFields),
+    ]
+
+def wait_exited(pgid):
+    """Wait for any child of a process group to exit, without reaping it,
+    returning its pid"""
+    if hasattr(os, "waitid"):
+        return os.waitid(os.P_PGID, pgid, os.WEXITED | os.WNOWAIT).si_pid
+    info = SigInfo()
+    if libc.waitid(P_PGID, pgid, ctypes.byref(info), WEXITED | WNOWAIT) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, "waitid: " + os.strerror(err))
+    return info.fields.sigchld.si_pid
+
+def read_schedstat(pid):
+    """Get the scheduling statistics of a task
+
+    Returns the CPU time and run-queue wait time [s], the number of
+    timeslices and of migrations, or None if the task is gone."""
+    try:
+        with open("/proc/%d/schedstat" % pid) as fin:
+            (cpu, delay, slices) = [int(v) for v in fin.read().split()[:3]]
+        migrations = 0
+        with open("/proc/%d/sched" % pid) as fin:
+            for line in fin:
+                if line.startswith("se.nr_migrations"):
+                    migrations = int(line.split(":")[1])
+    except (IOError, OSError, ValueError):
+        return None
+    return {
+        "cpu":        cpu * 1e-9,
+        "delay":      delay * 1e-9,
+        "slices":     slices,
+        "migrations": migrations,
+    }
+
+def parse_cpus(cpus):
+    """Get the list of CPUs of a taskset-like list, e.g. "0-3,6" """
+    result = []
+    for item in str(cpus).split(","):
+        if not item.strip():
+            continue
+        bounds = [int(b) for b in item.split("-")]
+        result.extend(range(bounds[0], bounds[-1] + 1))
+    return result
+
+def set_affinity(cpus, pid=0):
+    """Set the CPU affinity of a task to a list of CPUs"""
+    mask = (ctypes.c_ulong * (CPU_SETSIZE // (8 * ctypes.sizeof(ctypes.c_ulong))))()
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    for cpu in cpus:
+        mask[cpu // bits] |= 1 << (cpu % bits)
+    if libc.sched_setaffinity(pid, ctypes.sizeof(mask), ctypes.byref(mask)) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, "sched_setaffinity: " + os.strerror(err))
+
+def set_policy(policy, priority=0, pid=0):
+    """Set the scheduling policy of a task, by sched_setattr if available"""
+    nr = NR_SCHED_SETATTR.get(platform.machine())
+    if nr is not None:
+        attr = SchedAttr(size=ctypes.sizeof(SchedAttr),
+                sched_policy=policy, sched_priority=priority)
+        if libc.syscall(nr, pid, ctypes.byref(attr), 0) == 0:
+            return
+        err = ctypes.get_errno()
+        if err != errno.ENOSYS:
+            raise OSError(err, "sched_setattr: " + os.strerror(err))
+    # Older kernels support only the policies known by sched_setscheduler
+    param = ctypes.c_int(priority)
+    if libc.sched_setscheduler(pid, policy, ctypes.byref(param)) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, "sched_setscheduler: " + os.strerror(err))
+
+################################################################################
+### Instances Launcher
+################################################################################
+
+def cloexec(fd):
+    """Mark a file descriptor to be closed on exec"""
+    fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+
+def cloexec_pipe():
+    (r, w) = os.pipe()
+    cloexec(r)
+    cloexec(w)
+    return (r, w)
+
+class Instance():
+    """A forked instance, with the pipes of its stdout and stderr"""
+    def __init__(self, pid, stdout, stderr):
+        self.pid = pid
+        self.stdout = os.fdopen(stdout, "r")
+        self.stderr = os.fdopen(stderr, "r")
+        self.start = None
+        self.end = None
+        self.rusage = None
+        self.schedstat = None
+        self.returncode = None
+
+    def exited(self, status, rusage):
+        self.end = time.time()
+        self.rusage = rusage
+        if os.WIFSIGNALED(status):
+            self.returncode = -os.WTERMSIG(status)
+        else:
+            self.returncode = os.WEXITSTATUS(status)
+
+    def wait(self):
+        """Wait for the instance to complete, returning its exit status"""
+        if self.returncode is None:
+            (pid, status, rusage) = os.wait4(self.pid, 0)
+            self.exited(status, rusage)
+        return self.returncode
+
+    def get_elapsed(self):
+        """Get the time from the instance start to its exit"""
+        return self.end - self.start
+
+class Launcher():
+    def __init__(self):
+        self.instances = []
+        self.release_time = None
+        # The process group of the instances, the pid of the first one
+        self.pgid = None
+        # The barrier, read by the instances until its write end is closed
+        (self.barrier_r, self.barrier_w) = cloexec_pipe()
+        # The instances start times, written by each instance once released
+        (self.starts_r, self.starts_w) = cloexec_pipe()
+
+    def add(self, command, cpus=None, policy=None):
+        """Fork an instance of a command, blocked until released
+
+        If required, the CPU affinity and the scheduling policy are set by
+        the instance itself, before blocking. The process group is set by
+        both the instance and the launcher, whichever runs first."""
+        (stdout_r, stdout_w) = cloexec_pipe()
+        (stderr_r, stderr_w) = cloexec_pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.dup2(stdout_w, 1)
+                os.dup2(stderr_w, 2)
+                os.close(self.barrier_w)
+
+                try:
+                    os.setpgid(0, self.pgid or 0)
+                    if cpus:
+                        set_affinity(cpus)
+                    if policy is not None:
+                        set_policy(policy)
+                except OSError as err:
+                    os.write(2, ("Spawn setup failed: %s\n" % err).encode())
+                    os._exit(126)
+
+                # Wait for the barrier to be released
+                while os.read(self.barrier_r, 1):
+                    pass
+                os.write(self.starts_w, ("%d %.9f\n" %
+                    (len(self.instances), time.time())).encode())
+
+                os.execvp(command[0], command)
+            finally:
+                os._exit(127)
+
+        if self.pgid is None:
+            self.pgid = pid
+        try:
+            os.setpgid(pid, self.pgid)
+        except OSError as err:
+            # The instance has already set it, and exec'd or exited
+            if err.errno not in (errno.EACCES, errno.ESRCH):
+                raise
+        os.close(stdout_w)
+        os.close(stderr_w)
+        instance = Instance(pid, stdout_r, stderr_r)
+        self.instances.append(instance)
+        return instance
+
+    def release(self):
+        """Release all the instances at once, returning the release time"""
+        os.close(self.barrier_r)
+        os.close(self.starts_w)
+        self.release_time = time.time()
+        os.close(self.barrier_w)
+
+        # Collect the start time of each instance, until all of them either
+        # reported it or exited without, e.g. if killed while blocked
+        data = b""
+        chunk = os.read(self.starts_r, 4096)
+        while chunk:
+            data += chunk
+            if data.count(b"\n") == len(self.instances):
+                break
+            chunk = os.read(self.starts_r, 4096)
+        os.close(self.starts_r)
+        for line in data.decode().split("\n")[:-1]:
+            (idx, start) = line.split()
+            self.instances[int(idx)].start = float(start)
+
+        return self.release_time
+
+    def wait_all(self, schedstat=False):
+        """Wait for all the instances to complete, in their exit order
+
+        Instances are reaped as soon as each of them exits, thus the exit
+        time of each one is known, whatever the order they complete in.
+        If required, the scheduling statistics of each instance are
+        collected before reaping it. Not being in the foreground process
+        group, the instances are interrupted by the launcher itself."""
+        running = dict((i.pid, i) for i in self.instances if i.returncode is None)
+        while running:
+            try:
+                pid = -self.pgid
+                if schedstat:
+                    pid = wait_exited(self.pgid)
+                    if pid in running:
+                        running[pid].schedstat = read_schedstat(pid)
+                (pid, status, rusage) = os.wait4(pid, 0)
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                raise
+            except KeyboardInterrupt:
+                os.killpg(self.pgid, signal.SIGINT)
+                raise
+            if pid in running:
+                running.pop(pid).exited(status, rusage)
+
+    def get_starts(self):
+        """Get the start times of the instances which reported it"""
+        return [i.start for i in self.instances if i.start is not None]
+
+    def get_skew(self):
+        """Get the time between the first and the last instance start"""
+        starts = self.get_starts()
+        if not starts:
+            return 0.0
+        return max(starts) - min(starts)
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,149 @@
+""" Task Migrations Analysis
+
+Licensed under the terms of the GNU GPL License version 2
+
+Analyze all the sched_migrate_task events of a trace at once, rather than the
+migrations in and out of each CPU from a dedicated pass, computing:
+- the source x destination CPUs matrix of the migrations count
+- the migrations count and rate of each task
+- the histogram of the intervals between consecutive migrations of each task
+  (and of all of them), reported by its percentiles
+- the tasks bouncing between the same pair of CPUs, i.e. migrated back to the
+  CPU they have just been migrated from, within a window
+All of them are computed by array operations on the event columns, the events
+being ordered by task (and time) just once.
+"""
+
+import numpy as np
+import stats
+
+# The intervals histograms resolution [ns]
+INTERVAL_UNIT = 1000
+
+# The maximum interval of the two migrations of a bounce [ns]
+BOUNCE_WINDOW = 10 * 1000 * 1000
+
+# The minimum number of bounces between the same CPUs to report a task
+BOUNCE_MIN = 2
+
+class Migrations():
+    def __init__(self, ts, pids, src, dst, cpus=None):
+        """Analyze the (timestamps, pids, source and destination CPUs) of a
+        set of migrations, in time order
+
+        Migrations within the same CPU are discarded. The CPUs are at least
+        the ones the migrations are from and to."""
+        keep = (src != dst)
+        self.ts   = np.asarray(ts[keep], np.int64)
+        self.pids = np.asarray(pids[keep], np.int64)
+        self.src  = np.asarray(src[keep], np.int64)
+        self.dst  = np.asarray(dst[keep], np.int64)
+        if len(self.ts):
+            cpus = max(cpus or 0, int(max(self.src.max(), self.dst.max())) + 1)
+        self.cpus = cpus or 0
+        self.span = float(self.ts[-1] - self.ts[0]) / 1e9 if len(self.ts) else 0.0
+
+        # The migrations of each task, in time order
+        order = np.lexsort((self.ts, self.pids))
+        (self.tasks, self.counts) = np.unique(self.pids[order], return_counts=True)
+        self.order = order
+        self.group = np.repeat(np.arange(len(self.tasks)), self.counts)
+        # Consecutive migrations of the same task
+        self.follows = np.zeros(len(order), bool)
+        self.follows[1:] = (self.group[1:] == self.group[:-1])
+
+    def matrix(self):
+        """Get the cpus x cpus matrix of the migrations count"""
+        return np.bincount(self.src * self.cpus + self.dst,
+                minlength=self.cpus * self.cpus).reshape(self.cpus, self.cpus)
+
+    def rates(self):
+        """Get the migrations rate of each task [1/s], over the whole span"""
+        if not self.span:
+            return np.zeros(len(self.tasks))
+        return self.counts / self.span
+
+    def intervals(self):
+        """Get the (task group, interval [ns]) of the consecutive migrations"""
+        ts = self.ts[self.order]
+        delta = np.zeros(len(ts), np.int64)
+        delta[1:] = ts[1:] - ts[:-1]
+        return (self.group[self.follows], delta[self.follows])
+
+    def histograms(self):
+        """Get the (histogram of all tasks, percentiles of each task) of the
+        intervals between migrations
+
+        The percentiles of each task are a tasks x (PERCENTILES+1) matrix,
+        computed from the histograms of all the tasks at once."""
+        hist = stats.LogHistogram(INTERVAL_UNIT)
+        (group, delta) = self.intervals()
+        hist.add(delta)
+        if not len(delta):
+            return (hist, np.zeros((len(self.tasks), len(stats.PERCENTILES) + 1)))
+        buckets = len(hist.counts)
+        counts = np.bincount(group * buckets + hist.index(delta),
+                minlength=len(self.tasks) * buckets).reshape(len(self.tasks), buckets)
+        smax = np.zeros(len(self.tasks))
+        np.maximum.at(smax, group, delta)
+        percentiles = hist.percentiles_of(counts, smax)
+        # Tasks migrated just once have no intervals
+        percentiles[self.counts < 2] = 0
+        return (hist, percentiles)
+
+    def bounces(self, window=BOUNCE_WINDOW, minimum=BOUNCE_MIN):
+        """Get the (task, cpu_a, cpu_b, count) of the tasks bouncing between
+        the same pair of CPUs (cpu_a < cpu_b) at least minimum times
+
+        A bounce is a migration back to the CPU a task has just been migrated
+        from, within the window since that migration."""
+        (ts, src, dst) = (self.ts[self.order], self.src[self.order], self.dst[self.order])
+        back = self.follows.copy()
+        back[1:] &= (src[1:] == dst[:-1]) & (dst[1:] == src[:-1])
+        back[1:] &= (ts[1:] - ts[:-1] <= window)
+        (low, high) = (np.minimum(src, dst)[back], np.maximum(src, dst)[back])
+        keys = (self.group[back] * self.cpus + low) * self.cpus + high
+        (keys, counts) = np.unique(keys, return_counts=True)
+        keep = (counts >= minimum)
+        (keys, counts) = (keys[keep], counts[keep])
+        return list(zip(self.tasks[keys // (self.cpus * self.cpus)],
+                (keys // self.cpus) % self.cpus, keys % self.cpus, counts))
+
+    def report(self, labels=None, window=BOUNCE_WINDOW):
+        """Get the lines of the analysis report, tasks being labeled by a
+        {pid: label} dictionary"""
+        labels = labels or {}
+        label = lambda pid: labels.get(pid, "%d" % pid)
+        lines = ["# Task Migrations Analysis\n",
+                 "# %d migrations of %d tasks across %d CPUs in %.6f [s]\n" % (
+                     len(self.ts), len(self.tasks), self.cpus, self.span)]
+        if not len(self.ts):
+            return lines
+
+        lines.append("#\n# Migrations Matrix (Src x Dst)\n")
+        lines.append("# Src " + "".join(" %8s" % ("C%02d" % c) for c in range(self.cpus)) + "\n")
+        for (cpu, row) in enumerate(self.matrix()):
+            lines.append("  C%02d " % cpu + "".join(" %8d" % n for n in row) + "\n")
+
+        (hist, percentiles) = self.histograms()
+        names = ["P%g" % p for p in stats.PERCENTILES] + ["Max"]
+        lines.append("#\n# Tasks Migrations, intervals percentiles [us]\n")
+        lines.append("# %23s %8s %10s" % ("Task", "Count", "Rate[1/s]") +
+                "".join(" %10s" % n for n in names) + "\n")
+        rates = self.rates()
+        for (i, pid) in enumerate(self.tasks):
+            lines.append("%25s %8d %10.3f" % (label(pid), self.counts[i], rates[i]) +
+                    "".join(" %10.1f" % (v / 1e3) for v in percentiles[i]) + "\n")
+        lines.append("%25s %8d %10.3f" % ("all", len(self.ts), len(self.ts) / self.span
+                    if self.span else 0.0) +
+                "".join(" %10.1f" % (v / 1e3) for v in hist.get_percentiles()) + "\n")
+
+        bounces = self.bounces(window)
+        lines.append("#\n# Tasks bouncing between the same CPUs (within %.3f [ms])\n" % (
+            window / 1e6))
+        lines.append("# %23s %5s %5s %8s\n" % ("Task", "CPU", "CPU", "Bounces"))
+        for (pid, cpu_a, cpu_b, count) in bounces:
+            lines.append("%25s   C%02d   C%02d %8d\n" % (label(pid), cpu_a, cpu_b, count))
+        return lines
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -1,15 +1,35 @@
 #!/usr/bin/python
+"""
+Plot the tables dumped by dump_tables.sh from the current folder.
+
+Each table file, and each view of the latency tables, is plotted by an
+independent job; jobs are spread across a pool of worker processes.
+The plots of a job are cached by trace_cache, keyed on the content of its
+tables, and restored as long as these are unchanged.
+
+Usage: plot_tables.py [-j JOBS] [-s]
+
+  -j, --jobs    number of worker processes (default: one per CPU)
+  -s, --stream  stream latency tables in chunks, with bounded memory
+"""
 
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gs
 import matplotlib as mpl
+from matplotlib.backends.backend_pdf import PdfPages
 import string
-import math
 import glob
 import sys
+import os
 import re
 import gc
+import getopt
+import multiprocessing
+import traceback
+import trace_tables
+import trace_cache
+import stats
 
 ################################################################################
 #  Configuration
@@ -21,65 +41,294 @@ show_plot = 0
 # Plots font size
 fsize = 10
 
-################################################################################
-#   Statistics Accumulator
-################################################################################
-class Stats():
-    def __init__(self):
-        self.ssum   = .0
-        self.ssum2  = .0
-        self.scount =  0
-
-    def do_stats(self):
-        self.savg = (self.ssum  / self.scount)
-        self.svar = (self.ssum2 / self.scount) - (self.savg * self.savg)
-        self.sstd = (math.sqrt(self.svar))
-        self.sste = (self.sstd / math.sqrt(self.scount))
-        self.sc95 = (1.96 * self.sste)
-        self.sc99 = (2.58 * self.sste)
-
-    def set_data(self, ssum, ssum2, scount):
-        self.ssum   = ssum
-        self.ssum2  = ssum2
-        self.scount = scount
-        self.do_stats()
-
-    def add_sample(self, sample):
-        self.ssum   += sample
-        self.ssum2  += (sample * sample)
-        self.scount += 1
+# Rows of plots on each page of the per task and per CPU figures
+page_rows = 5
 
-    def get_count(self):
-        return self.scount
+# 1: stream latency tables in chunks, with memory bounded regardless of their
+# length, 0: load latency tables at once
+stream_tables = 0
 
-    def get_avg(self):
-        return self.savg
+# Rows loaded per chunk, and samples kept per task/CPU for plotting, by the
+# latency tables streaming mode
+stream_chunk = 1000000
+stream_samples = 2000
 
-    def get_var(self):
-        return self.svar
+# Worker processes plotting jobs in parallel, 0: one per available CPU
+plot_jobs = 0
 
-    def get_std(self):
-        return self.std
+# Time buckets each scatter plot series is decimated to, keeping the min and
+# the max sample of each bucket, 0: plot all the samples
+plot_points = 2000
 
-    def get_ste(self):
-        return self.ste
-
-    def get_c95(self):
-        return self.sc95
+################################################################################
+#   Tables Access Utilities
+################################################################################
+def group_keys(table, column):
+    """Get the (labels, inverse) of the groups of a table column values
+
+    The inverse maps each row into the index of its group label."""
+    if column in table.dicts:
+        # Interned strings codes are already dense group indexes
+        return (table.strings(column), np.asarray(table[column]))
+    (keys, inverse) = np.unique(np.asarray(table[column]), return_inverse=True)
+    return ([str(k) for k in keys], inverse)
+
+def group_rows(keys, inverse):
+    """Get the indexes of the rows of each group, in table order"""
+    # Sorting on a (group, row) key keeps rows order, faster than a mergesort
+    order = np.argsort((inverse.astype(np.int64) << 32) |
+            np.arange(len(inverse), dtype=np.int64))
+    bounds = np.searchsorted(inverse[order], np.arange(len(keys)+1))
+    return dict((keys[i], order[bounds[i]:bounds[i+1]])
+            for i in range(len(keys)) if bounds[i] < bounds[i+1])
+
+def group_moments(inverse, values, groups):
+    """Get the (count, mean, M2) of the samples of each group
+
+    M2 is the sum of the squared deviations from the group mean, see
+    stats.Stats, which is computed on the deviations for numerical
+    stability."""
+    samples = np.asarray(values, dtype=np.float64)
+    count = np.bincount(inverse, minlength=groups)
+    mean = np.bincount(inverse, samples, groups) / np.maximum(count, 1)
+    dev = samples - mean[inverse]
+    m2 = np.bincount(inverse, dev * dev, groups)
+    return (count, mean, m2)
+
+def moments_stats(keys, count, mean, m2):
+    """Get the stats.Stats.get_stats() tuples of each group with samples"""
+    valid = np.flatnonzero(count > 0)
+    count = count[valid]
+    avg = mean[valid]
+    var = m2[valid] / count
+    std = np.sqrt(var)
+    ste = std / np.sqrt(count)
+    stats = zip(count, avg, var, std, ste, 1.96 * ste, 2.58 * ste)
+    return dict((keys[g], stats[i]) for (i, g) in enumerate(valid))
+
+def group_stats(keys, inverse, values):
+    """Get the statistics of the samples of each group, in a single pass
+
+    Returns the same (count, avg, var, std, ste, c95, c99) tuples of
+    stats.Stats.get_stats(), for each group with samples."""
+    return moments_stats(keys, *group_moments(inverse, values, len(keys)))
+
+class GroupMoments():
+    """Mergeable (count, mean, M2) accumulators of a set of groups"""
+    def __init__(self):
+        self.count = np.zeros(0, np.int64)
+        self.mean  = np.zeros(0)
+        self.m2    = np.zeros(0)
+
+    def grow(self, groups):
+        grow = groups - len(self.count)
+        if grow <= 0:
+            return
+        self.count = np.concatenate((self.count, np.zeros(grow, np.int64)))
+        self.mean  = np.concatenate((self.mean,  np.zeros(grow)))
+        self.m2    = np.concatenate((self.m2,    np.zeros(grow)))
+
+    def merge(self, count, mean, m2):
+        """Merge the moments of other samples of the same groups"""
+        self.grow(len(count))
+        n = len(count)
+        # Pairwise update, exact for any chunking of the samples
+        (self.count[:n], self.mean[:n], self.m2[:n]) = stats.merge_moments(
+                self.count[:n], self.mean[:n], self.m2[:n], count, mean, m2)
+
+    def add(self, inverse, values):
+        if len(inverse):
+            self.merge(*group_moments(inverse, values, inverse.max()+1))
+
+    def get_stats(self, keys):
+        return moments_stats(keys, self.count, self.mean, self.m2)
+
+class GroupHistogram():
+    """Mergeable log-bucketed histograms (see stats.LogHistogram) of a set of groups"""
+    def __init__(self):
+        self.hist   = stats.LogHistogram()
+        self.counts = np.zeros((0, 0), np.int64)
+        self.smax   = np.zeros(0)
+
+    def add(self, inverse, values):
+        if not len(inverse):
+            return
+        values = np.asarray(values)
+        index = self.hist.index(values)
+
+        # Count samples on a (group, bucket) key, grown to fit both old and new
+        (old_groups, old_buckets) = self.counts.shape
+        groups  = max(old_groups,  inverse.max() + 1)
+        buckets = max(old_buckets, index.max() + 1)
+        counts = np.bincount(inverse.astype(np.int64) * buckets + index,
+                minlength=groups * buckets).reshape(groups, buckets)
+        counts[:old_groups, :old_buckets] += self.counts
+
+        # The maximum of a group can only be in its highest bucket
+        top = buckets - 1 - np.argmax(counts[:, ::-1] > 0, axis=1)
+        rows = np.flatnonzero(index == top[inverse])
+        smax = np.zeros(groups)
+        smax[:old_groups] = self.smax
+        np.maximum.at(smax, inverse[rows], values[rows])
+
+        (self.counts, self.smax) = (counts, smax)
+
+    def get_stats(self, keys):
+        """Get the (p50, p90, p99, p99.9, max) tuples of each group with samples"""
+        valid = np.flatnonzero(self.counts.sum(axis=1) > 0)
+        pcts = self.hist.percentiles_of(self.counts[valid], self.smax[valid])
+        return dict((keys[g], tuple(pcts[i])) for (i, g) in enumerate(valid))
+
+def group_percentiles(keys, inverse, values):
+    """Get the percentiles of the samples of each group"""
+    hist = GroupHistogram()
+    hist.add(inverse, values)
+    return hist.get_stats(keys)
+
+def join_stats(moments, percentiles):
+    """Join the moments and the percentiles tuples of each group"""
+    return dict((k, moments[k] + percentiles[k]) for k in moments)
+
+class GroupSample():
+    """Bounded, time ordered, decimated sample of the rows of a set of groups
+
+    Each group keeps the rows whose ordinal is a multiple of its stride, the
+    stride being doubled (and every other row dropped) each time the sample
+    grows bigger than its size."""
+    def __init__(self, size):
+        self.size    = size
+        self.seen    = {}
+        self.stride  = {}
+        self.samples = {}
+
+    def add(self, inverse, columns):
+        order = group_rows(range(inverse.max()+1), inverse) if len(inverse) else {}
+        for (group, rows) in order.items():
+            seen   = self.seen.get(group, 0)
+            stride = self.stride.get(group, 1)
+            keep = rows[(seen + np.arange(len(rows))) % stride == 0]
+            sample = [np.concatenate((old, np.asarray(new)[keep]))
+                    for (old, new) in zip(
+                        self.samples.get(group, [np.zeros(0)] * len(columns)),
+                        columns)]
+            while len(sample[0]) > self.size:
+                sample = [c[::2] for c in sample]
+                stride *= 2
+            self.seen[group]    = seen + len(rows)
+            self.stride[group]  = stride
+            self.samples[group] = sample
+
+def rows_stats(values, rows=slice(None)):
+    """Get the statistics of the samples of a set of rows"""
+    rows_stats = stats.Stats()
+    rows_stats.add(values[rows])
+    return rows_stats
+
+def decimate(x, y, buckets=None):
+    """Reduce a series to the min and max samples of each of its x buckets"""
+    if buckets is None:
+        buckets = plot_points
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if (buckets <= 0 or len(x) <= 2 * buckets):
+        return (x, y)
+
+    # Bucket of each sample, evenly spaced over the x range
+    (x_min, x_max) = (x.min(), x.max())
+    if (x_max > x_min):
+        bucket = ((x - x_min) * (buckets / float(x_max - x_min))).astype(np.int64)
+        np.minimum(bucket, buckets - 1, out=bucket)
+    else:
+        bucket = np.zeros(len(x), np.int64)
 
-    def get_c99(self):
-        return self.sc99
+    # Sorted by value within each bucket, the first and the last sample of a
+    # bucket are its min and its max: outliers are always kept
+    order = np.lexsort((y, bucket))
+    edges = np.flatnonzero(np.diff(bucket[order])) + 1
+    first = np.concatenate(([0], edges))
+    last  = np.concatenate((edges - 1, [len(order) - 1]))
+    rows = np.unique(order[np.concatenate((first, last))])
+    return (x[rows], y[rows])
 
-    def get_stats(self):
-        self.do_stats()
-        return (self.scount, self.savg, self.svar, self.sstd, self.sste, self.sc95, self.sc99)
+################################################################################
+#   Paged Figures
+################################################################################
+class PagedFigure():
+    """Rows of subplots laid out on fixed size pages of a multi-page PDF
+
+    Subplots are added by their index, row by row, and each page is written
+    and released as soon as a subplot of the next page is added, thus memory
+    does not depend on the number of rows plotted.
+    """
+
+    def __init__(self, figure, rows=None, cols=2):
+        if rows is None:
+            rows = page_rows
+        self.rows = rows
+        self.cols = cols
+        self.page = -1
+        self.fig = None
+        self.pdf = None
+        if not show_plot:
+            self.pdf = PdfPages(figure)
+
+    def new_page(self):
+        self.flush()
+
+        # Setup page geometry
+        fig_size = (720, self.rows * 720 / 5)
+        fig_dpi = 300
+        fig_inches  = (
+            5 * fig_size[0] / fig_dpi,
+            5 * fig_size[1] / fig_dpi,
+        )
+
+        # Setup page
+        self.fig = plt.figure(figsize=fig_inches, dpi=fig_dpi)
+
+        self.grids = gs.GridSpec(self.rows, self.cols)
+        self.fig.subplots_adjust(
+            left   = 0.10,
+            bottom = 0.05,
+            right  = 0.95,
+            top    = 0.95,
+            wspace = 0.30,
+            hspace = 0.30,
+        )
+
+    def add_subplot(self, plot_id):
+        page_size = self.rows * self.cols
+        if (plot_id // page_size != self.page):
+            self.new_page()
+            self.page = plot_id // page_size
+        return self.fig.add_subplot(self.grids[plot_id % page_size])
+
+    def flush(self):
+        if self.fig is None:
+            return
+
+        # Plot the page...
+        if show_plot:
+            plt.show()
+        else:
+            self.pdf.savefig(self.fig, orientation = 'portrait')
+
+        # Clean-up all the memory
+        plt.close(self.fig)
+        self.fig = None
+        gc.collect()
+
+    def close(self):
+        self.flush()
+        if self.pdf is not None:
+            self.pdf.close()
 
 ################################################################################
 #   Round Metrics of interest
 ################################################################################
 # Record data:
 # Round       Time[s]    RQTime[ns]       Lw       Rt       Re |  Nr       Lw    Rt_SP      Rt_corr      Rt_next
-metrics = {
+round_metrics = {
 # Label          Name                    Description                              Column
  "Time":      [ "Time [s]",             "Workload completion time [s]",              1,   0],
  "RQ_time":   [ "RQ run time",          "",                                          2,   1],
@@ -98,20 +347,15 @@ metrics = {
 # "Sa_next":   [ "Round time saturated", "",                                         11,   9],
 }
 
-mColumns = [c[2] for c in metrics.values()]
-def mName(m):
-    return metrics[m][0]
-def mDesc(m):
-    return metrics[m][1]
-def mData(m):
-    return data[:, metrics[m][3]] 
+def roundData(m):
+    return data[m]
 
 def plot_rounds(rounds_data):
     global data
 
     # Loading data from file
-    data = np.loadtxt(rounds_data, usecols=sorted(mColumns))
-    mTime = data[:, 0]
+    data = trace_tables.Table(rounds_data, 'rounds')
+    roundTime = data['Time']
 
     # Setup figure
     fig = plt.figure()
@@ -134,8 +378,8 @@ def plot_rounds(rounds_data):
     ################################################################################
     p1 = fig.add_subplot(grids[0])
 
-    l1, = p1.plot(mTime, mData("Sp_next"), 'r')
-    l2, = p1.plot(mTime, mData("Rt_prev"), 'b')
+    l1, = p1.plot(roundTime, roundData("Sp_next"), 'r')
+    l2, = p1.plot(roundTime, roundData("Rt_prev"), 'b')
 
     # Setup X-Axis
     # p1.set_xlabel("Time [s]")
@@ -154,7 +398,7 @@ def plot_rounds(rounds_data):
 
     p2 = fig.add_subplot(grids[1])
 
-    l1, = p2.plot(mTime, mData("Re_prev"), 'b')
+    l1, = p2.plot(roundTime, roundData("Re_prev"), 'b')
 
     # Setup X-Axis
     # p2.set_xlabel("Time [s]")
@@ -173,7 +417,7 @@ def plot_rounds(rounds_data):
 
     p3 = fig.add_subplot(grids[2])
 
-    l1, = p3.plot(mTime, mData("Co_next"), 'b')
+    l1, = p3.plot(roundTime, roundData("Co_next"), 'b')
 
     # Setup X-Axis
     p3.set_xlabel("Time [s]")
@@ -207,16 +451,15 @@ def plot_rounds(rounds_data):
                 format = 'pdf',
                 )
 
-for rounds_data in glob.glob('cbs_table_*_rounds.dat'):
-    print "Plotting rounds [", rounds_data, "]..."
-    plot_rounds(rounds_data)
+    # Clean-up all the memory
+    plt.close(fig)
 
 ################################################################################
 #   Bursts Metrics of interest
 ################################################################################
 # Record data:
 # Burst                Task       Time[s]    SETime[ns] |   Rquota    Tt_SP       Te       Tn       Tb       Tt
-metrics = {
+burst_metrics = {
 # Label          Name                    Description                  Column  Index
 # 'Task':     [ 'Task',                 'Task name',                  1,      0],
  'Time':      [ 'Time [s]',             'Burst completion time [s]',  2,      0],
@@ -231,89 +474,50 @@ metrics = {
 # 'Tb_reinit': [ 'Burst reinit',       '',                            6,      2],
 }
 
-mColumns = [c[2] for c in metrics.values()]
-def mName(m):
-    return metrics[m][0]
-def mDesc(m):
-    return metrics[m][1]
-def mData(t,m):
-    idx = metrics[m][3]
-    return [d[idx] for d in data[t]]
-def mTime(t):
-    idx = metrics['Time'][3]
-    return [d[idx] for d in data[t]]
+def burstData(t,m):
+    return table[m][data[t]]
+def burstTime(t):
+    return table['Time'][data[t]]
 
 def plot_bursts(bursts_data):
-    global data
+    global data, table
 
-    # Data Loading loop
-    time_start = 0;
-    data = {}
-    infile = open(bursts_data, 'r')
-    # infile = open('test.dat', 'r')
-    for line in infile:
-        if line[0] == '#':
-            continue
-        values = str.split(line)
-        e = values[1]
-        m = [values[i] for i in sorted(mColumns)]
-        if (e not in data.keys()):
-            data[e] = []
-        data[e].append(m)
-        if (time_start == 0):
-            time_start = m[1]
+    # Data Loading
+    table = trace_tables.Table(bursts_data, 'bursts')
+    data = group_rows(*group_keys(table, 'Task'))
 
     # print data
-    # print mData('hb_ctl-32254', 'BT')
-    # print mData('hb_tx_001_00-32276', 'Time')
+    # print burstData('hb_ctl-32254', 'BT')
+    # print burstData('hb_tx_001_00-32276', 'Time')
     # print "Applications: ", len(data.keys())
 
     # print "Columns: ", mColumns
-    # print "Data: ", mData('wlg-3818', "Tb_sp")
+    # print "Data: ", burstData('wlg-3818', "Tb_sp")
     # exit(0)
 
-    tasks_count = len(data.keys())
-
-    # Setup figure geometry
-    fig_size = (720, tasks_count * 720 / 5)
-    fig_dpi = 300
-    fig_inches  = (
-        5 * fig_size[0] / fig_dpi,
-        5 * fig_size[1] / fig_dpi,
-    )
-
-    # Setup figure
-    fig = plt.figure(figsize=fig_inches, dpi=fig_dpi)
-
-    grids = gs.GridSpec(tasks_count, 2)
-    fig.subplots_adjust(
-        left   = 0.10,
-        bottom = 0.05,
-        right  = 0.95,
-        top    = 0.95,
-        wspace = 0.30,
-        hspace = 0.30,
-    )
+    # Setup paged figure
+    bursts_figure = string.replace(bursts_data, ".dat", ".pdf")
+    pages = PagedFigure(bursts_figure)
 
     # Application specifica data plotting
     plot_id = 0
     for task in sorted(data.keys()):
 
-        # print 'Plotting taks: ', task, ' @ time: ', mTime(task)
-        # print 'Tb_sp',    mData(task, 'Tb_sp')
-        # print 'Tb',       mData(task, 'Tb')
-        # print 'Tb_error', mData(task, 'Tb_error')
-        # print 'Tb_next',  mData(task, 'Tb_next')
+        # print 'Plotting taks: ', task, ' @ time: ', burstTime(task)
+        # print 'Tb_sp',    burstData(task, 'Tb_sp')
+        # print 'Tb',       burstData(task, 'Tb')
+        # print 'Tb_error', burstData(task, 'Tb_error')
+        # print 'Tb_next',  burstData(task, 'Tb_next')
 
         ################################################################################
         # Plot Round Time SP and Measured
         ################################################################################
-        p1 = fig.add_subplot(grids[plot_id])
+        p1 = pages.add_subplot(plot_id)
 
-        l1, = p1.plot(mTime(task), mData(task, 'Tb_sp'), 'r')
-        l2, = p1.plot(mTime(task), mData(task, 'Tb'),    'b')
-        # print 'Taks (' + task + ') Tb_SP: ', mData(task, 'Tb_sp')
-        # print 'Taks (' + task + ') Tb: ', mData(task, 'Tb')
+        l1, = p1.plot(burstTime(task), burstData(task, 'Tb_sp'), 'r')
+        l2, = p1.plot(burstTime(task), burstData(task, 'Tb'),    'b')
+        # print 'Taks (' + task + ') Tb_SP: ', burstData(task, 'Tb_sp')
+        # print 'Taks (' + task + ') Tb: ', burstData(task, 'Tb')
 
         # Setup X-Axis
         # p1.set_xlabel("Time [s]")
@@ -329,12 +533,12 @@ def plot_bursts(bursts_data):
         ################################################################################
         # Plot Round Time Error and Next
         ################################################################################
-        p2 = fig.add_subplot(grids[plot_id+1])
+        p2 = pages.add_subplot(plot_id+1)
 
-        l1, = p2.plot(mTime(task), mData(task, 'Tb_error'), 'r')
-        l2, = p2.plot(mTime(task), mData(task, 'Tb_next'),  'g')
-        # print 'Taks (' + task + ') Tb_error: ', mData(task, 'Tb_error')
-        # print 'Taks (' + task + ') Tb_next: ', mData(task, 'Tb_next')
+        l1, = p2.plot(burstTime(task), burstData(task, 'Tb_error'), 'r')
+        l2, = p2.plot(burstTime(task), burstData(task, 'Tb_next'),  'g')
+        # print 'Taks (' + task + ') Tb_error: ', burstData(task, 'Tb_error')
+        # print 'Taks (' + task + ') Tb_next: ', burstData(task, 'Tb_next')
 
         # Setup X-Axis
         # p1.set_xlabel("Time [s]")
@@ -356,28 +560,15 @@ def plot_bursts(bursts_data):
             p2.get_xticklabels() + p2.get_yticklabels()):
             item.set_fontsize(fsize)
 
-    # Plot the graph...
-    if show_plot:
-        plt.show()
-    else:
-        bursts_figure = string.replace(bursts_data, ".dat", ".pdf")
-        # print "Plotting [", bursts_figure, "]..."
-        plt.savefig(
-                bursts_figure,
-                orientation = 'portrait',
-                format = 'pdf',
-                )
-
-for bursts_data in glob.glob('cbs_table_*_bursts.dat'):
-    print "Plotting bursts [", bursts_data, "]..."
-    plot_bursts(bursts_data)
+    # Plot the last page
+    pages.close()
 
 ################################################################################
 #   Latency Metrics of interest
 ################################################################################
 # Record data:
 # Burst                Task       Time[s]     Delay[ns]     Slice[ns]
-metrics = {
+latency_metrics = {
 # Label          Name                    Description                  Column  Index
 # 'Task':     [ 'Task',                 'Task name',                   1,      0],
  'Time':      [ 'Time [s]',             'Burst completion time [s]',   2,      0],
@@ -385,8 +576,9 @@ metrics = {
  'Slice':     [ 'Slice [ns]',           'Running task CPU slice [ns]', 4,      2],
  'CPU':       [ 'CPU',                  'CPU Latency [ns]',            5,      3],
 }
-mColumns = [c[2] for c in metrics.values()]
 
+# Latencies table
+table = None
 # Overall statistics on big tasks
 data = {}
 delay_stats = {}
@@ -401,110 +593,145 @@ cpus_delay_stats = {}
 cpus_slice_stats = {}
 
 # Metrics access utilities
-def mName(m):
-    return metrics[m][0]
-def mDesc(m):
-    return metrics[m][1]
-def mData(view,t,m):
-    idx = metrics[m][3]
+def latencyData(view,t,m):
     if view=='Tasks':
-        return [d[idx] for d in tasks_data[t]]
+        return table[m][tasks_data[t]]
     if view=='Cpus':
-        return [d[idx] for d in cpus_data[t]]
+        return table[m][cpus_data[t]]
     # by default, return overall metrics
-    return [d[idx] for d in data[t]]
-def mStats(view, metric, plot_id):
+    return table[m][data[t]]
+def latencyStats(view, metric, plot_id):
     if (view == 'Tasks'):
         if (metric == 'Delay'):
-            return tasks_delay_stats[plot_id].get_stats()
-        return tasks_slice_stats[plot_id].get_stats()
+            return tasks_delay_stats[plot_id]
+        return tasks_slice_stats[plot_id]
     if (view == 'Cpus'):
         if (metric == 'Delay'):
-            return cpus_delay_stats[plot_id].get_stats()
-        return cpus_slice_stats[plot_id].get_stats()
+            return cpus_delay_stats[plot_id]
+        return cpus_slice_stats[plot_id]
     # By default, return overall metrics
     if (metric == 'Delay'):
-        return delay_stats[plot_id].get_stats()
-    return slice_stats[plot_id].get_stats()
-def mTime(view, t):
-    idx = metrics['Time'][3]
-    if (view == 'Tasks'):
-        return [d[idx] for d in tasks_data[t]]
-    if (view == 'Cpus'):
-        return [d[idx] for d in cpus_data[t]]
-    return [d[idx] for d in data[t]]
+        return delay_stats[plot_id]
+    return slice_stats[plot_id]
+def latencyTime(view, t):
+    return latencyData(view, t, 'Time')
 
 
 
-def plot_latencies(latencies_data):
+def set_latencies(view, view_data, delays, slices):
     global data, delay_stats, slice_stats
     global tasks_data, tasks_delay_stats, tasks_slice_stats
     global cpus_data, cpus_delay_stats, cpus_slice_stats
 
-    # # Load big-tasks list
-    # Initialize overall data
-    data['Overall'] = []
-    delay_stats['Overall'] = Stats()
-    slice_stats['Overall'] = Stats()
+    if (view == 'Tasks'):
+        (tasks_data, tasks_delay_stats, tasks_slice_stats) = (view_data, delays, slices)
+    elif (view == 'Cpus'):
+        (cpus_data, cpus_delay_stats, cpus_slice_stats) = (view_data, delays, slices)
+    else:
+        (data, delay_stats, slice_stats) = (view_data, delays, slices)
+
+# The table column each view groups rows by
+latencies_groups = {
+    'Tasks':   'Task',
+    'Cpus':    'CPU',
+}
+
+def load_latencies(latencies_data, view):
+    global table
+
+    # Data Loading
+    table = trace_tables.Table(latencies_data, 'latencies')
+    if (len(table) == 0):
+        return 0
+
+    # Only the statistics of the plotted view are computed
+    if view in latencies_groups:
+        (keys, inverse) = group_keys(table, latencies_groups[view])
+        view_data = group_rows(keys, inverse)
+    else:
+        (keys, inverse) = (['Overall'], np.zeros(len(table), np.int32))
+        view_data = {'Overall': slice(None)}
+    set_latencies(view, view_data,
+            join_stats(group_stats(keys, inverse, table['Delay']),
+                       group_percentiles(keys, inverse, table['Delay'])),
+            join_stats(group_stats(keys, inverse, table['Slice']),
+                       group_percentiles(keys, inverse, table['Slice'])))
+
+    return len(table)
+
+def stream_latencies(latencies_data, view):
+    global table
+
+    # Exact statistics, histograms and bounded samples of the plotted view
+    delays  = GroupMoments()
+    slices  = GroupMoments()
+    delays_hist = GroupHistogram()
+    slices_hist = GroupHistogram()
+    samples = GroupSample(stream_samples)
 
     # Data Loading loop
-    time_start = 0;
-    infile = open(latencies_data, 'r')
-    # infile = open('test.dat', 'r')
-    for line in infile:
-        if line[0] == '#':
-            continue
-        values = str.split(line)
-        task = values[1]
-        m = [values[i] for i in sorted(mColumns)]
-        data['Overall'].append(m)
-
-        mdelay = float(m[metrics['Delay'][3]])
-        mslice = float(m[metrics['Slice'][3]])
-        delay_stats['Overall'].add_sample(mdelay)
-        slice_stats['Overall'].add_sample(mslice)
-
-        # per TASK stats
-        if (task not in tasks_data.keys()):
-            tasks_data[task] = []
-            tasks_delay_stats[task] = Stats()
-            tasks_slice_stats[task] = Stats()
-        tasks_data[task].append(m)
-        tasks_delay_stats[task].add_sample(mdelay)
-        tasks_slice_stats[task].add_sample(mslice)
-
-        # per CPU stats
-        cpu = m[metrics['CPU'][3]]
-        if (cpu not in cpus_delay_stats.keys()):
-            cpus_data[cpu] = []
-            cpus_delay_stats[cpu] = Stats()
-            cpus_slice_stats[cpu] = Stats()
-        cpus_data[cpu].append(m)
-        cpus_delay_stats[cpu].add_sample(mdelay)
-        cpus_slice_stats[cpu].add_sample(mslice)
-
-        if (time_start == 0):
-            time_start = m[1]
-
-    if (len(data['Overall']) == 0):
+    rows = 0
+    for (chunk, dicts) in trace_tables.read_chunks(latencies_data, 'latencies',
+            ('Task', 'Time', 'Delay', 'Slice', 'CPU'), stream_chunk):
+        rows += len(chunk['Time'])
+        if view in latencies_groups:
+            groups = chunk[latencies_groups[view]]
+        else:
+            groups = np.zeros(len(chunk['Time']), np.int32)
+        delays.add(groups, chunk['Delay'])
+        slices.add(groups, chunk['Slice'])
+        delays_hist.add(groups, chunk['Delay'])
+        slices_hist.add(groups, chunk['Slice'])
+        samples.add(groups, (chunk['Time'], chunk['Delay'], chunk['Slice']))
+    if (rows == 0):
+        return 0
+
+    # Samples of all the groups are collected into a single table
+    if (view == 'Tasks'):
+        keys = dicts['Task']
+    elif (view == 'Cpus'):
+        keys = [str(c) for c in range(len(delays.count))]
+    else:
+        keys = ['Overall']
+    table = {'Time': [], 'Delay': [], 'Slice': []}
+    view_data = {}
+    start = 0
+    for (group, sample) in samples.samples.items():
+        for (m, values) in zip(('Time', 'Delay', 'Slice'), sample):
+            table[m].append(values)
+        view_data[keys[group]] = slice(start, start + len(sample[0]))
+        start += len(sample[0])
+    table = dict((m, np.concatenate(v)) for (m, v) in table.items())
+
+    set_latencies(view, view_data,
+            join_stats(delays.get_stats(keys), delays_hist.get_stats(keys)),
+            join_stats(slices.get_stats(keys), slices_hist.get_stats(keys)))
+
+    return rows
+
+def plot_latencies(latencies_data, view):
+
+    if stream_tables:
+        rows = stream_latencies(latencies_data, view)
+    else:
+        rows = load_latencies(latencies_data, view)
+    if (rows == 0):
         print "   No data collected for [" + latencies_data + "]"
         return
 
-    plot_latencies_per(latencies_data, 'Tasks')
-    plot_latencies_per(latencies_data, 'Cpus')
-    plot_latencies_per(latencies_data, 'Overall')
+    plot_latencies_per(latencies_data, view)
 
     # print data
-    # print mData('Task', 'hb_ctl-32254', 'BT')
-    # print mData('Task', 'hb_tx_001_00-32276', 'Time')
+    # print latencyData('Task', 'hb_ctl-32254', 'BT')
+    # print latencyData('Task', 'hb_tx_001_00-32276', 'Time')
     # print "Applications: ", len(tasks_data.keys())
 
     # print "Columns: ", mColumns
-    # print "Data: ", mData('Task', 'wlg-3818', "Tb_sp")
+    # print "Data: ", latencyData('Task', 'wlg-3818', "Tb_sp")
     # exit(0)
 
 def plot_latencies_per(latencies_data, view):
-    global data, delay_stats, slice_stats
+    global table, data, delay_stats, slice_stats
     global tasks_data, tasks_delay_stats, tasks_slice_stats
     global cpus_data, cpus_delay_stats, cpus_slice_stats
 
@@ -520,51 +747,34 @@ def plot_latencies_per(latencies_data, view):
     latencies_figure = string.replace(latencies_data, '.dat', '_'+view.lower()+'.pdf')
     latencies_report = string.replace(latencies_figure, '.pdf', '.report')
     report_file = open(latencies_report, 'w')
-    report_file.write("# %24s | %25s | %25s |\n" % (view, 'Delay', 'Slice'))
-    report_file.write("# %24s | %12s %12s | %12s %12s |\n" % ('', 'Avg', 'Ci99', 'Avg', 'Ci99'))
-
-    # Compute number of plots in that view
-    plots_count = len(plot_data.keys())
-    if (plots_count == 1):
-        plots_count = 3
-
-    # Setup figure geometry
-    fig_size = (720, plots_count * 720 / 5)
-    fig_dpi = 300
-    fig_inches  = (
-        5 * fig_size[0] / fig_dpi,
-        5 * fig_size[1] / fig_dpi,
-    )
-
-    # Setup figure
-    fig = plt.figure(figsize=fig_inches, dpi=fig_dpi)
+    report_file.write("# %24s | %25s | %25s | %64s | %64s |\n" % (view, 'Delay', 'Slice',
+        'Delay percentiles', 'Slice percentiles'))
+    report_file.write("# %24s | %12s %12s | %12s %12s | %s | %s |\n" % ('', 'Avg', 'Ci99', 'Avg', 'Ci99',
+        "%12s %12s %12s %12s %12s" % ('P50', 'P90', 'P99', 'P99.9', 'Max'),
+        "%12s %12s %12s %12s %12s" % ('P50', 'P90', 'P99', 'P99.9', 'Max')))
 
-    grids = gs.GridSpec(plots_count, 2)
-    fig.subplots_adjust(
-        left   = 0.10,
-        bottom = 0.05,
-        right  = 0.95,
-        top    = 0.95,
-        wspace = 0.30,
-        hspace = 0.30,
-    )
+    # Setup paged figure
+    pages = PagedFigure(latencies_figure)
 
     # Application specific data plotting
     plot_id = 0
     for plot_key in sorted(plot_data.keys()):
 
-        # print 'Plotting [',view, ']: ', plot_key, ' @ time: ', mTime(view, plot_key)
-        # print 'Delay', mData(view, plot_key, 'Delay')
-        # print 'Slice', mData(view, plot_key, 'Slice')
+        # print 'Plotting [',view, ']: ', plot_key, ' @ time: ', latencyTime(view, plot_key)
+        # print 'Delay', latencyData(view, plot_key, 'Delay')
+        # print 'Slice', latencyData(view, plot_key, 'Slice')
 
         ################################################################################
         # Plot Tasks Delay (once ready to run)
         ################################################################################
-        p1 = fig.add_subplot(grids[plot_id])
+        p1 = pages.add_subplot(plot_id)
 
-        l1, = p1.plot(mTime(view, plot_key), mData(view, plot_key, 'Delay'), 'r+ ')
+        (x, y) = decimate(latencyTime(view, plot_key), latencyData(view, plot_key, 'Delay'))
+        l1, = p1.plot(x, y, 'r+ ')
 
-        (count, avg, var, std, ste, c95, c99) = mStats(view, 'Delay', plot_key)
+        (count, avg, var, std, ste, c95, c99,
+                p50, p90, p99, p999, pmax) = latencyStats(view, 'Delay', plot_key)
+        delay_pcts = (p50, p90, p99, p999, pmax)
         plt.axhline(y=avg, linewidth=1, color='g')
         plt.axhspan(max(1,avg-c99), avg+c99, facecolor='g', alpha=0.2)
         plt.axhspan(max(1,avg-(2*std)), avg+(2*std), facecolor='y', alpha=0.1)
@@ -589,10 +799,13 @@ def plot_latencies_per(latencies_data, view):
         ################################################################################
         # Plot Tasks Timeslice
         ################################################################################
-        p2 = fig.add_subplot(grids[plot_id+1])
+        p2 = pages.add_subplot(plot_id+1)
 
-        l1, = p2.plot(mTime(view, plot_key), mData(view, plot_key, 'Slice'), 'b+ ')
-        (count, avg, var, std, ste, c95, c99) = mStats(view, 'Slice', plot_key)
+        (x, y) = decimate(latencyTime(view, plot_key), latencyData(view, plot_key, 'Slice'))
+        l1, = p2.plot(x, y, 'b+ ')
+        (count, avg, var, std, ste, c95, c99,
+                p50, p90, p99, p999, pmax) = latencyStats(view, 'Slice', plot_key)
+        slice_pcts = (p50, p90, p99, p999, pmax)
         plt.axhline(y=avg, linewidth=1, color='g')
         plt.axhspan(max(1,avg-c99), avg+c99, facecolor='g', alpha=0.2)
         plt.axhspan(max(1,avg-(2*std)), avg+(2*std), facecolor='y', alpha=0.1)
@@ -611,8 +824,10 @@ def plot_latencies_per(latencies_data, view):
         # Add legend
         #p2.legend([l1], ['CPU Slice'], prop={'size':fsize})
 
-        # Report slice stats
-        report_file.write("   %12.3f %12.3f\n" % (avg, c99))
+        # Report slice stats, and both percentiles
+        report_file.write("   %12.3f %12.3f" % (avg, c99))
+        report_file.write(("   %12.3f %12.3f %12.3f %12.3f %12.3f" * 2 + "\n") %
+                (delay_pcts + slice_pcts))
 
         plot_id += 2
 
@@ -625,28 +840,8 @@ def plot_latencies_per(latencies_data, view):
 
     report_file.close()
 
-    # Plot the graph...
-    if show_plot:
-        plt.show()
-    else:
-        latencies_figure = string.replace(latencies_data, '.dat', '_'+view.lower()+'.pdf')
-        # print "Plotting [", latencies_figure, "]..."
-        plt.savefig(
-                latencies_figure,
-                orientation = 'portrait',
-                format = 'pdf',
-                )
-
-    # Clean-up all the memory
-    fig.clf()
-    plt.close()
-    gc.collect()
-
-
-# Plotting tasks latencies
-for latencies_data in glob.glob('**_latencies.dat'):
-    print "Plotting latencies [", latencies_data, "]..."
-    plot_latencies(latencies_data)
+    # Plot the last page
+    pages.close()
 
 
 ################################################################################
@@ -654,7 +849,7 @@ for latencies_data in glob.glob('**_latencies.dat'):
 ################################################################################
 # Record data:
 # Burst                Task       Time[s]     Delay[ns]     Slice[ns]
-metrics = {
+migration_metrics = {
 # Label          Name                    Description                  Column  Index
 # 'Task':     [ 'Task',                 'Task name',                    1,      0],
  'Time':      [ 'Time [s]',             'Task migration time [s]',      3,      0],
@@ -662,17 +857,10 @@ metrics = {
  'Src':       [ 'Src CPU',              'Departing CPU',                5,      2],
  'Dst':       [ 'Dst CPU',              'Arrival CPU',                  6,      3],
 }
-mColumns = [c[2] for c in metrics.values()]
-def mName(m):
-    return metrics[m][0]
-def mDesc(m):
-    return metrics[m][1]
-def mData(t,m):
-    idx = metrics[m][3]
-    return [d[idx] for d in data[t]]
-def mTime(t):
-    idx = metrics['Time'][3]
-    return [d[idx] for d in data[t]]
+def migrationData(t,m):
+    return data[t][m]
+def migrationTime(t):
+    return data[t]['Time']
 
 # The regex to match a CPU id within a migration filename, e.g.
 # fair_table_MIG-WLG-B3P2I1_C07_migrations.dat
@@ -688,60 +876,50 @@ def parse_migrations(migrations_data):
     match = migcpu_regex.search(migrations_data)
     cpu_id = 'C' + match.group('cpu_id')
 
-    # Data Loading loop
-    infile = open(migrations_data, 'r')
-    # infile = open('test.dat', 'r')
-    for line in infile:
-        if line[0] == '#':
-            continue
-        values = str.split(line)
-        m = [values[i] for i in sorted(mColumns)]
-        if (cpu_id not in data.keys()):
-            data[cpu_id] = []
-            delta_stats[cpu_id] = Stats()
-        data[cpu_id].append(m)
-        # print "Sample: ", m, "\ndelta: ", metrics['Delta'][3], " => ", float(m[metrics['Delta'][3]])
-        delta_stats[cpu_id].add_sample(float(m[metrics['Delta'][3]]))
-
-
-def plot_migrations():
-    cpus_count = len(data.keys())
-
-    # Setup figure geometry
-    fig_size = (720, cpus_count * 720 / 5)
-    fig_dpi = 300
-    fig_inches  = (
-        5 * fig_size[0] / fig_dpi,
-        5 * fig_size[1] / fig_dpi,
-    )
+    # Data Loading
+    table = trace_tables.Table(migrations_data, 'migrations')
+    if (len(table) == 0):
+        return
+    data[cpu_id] = table
+    delta_stats[cpu_id] = rows_stats(table['Delta'])
 
-    # Setup figure
-    fig = plt.figure(figsize=fig_inches, dpi=fig_dpi)
 
-    grids = gs.GridSpec(cpus_count, 2)
-    fig.subplots_adjust(
-        left   = 0.10,
-        bottom = 0.05,
-        right  = 0.95,
-        top    = 0.95,
-        wspace = 0.30,
-        hspace = 0.30,
-    )
+def plot_migrations(migrations_data, migrations_files):
+    global data, delta_stats
+
+    # Reset plot data DB
+    data = {}
+    delta_stats = {}
+    for migrations_file in migrations_files:
+        print "Parsing migrations [", migrations_file, "]..."
+        parse_migrations(migrations_file)
+
+    #print "Columns: ", mColumns
+    #print "CPUs: ", len(data.keys())
+
+    if (len(data) == 0):
+        print "   No data collected for [" + migrations_data + "]"
+        return
+
+    # Setup paged figure
+    migrations_figure = string.replace(migrations_data, ".dat", ".pdf")
+    pages = PagedFigure(migrations_figure)
 
     # Application specifica data plotting
     plot_id = 0
     for cpu in sorted(data.keys()):
 
-        # print 'Plotting CPU: ', cpu, ' @ time: ', mTime(cpu)
-        # print 'Delta', mData(cpu, 'Delta')
+        # print 'Plotting CPU: ', cpu, ' @ time: ', migrationTime(cpu)
+        # print 'Delta', migrationData(cpu, 'Delta')
 
         ################################################################################
         # Plot Migration Interarrival events
         ################################################################################
-        p1 = fig.add_subplot(grids[plot_id])
+        p1 = pages.add_subplot(plot_id)
 
-        l1, = p1.plot(mTime(cpu), mData(cpu, 'Delta'), 'r+ ')
-        # print 'CPU (' + cpu + ') Delta: ', mData(cpu, 'Delta')
+        (x, y) = decimate(migrationTime(cpu), migrationData(cpu, 'Delta'))
+        l1, = p1.plot(x, y, 'r+ ')
+        # print 'CPU (' + cpu + ') Delta: ', migrationData(cpu, 'Delta')
 
         # print "Delta(", cpu, "): ", delta_stats[cpu].get_stats()
         (count, avg, var, std, ste, c95, c99) = delta_stats[cpu].get_stats()
@@ -766,10 +944,12 @@ def plot_migrations():
         ################################################################################
         # Plot Migration Departing and Arriving CPU
         ################################################################################
-        p2 = fig.add_subplot(grids[plot_id+1])
+        p2 = pages.add_subplot(plot_id+1)
 
-        l1, = p2.plot(mTime(cpu), mData(cpu, 'Src'), 'r+ ')
-        l2, = p2.plot(mTime(cpu), mData(cpu, 'Dst'), 'g+ ')
+        (x, y) = decimate(migrationTime(cpu), migrationData(cpu, 'Src'))
+        l1, = p2.plot(x, y, 'r+ ')
+        (x, y) = decimate(migrationTime(cpu), migrationData(cpu, 'Dst'))
+        l2, = p2.plot(x, y, 'g+ ')
 
         # Setup X-Axis
         # p1.set_xlabel("Time [s]")
@@ -792,32 +972,246 @@ def plot_migrations():
             p2.get_xticklabels() + p2.get_yticklabels()):
             item.set_fontsize(fsize)
 
-    # Plot the graph...
-    if show_plot:
-        plt.show()
-    else:
-        migrations_figure = string.replace(migrations_data, ".dat", ".pdf")
-        # print "Plotting [", migrations_figure, "]..."
-        plt.savefig(
-                migrations_figure,
-                orientation = 'portrait',
-                format = 'pdf',
-                )
+    # Plot the last page
+    pages.close()
 
-# Reset plot data DB
-data = {}
-delta_stats = {}
-for migrations_data in glob.glob('*_table_*_migrations.dat'):
-    print "Parsing migrations [", migrations_data, "]..."
-    parse_migrations(migrations_data)
+################################################################################
+#   Context Switches Windows
+################################################################################
 
-#print "Columns: ", mColumns
-#print "CPUs: ", len(data.keys())
+def plot_ctxwindows(ctxwindows_data):
 
-if (len(data)):
-    match = migcpu_regex.search(migrations_data)
-    cpu_id = 'C' + match.group('cpu_id')
-    migrations_data = string.replace(migrations_data, cpu_id, "Call")
-    print "Plotting migrations [", migrations_data, "]..."
-    plot_migrations()
+    table = trace_tables.Table(ctxwindows_data, 'ctxwindows')
+    if (len(table) == 0):
+        print "   No data collected for [" + ctxwindows_data + "]"
+        return
+    cpus = [name for name in table.names if name != 'Time']
+    times = table['Time']
+    window = times[1] - times[0] if len(times) > 1 else 1.0
+    rates = np.array([table[cpu] for cpu in cpus], dtype=np.float64) / window
+
+    ctxwindows_figure = string.replace(ctxwindows_data, ".dat", ".pdf")
+    pages = PagedFigure(ctxwindows_figure, rows=2, cols=1)
+
+    ################################################################################
+    # Plot the Time x CPU heatmap of the rates
+    ################################################################################
+    p1 = pages.add_subplot(0)
+    image = p1.imshow(rates, aspect='auto', interpolation='nearest',
+            origin='lower', cmap='hot',
+            extent=(times[0], times[-1] + window, -0.5, len(cpus) - 0.5))
+    colorbar = pages.fig.colorbar(image, ax=p1)
+    colorbar.set_label('[Ctx/s]', fontsize=fsize)
+    p1.set_yticks(range(len(cpus)))
+    p1.set_yticklabels(cpus)
+    p1.set_ylabel('CPU')
+    p1.set_title('Context Switches Rate (%.3f [s] windows)' % window)
+
+    ################################################################################
+    # Plot the overall rate, with its peak window
+    ################################################################################
+    p2 = pages.add_subplot(1)
+    overall = rates.sum(axis=0)
+    l1, = p2.plot(times, overall, 'b-')
+    peak = overall.argmax()
+    plt.axvline(x=times[peak], linewidth=1, color='r')
+    plt.axhline(y=overall.mean(), linewidth=1, color='g')
+    p2.set_xlim(times[0], times[-1] + window)
+    p2.set_xlabel('Time [s]')
+    p2.set_ylabel('[Ctx/s]')
+    p2.set_title('Overall Context Switches Rate (peak %.1f @ %.3f [s])' % (
+        overall[peak], times[peak]))
+    p2.grid(True)
+    p2.legend([l1], ['Rate'], prop={'size':fsize})
+
+    for item in (
+        [p1.title, p1.xaxis.label, p1.yaxis.label]  +
+        [p2.title, p2.xaxis.label, p2.yaxis.label]  +
+        p1.get_xticklabels() + p1.get_yticklabels() +
+        p2.get_xticklabels() + p2.get_yticklabels()):
+        item.set_fontsize(fsize)
+
+    pages.close()
+
+################################################################################
+### Plotting Jobs
+################################################################################
+
+def list_jobs():
+    """List the (kind, table file, view) plotting jobs for the current folder"""
+    jobs = []
+
+    for rounds_data in sorted(glob.glob('cbs_table_*_rounds.dat')):
+        jobs.append(('rounds', rounds_data, None))
+
+    for bursts_data in sorted(glob.glob('cbs_table_*_bursts.dat')):
+        jobs.append(('bursts', bursts_data, None))
+
+    for latencies_data in sorted(glob.glob('**_latencies.dat')):
+        for view in ('Tasks', 'Cpus', 'Overall'):
+            jobs.append(('latencies', latencies_data, view))
+
+    # Per CPU migration tables are plotted together, one figure per test,
+    # named by replacing the CPU id with "Call"
+    migrations = {}
+    for migrations_data in sorted(glob.glob('*_table_*_migrations.dat')):
+        match = migcpu_regex.search(migrations_data)
+        cpu_id = 'C' + match.group('cpu_id')
+        call_data = string.replace(migrations_data, cpu_id, "Call")
+        migrations.setdefault(call_data, []).append(migrations_data)
+    for call_data in sorted(migrations.keys()):
+        jobs.append(('migrations', call_data, tuple(migrations[call_data])))
+
+    for ctxwindows_data in sorted(glob.glob('*_Call_ctxwindows.dat')):
+        jobs.append(('ctxwindows', ctxwindows_data, None))
+
+    return jobs
+
+# The version of the plots and reports, to be bumped on each change of their
+# content, which invalidates the ones cached by previous versions
+PLOTS_VERSION = 2
+
+def job_files(job):
+    """Get the (input tables, output files) of a plotting job"""
+    (kind, table_data, view) = job
+
+    if (kind == 'latencies'):
+        latencies_figure = string.replace(table_data, '.dat', '_'+view.lower()+'.pdf')
+        latencies_report = string.replace(latencies_figure, '.pdf', '.report')
+        return ([table_data], [latencies_figure, latencies_report])
+    if (kind == 'migrations'):
+        return (list(view), [string.replace(table_data, ".dat", ".pdf")])
+    return ([table_data], [string.replace(table_data, ".dat", ".pdf")])
+
+def job_key(job):
+    """Get the cache key of a plotting job, from its input tables content"""
+    (kind, table_data, view) = job
+    (inputs, outputs) = job_files(job)
+
+    # The migrations view is the list of their tables, hashed as inputs
+    if (kind == 'migrations'):
+        view = None
+    return trace_cache.cache_key(
+            [trace_cache.file_digest(fname) for fname in inputs],
+            PLOTS_VERSION, kind, table_data, view,
+            [fsize, page_rows, plot_points,
+             stream_tables, stream_chunk, stream_samples])
+
+def plot_job(job):
+    (kind, table_data, view) = job
+
+    # Plots of unchanged tables are restored from the cache
+    if not show_plot:
+        key = job_key(job)
+        files = trace_cache.fetch(key)
+        if files is not None:
+            print "Restored %s [ %s ] from cache" % (kind, " ".join(files))
+            sys.stdout.flush()
+            return
+
+    if (kind == 'rounds'):
+        print "Plotting rounds [", table_data, "]..."
+        plot_rounds(table_data)
+    elif (kind == 'bursts'):
+        print "Plotting bursts [", table_data, "]..."
+        plot_bursts(table_data)
+    elif (kind == 'latencies'):
+        print "Plotting latencies [", table_data, "]", view, "..."
+        plot_latencies(table_data, view)
+    elif (kind == 'migrations'):
+        print "Plotting migrations [", table_data, "]..."
+        plot_migrations(table_data, view)
+    elif (kind == 'ctxwindows'):
+        print "Plotting context switches [", table_data, "]..."
+        plot_ctxwindows(table_data)
+    sys.stdout.flush()
+
+    if not show_plot:
+        (inputs, outputs) = job_files(job)
+        trace_cache.store(key, [fname for fname in outputs if os.path.exists(fname)])
+
+def run_job(job):
+    """Plot a job, returning its error (if any) instead of raising it"""
+    try:
+        plot_job(job)
+    except Exception:
+        return (job, traceback.format_exc())
+    finally:
+        # Release the figures of this job before the next one
+        plt.close('all')
+        gc.collect()
+    return (job, None)
+
+def run_jobs(jobs, workers):
+    """Run all the jobs, returning the list of (job, error) results"""
+
+    # Interactive plots cannot be shown from the worker processes
+    if (workers == 1 or show_plot or len(jobs) < 2):
+        return [run_job(job) for job in jobs]
+
+    pool = multiprocessing.Pool(min(workers, len(jobs)))
+    try:
+        results = pool.map(run_job, jobs, 1)
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+################################################################################
+### Main and Command Line Processing
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    global plot_jobs
+    global stream_tables
+
+    if argv is None:
+        argv = sys.argv
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "hj:s", ["help", "jobs=", "stream"])
+        except getopt.error, msg:
+            raise Usage(msg)
+        # process options
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                print __doc__
+                return 0
+            if o in ("-j", "--jobs"):
+                try:
+                    plot_jobs = int(a)
+                except ValueError:
+                    raise Usage("Invalid number of jobs: " + a)
+                continue
+            if o in ("-s", "--stream"):
+                stream_tables = 1
+                continue
+    except Usage, err:
+        print >>sys.stderr, err.msg
+        print >>sys.stderr, "for help use --help"
+        return 2
+
+    workers = plot_jobs
+    if (workers <= 0):
+        workers = multiprocessing.cpu_count()
+    if not show_plot:
+        plt.switch_backend('Agg')
+
+    failed = 0
+    for (job, error) in run_jobs(list_jobs(), workers):
+        if error is None:
+            continue
+        print >>sys.stderr, "Plotting %s [ %s ] failed:" % (job[0], job[1])
+        print >>sys.stderr, error
+        failed += 1
+
+    if failed:
+        return 1
+    return 0
 
+if __name__ == "__main__":
+    sys.exit(main())
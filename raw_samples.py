@@ -0,0 +1,110 @@
+""" Raw Test Samples Storage
+
+Licensed under the terms of the GNU GPL License version 2
+
+The samples of each instance of a test, which sched_test.py otherwise reduces
+into statistics, can be kept into a sidecar of the test data file, e.g.
+    test_CBS_20140210_101010_PerfPIPE.raw
+which is the plain array of fixed size records, one for each instance of each
+run, as defined by RECORD.
+
+The sidecar is memory mapped and grown by preallocating a chunk of records at
+a time, thus appending the records of a run is a single array copy. A sidecar
+of a test which has not been closed, e.g. because it has been interrupted,
+can have some trailing preallocated records, which are all zeros and are
+discarded on loading.
+"""
+
+import os
+import numpy as np
+
+# The record of each instance: the number of instances and the run it belongs
+# to, its index, exit status, start and end times and the run time of its run
+# (both [s]), its task time [s], context switches, signals, user and system
+# time [s], maximum RSS [KB] and, if collected, its run-queue wait time and
+# CPU time [s], timeslices and migrations (mig)
+RECORD = np.dtype([
+    ("insts",  "i4"),
+    ("run",    "i4"),
+    ("inst",   "i4"),
+    ("status", "i4"),
+    ("start",  "f8"),
+    ("end",    "f8"),
+    ("rt",     "f8"),
+    ("tt",     "f8"),
+    ("ctxf",   "i8"),
+    ("ctxv",   "i8"),
+    ("sigc",   "i8"),
+    ("ut",     "f8"),
+    ("st",     "f8"),
+    ("rss",    "i8"),
+    ("rqd",    "f8"),
+    ("cpu",    "f8"),
+    ("slices", "i8"),
+    ("mig",    "i8"),
+])
+
+# The number of records preallocated at a time
+CHUNK = 65536
+
+def raw_path(fname):
+    """Get the raw samples sidecar of a test data file"""
+    return os.path.splitext(fname)[0] + ".raw"
+
+class RawWriter():
+    def __init__(self, fname, count=0, chunk=CHUNK):
+        """Open a sidecar, appending after its first count records"""
+        self.fname = fname
+        self.count = count
+        self.chunk = chunk
+        self.capacity = 0
+        self.records = None
+        self.fraw = open(fname, "r+b" if os.path.exists(fname) else "w+b")
+        self.reserve(count)
+
+    def reserve(self, count):
+        """Make room for at least count records, mapping them"""
+        if (count <= self.capacity and self.records is not None):
+            return
+        self.capacity = max(count, self.capacity + self.chunk)
+        if self.records is not None:
+            self.records.flush()
+        self.fraw.truncate(self.capacity * RECORD.itemsize)
+        self.records = np.memmap(self.fraw, RECORD, "r+", shape=(self.capacity,))
+
+    def append(self, records):
+        """Append an array of records"""
+        self.reserve(self.count + len(records))
+        self.records[self.count:self.count + len(records)] = records
+        self.count += len(records)
+
+    def flush(self):
+        self.records.flush()
+
+    def close(self):
+        """Flush the records, releasing the preallocated space"""
+        if self.records is None:
+            return
+        self.records.flush()
+        self.records = None
+        self.fraw.truncate(self.count * RECORD.itemsize)
+        self.fraw.close()
+
+def load(fname):
+    """Map the records of a sidecar, but the preallocated ones"""
+    if os.path.getsize(fname) == 0:
+        return np.zeros(0, RECORD)
+    records = np.memmap(fname, RECORD, "r")
+    return records[records["insts"] > 0]
+
+def samples(records, insts, metric):
+    """Get the samples of a metric for a number of instances
+
+    Only the samples of instances which completed successfully are
+    returned; the run time has a single sample per run."""
+    records = records[(records["insts"] == insts) & (records["status"] == 0)]
+    if metric == "rt":
+        records = records[np.unique(records["run"], return_index=True)[1]]
+    return np.asarray(records[metric])
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,321 @@
+#!/usr/bin/python
+""" Indexed Results Store
+
+Licensed under the terms of the GNU GPL License version 2
+
+Collect the results of the benchmarks and of the trace analyses into a single
+SQLite database, to select and compare them across runs without parsing again
+their data files.
+
+Two kinds of files are ingested:
+- the test_<SCHED>_<DATE>_<LABEL>.dat files of sched_test.py: the header
+  metadata of each test goes into the "tests" table, where the scheduler,
+  governor, frequency, kernel, CPUs and tag are indexed, while its rows go
+  into "test_rows", one typed column for each column of the data file
+- the <SCHED>_table_<TAG>_C<CPU>_<KIND>.dat tables of dump_tables.sh: the
+  metadata of each table goes into the "tables" table, while its rows go into
+  the "table_<KIND>" table, typed according to the trace_tables schemas
+  (the wakeup_latencies ones into "table_latencies"), while the tables with
+  no schema, e.g. the ctxrate and migstats reports, are skipped
+
+Each file is identified by its path and re-ingested only if its content has
+changed, thus a whole results folder can be ingested again at any time.
+For example, the PerfPIPE runs under CBS with the performance governor are:
+    SELECT r.* FROM tests t JOIN test_rows r ON r.test_id = t.id
+        WHERE t.label = 'PerfPIPE' AND t.scheduler = 'CBS'
+          AND t.governor = 'performance'
+
+Usage: results_db.py [-d DB] [-t TAG] FILE...
+       results_db.py [-d DB] -q QUERY
+
+  -d, --db      the database file (default: results.db)
+  -t, --tag     the tag of the ingested tests (default: none)
+  -q, --query   run an SQL query, printing its rows tab separated
+"""
+
+import os
+import re
+import sys
+import getopt
+import sqlite3
+import trace_tables
+import trace_cache
+
+# The default database file
+DB_FILE = "results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (
+    id          INTEGER PRIMARY KEY,
+    fname       TEXT UNIQUE,
+    digest      TEXT,
+    label       TEXT,
+    description TEXT,
+    scheduler   TEXT,
+    instances   INTEGER,
+    runs        INTEGER,
+    cpus        INTEGER,
+    kernel      TEXT,
+    governor    TEXT,
+    frequency   INTEGER,
+    date        TEXT,
+    raw         TEXT,
+    tag         TEXT
+);
+CREATE INDEX IF NOT EXISTS tests_label ON tests (label, scheduler);
+CREATE INDEX IF NOT EXISTS tests_platform ON tests (governor, frequency, kernel, cpus);
+CREATE INDEX IF NOT EXISTS tests_tag ON tests (tag);
+
+CREATE TABLE IF NOT EXISTS test_rows (
+    test_id     INTEGER REFERENCES tests (id),
+    instances   INTEGER
+);
+CREATE INDEX IF NOT EXISTS test_rows_test ON test_rows (test_id, instances);
+
+CREATE TABLE IF NOT EXISTS tables (
+    id          INTEGER PRIMARY KEY,
+    fname       TEXT UNIQUE,
+    digest      TEXT,
+    kind        TEXT,
+    scheduler   TEXT,
+    tag         TEXT,
+    cpu         TEXT
+);
+CREATE INDEX IF NOT EXISTS tables_kind ON tables (kind, scheduler, tag, cpu);
+"""
+
+# The test metadata reported by the data file header
+TEST_HEADER = {
+    "Benchmark":              ("label",     str),
+    "Scheduler":              ("scheduler", str),
+    "Maximum instances":      ("instances", int),
+    "Number or runs":         ("runs",      int),
+    "Number of CPUs":         ("cpus",      int),
+    "Kernel":                 ("kernel",    str),
+    "CPUfreq governor":       ("governor",  str),
+    "CPUfreq frequency (Hz)": ("frequency", int),
+    "Test date":              ("date",      str),
+    "Raw samples":            ("raw",       str),
+}
+
+# The name of the tables dumped by dump_tables.sh
+TABLE_NAME = re.compile(r"(?P<scheduler>[^_/]+)_table_(?P<tag>.+)_C(?P<cpu>[^_]+)_(?P<kind>[a-z_]+)\.dat$")
+
+# The schema of the tables whose kind is not a trace_tables one
+TABLE_SCHEMAS = {
+    "wakeup_latencies": "latencies",
+}
+
+# SQL types of the trace_tables column types
+SQL_TYPES = {"i": "INTEGER", "f": "REAL", "s": "TEXT"}
+
+def sql_type(ctype):
+    if ctype == "str":
+        return "TEXT"
+    return SQL_TYPES[ctype[0]]
+
+def quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+def parse_test(fname):
+    """Get the metadata, the column names and the rows of a test data file"""
+    meta = {}
+    names = None
+    rows = []
+    with open(fname) as fin:
+        lines = fin.readlines()
+    for (i, line) in enumerate(lines):
+        if not line.startswith("#"):
+            if line.strip():
+                rows.append([int(line.split()[0])] +
+                        [float(v) for v in line.split()[1:]])
+            continue
+        if ":" in line:
+            (key, value) = [s.strip() for s in line[1:].split(":", 1)]
+            if key in TEST_HEADER:
+                (column, ctype) = TEST_HEADER[key]
+                try:
+                    meta[column] = ctype(value) if value else None
+                except ValueError:
+                    meta[column] = value
+                if key == "Benchmark" and i+1 < len(lines):
+                    meta["description"] = lines[i+1][1:].strip()
+            continue
+        # The names of the data columns, followed by a separator line
+        if i+1 < len(lines) and lines[i+1].startswith("#="):
+            names = line[1:].split()
+    if names is None:
+        raise ValueError("Not a test data file: " + fname)
+    if (meta.get("date") or "").startswith("./"):
+        meta["date"] = meta["date"][2:]
+    # The first column is the number of instances
+    return (meta, ["instances"] + names[1:], rows)
+
+class ResultsDB():
+    def __init__(self, fname=DB_FILE):
+        self.fname = fname
+        self.db = sqlite3.connect(fname)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def columns(self, table):
+        return [row[1] for row in self.db.execute("PRAGMA table_info(%s)" % quote(table))]
+
+    def add_columns(self, table, columns):
+        """Add the typed columns which a table does not have yet"""
+        existing = set(self.columns(table))
+        for (name, ctype) in columns:
+            if name not in existing:
+                self.db.execute("ALTER TABLE %s ADD COLUMN %s %s" % (
+                    quote(table), quote(name), ctype))
+
+    def insert(self, table, columns, rows):
+        self.db.executemany("INSERT INTO %s (%s) VALUES (%s)" % (quote(table),
+            ", ".join(quote(c) for c in columns), ", ".join("?" * len(columns))),
+            rows)
+
+    def lookup(self, table, fname, digest):
+        """Get the id of an ingested file, None if it has to be ingested"""
+        row = self.db.execute("SELECT id, digest FROM %s WHERE fname = ?" % table,
+                (fname,)).fetchone()
+        if row is None:
+            return (False, None)
+        return (row[1] == digest, row[0])
+
+    def add_test(self, fname, tag=None):
+        """Ingest a test data file, returning its id"""
+        fname = os.path.abspath(fname)
+        digest = trace_cache.file_digest(fname)
+        (current, test_id) = self.lookup("tests", fname, digest)
+        if current:
+            return test_id
+
+        (meta, names, rows) = parse_test(fname)
+        with self.db:
+            if test_id is not None:
+                self.db.execute("DELETE FROM test_rows WHERE test_id = ?", (test_id,))
+                self.db.execute("DELETE FROM tests WHERE id = ?", (test_id,))
+            meta.update({"fname": fname, "digest": digest, "tag": tag})
+            columns = sorted(meta)
+            self.insert("tests", columns, [[meta[c] for c in columns]])
+            test_id = self.db.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+            self.add_columns("test_rows", [(name, "INTEGER" if name == "runs" else "REAL")
+                for name in names[1:]])
+            self.insert("test_rows", ["test_id"] + names,
+                    [[test_id] + row for row in rows])
+        return test_id
+
+    def add_table(self, fname):
+        """Ingest a trace table, returning its id"""
+        match = TABLE_NAME.search(os.path.basename(fname))
+        if match is None:
+            raise ValueError("Not a trace table: " + fname)
+        fname = os.path.abspath(fname)
+        digest = trace_cache.file_digest(fname)
+        (current, table_id) = self.lookup("tables", fname, digest)
+        if current:
+            return table_id
+
+        meta = match.groupdict()
+        kind = TABLE_SCHEMAS.get(meta["kind"], meta["kind"])
+        if kind not in trace_tables.SCHEMAS:
+            raise ValueError("No schema for the %s table: %s" % (meta["kind"], fname))
+        table = trace_tables.Table(fname, kind)
+        schema = trace_tables.SCHEMAS[kind]["columns"]
+        rows_table = "table_" + kind
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS %s (table_id INTEGER REFERENCES tables (id))" %
+                    quote(rows_table))
+            self.db.execute("CREATE INDEX IF NOT EXISTS %s ON %s (table_id)" % (
+                    quote(rows_table + "_table"), quote(rows_table)))
+            self.add_columns(rows_table, [(name, sql_type(ctype)) for (name, ctype) in schema])
+            if table_id is not None:
+                self.db.execute("DELETE FROM %s WHERE table_id = ?" % quote(rows_table), (table_id,))
+                self.db.execute("DELETE FROM tables WHERE id = ?", (table_id,))
+            meta.update({"fname": fname, "digest": digest})
+            columns = sorted(meta)
+            self.insert("tables", columns, [[meta[c] for c in columns]])
+            table_id = self.db.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+            values = []
+            for (name, ctype) in schema:
+                if ctype == "str":
+                    values.append([str(s) for s in table.labels(name)])
+                else:
+                    values.append(table[name].tolist())
+            self.insert(rows_table, ["table_id"] + [c[0] for c in schema],
+                    ([table_id] + list(row) for row in zip(*values)))
+        return table_id
+
+    def add(self, fname, tag=None):
+        """Ingest either a test data file or a trace table"""
+        if TABLE_NAME.search(os.path.basename(fname)):
+            return self.add_table(fname)
+        return self.add_test(fname, tag)
+
+    def query(self, sql, params=()):
+        """Run a query, returning its column names and rows"""
+        cursor = self.db.execute(sql, params)
+        return ([c[0] for c in cursor.description or ()], cursor.fetchall())
+
+################################################################################
+#   Main
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    db_file = DB_FILE
+    tag = None
+    sql = None
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "d:ht:q:", ["db=", "help", "tag=", "query="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-d", "--db"):
+                db_file = a
+            if o in ("-t", "--tag"):
+                tag = a
+            if o in ("-q", "--query"):
+                sql = a
+        if sql is None and not args:
+            raise Usage("no files to ingest")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    db = ResultsDB(db_file)
+    if sql is not None:
+        (names, rows) = db.query(sql)
+        sys.stdout.write("\t".join(names) + "\n")
+        for row in rows:
+            sys.stdout.write("\t".join(str(v) for v in row) + "\n")
+        db.close()
+        return 0
+
+    errors = 0
+    for fname in args:
+        try:
+            db.add(fname, tag)
+        except (IOError, ValueError, KeyError) as err:
+            sys.stderr.write("Skipping %s: %s\n" % (fname, err))
+            errors += 1
+    db.close()
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -12,7 +12,7 @@ if [[ "$TESTS" == all || "$TESTS" == *mig* || "$TESTS" == kbuild_small ]]; then
   TAG="MIG-KBUILD_SMALL" \
   TARGET="kernel/" \
   BENCH="./tests/kernel_build.sh" \
-  EVENTS="sched:sched_migrate_task sched:sched_process_fork sched:sched_process_exec sched:sched_wakeup sched:sched_wakeup_new" \
+  EVENTS="sched:sched_migrate_task sched:sched_process_fork sched:sched_process_exec sched:sched_wakeup sched:sched_wakeup_new sched:sched_switch" \
   chrt -f 12 ./trace_compare.sh
 fi
 
@@ -22,7 +22,7 @@ if [[ "$TESTS" == all || "$TESTS" == *mig* || "$TESTS" == kbuild_full ]]; then
   TAG="MIG-KBUILD_FULL" \
   TARGET="vmlinux" \
   BENCH="./tests/kernel_build.sh" \
-  EVENTS="sched:sched_migrate_task sched:sched_process_fork sched:sched_process_exec sched:sched_wakeup sched:sched_wakeup_new" \
+  EVENTS="sched:sched_migrate_task sched:sched_process_fork sched:sched_process_exec sched:sched_wakeup sched:sched_wakeup_new sched:sched_switch" \
   chrt -f 12 ./trace_compare.sh
 fi
 
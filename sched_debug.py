@@ -0,0 +1,205 @@
+#!/usr/bin/python
+""" Scheduler Debug Sampler
+
+Licensed under the terms of the GNU GPL License version 2
+
+Sample /proc/sched_debug at a fixed rate, recording the fields of every
+section of each CPU, i.e. the CPU itself and its cfs_rq, rt_rq and cbs_rq
+run queues (including the ones of task groups), as a time series.
+
+Each field is a column named by its section, CPU and (task group) path, e.g.
+    cpu3.nr_switches  cfs_rq3.min_vruntime  cfs_rq3:autogroup-12.load
+    rt_rq3.rt_time    cbs_rq3.nr_running
+the columns being the fields found by the first sample. Samples are kept into
+a preallocated ring buffer, thus sampling at a high rate for a long time has
+a bounded memory footprint, the oldest samples being overwritten. At exit,
+e.g. on SIGINT or SIGTERM, the samples are dumped in columnar format (see
+trace_tables), with the sampling time into the "Time" column.
+
+Any captured copy of sched_debug can be sampled too, e.g. to check the
+parser against fixture files.
+
+Usage: sched_debug.py [-r RATE] [-n SAMPLES] [-f FILE] [-c COUNT] OUTPUT
+
+  -r, --rate     samples per second (default: 10)
+  -n, --samples  size of the ring buffer (default: 100000)
+  -f, --file     the sched_debug file (default: /proc/sched_debug, or
+                 /sys/kernel/debug/sched/debug on newer kernels)
+  -c, --count    stop after COUNT samples (default: until terminated)
+"""
+
+import os
+import re
+import sys
+import time
+import signal
+import getopt
+import numpy as np
+import trace_tables
+
+# The sched_debug file, moved into debugfs by newer kernels
+SCHED_DEBUG = "/proc/sched_debug"
+SCHED_DEBUG_FS = "/sys/kernel/debug/sched/debug"
+
+# The start of a CPU section or of one of its run queues, e.g.
+#   cpu#3, 2394.230 MHz
+#   cfs_rq[3]:/autogroup-12
+SECTION = re.compile(r"^(?:cpu#(\d+)|(\w+_rq)\[(\d+)\]:?(\S*))")
+# A field of the current section, e.g.
+#   .nr_running                    : 1
+FIELD = re.compile(r"^\s+\.(\S+)\s*:\s*(-?[0-9.]+)\s*$")
+
+def default_file():
+    if os.path.exists(SCHED_DEBUG) or not os.path.exists(SCHED_DEBUG_FS):
+        return SCHED_DEBUG
+    return SCHED_DEBUG_FS
+
+def parse(text):
+    """Get the numeric fields of each CPU section, as a {column: value} dict
+
+    The global sections (e.g. sysctl_sched) and the runnable tasks lists are
+    skipped."""
+    fields = {}
+    prefix = None
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        match = SECTION.match(line)
+        if match:
+            (cpu, rq, rq_cpu, group) = match.groups()
+            if cpu is not None:
+                prefix = "cpu" + cpu
+            else:
+                prefix = rq + rq_cpu
+                group = group.strip("/").replace("/", ":")
+                if group:
+                    prefix += ":" + group
+            continue
+        if not line.startswith(" "):
+            prefix = None
+            continue
+        if prefix is None:
+            continue
+        match = FIELD.match(line)
+        if match:
+            fields[prefix + "." + match.group(1)] = float(match.group(2))
+    return fields
+
+class Sampler():
+    def __init__(self, fname=None, samples=100000):
+        self.fname = fname or default_file()
+        self.capacity = samples
+        self.names = None
+        self.index = None
+        self.time = np.zeros(samples, np.float64)
+        self.values = None
+        self.count = 0
+
+    def sample(self):
+        """Add a sample of the sched_debug fields"""
+        stamp = time.time()
+        with open(self.fname) as fin:
+            fields = parse(fin.read())
+        if self.names is None:
+            # The columns are the fields of the first sample
+            self.names = sorted(fields)
+            self.index = dict((name, i) for (i, name) in enumerate(self.names))
+            self.values = np.zeros((self.capacity, len(self.names)), np.float64)
+
+        slot = self.count % self.capacity
+        row = self.values[slot]
+        row.fill(np.nan)
+        for (name, value) in fields.items():
+            i = self.index.get(name)
+            if i is not None:
+                row[i] = value
+        self.time[slot] = stamp
+        self.count += 1
+
+    def run(self, rate, count=0):
+        """Sample at a rate, until count samples or terminated"""
+        period = 1.0 / rate
+        deadline = time.time()
+        while (count == 0 or self.count < count) and not terminated:
+            self.sample()
+            # Sample on a fixed grid, skipping the missed periods
+            deadline += period
+            now = time.time()
+            if (deadline < now):
+                deadline += period * int((now - deadline) / period + 1)
+            time.sleep(max(deadline - now, 0))
+
+    def get_samples(self):
+        """Get the sampling times and the samples, the oldest first"""
+        if self.names is None:
+            return (np.zeros(0), np.zeros((0, 0)))
+        rows = min(self.count, self.capacity)
+        order = (np.arange(rows) + max(self.count - self.capacity, 0)) % self.capacity
+        return (self.time[order], self.values[order])
+
+    def dump(self, path):
+        """Dump the samples into a columnar table"""
+        (stamps, values) = self.get_samples()
+        arrays = {"Time": stamps}
+        names = ["Time"] + (self.names or [])
+        for (i, name) in enumerate(self.names or []):
+            arrays[name] = np.ascontiguousarray(values[:, i])
+        trace_tables.write_columnar(path, "sched_debug", names, arrays)
+
+################################################################################
+#   Main
+################################################################################
+
+# Set by SIGINT and SIGTERM, to stop sampling
+terminated = False
+
+def terminate(signum, frame):
+    global terminated
+    terminated = True
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    rate = 10.0
+    samples = 100000
+    fname = None
+    count = 0
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "c:f:hn:r:",
+                    ["count=", "file=", "help", "samples=", "rate="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-c", "--count"):
+                count = int(a)
+            if o in ("-f", "--file"):
+                fname = a
+            if o in ("-n", "--samples"):
+                samples = int(a)
+            if o in ("-r", "--rate"):
+                rate = float(a)
+        if len(args) != 1:
+            raise Usage("the output table is required")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    signal.signal(signal.SIGINT, terminate)
+    signal.signal(signal.SIGTERM, terminate)
+    sampler = Sampler(fname, samples)
+    sampler.run(rate, count)
+    sampler.dump(args[0])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -18,10 +18,15 @@ import time
 import platform
 import multiprocessing
 import logging
+import json
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as gs
 from datetime import datetime
+from stats import Stats, LogHistogram
+from launcher import Launcher, parse_cpus, SCHED_NORMAL, SCHED_CBS
+from results_db import ResultsDB
+from raw_samples import RawWriter, RECORD, raw_path
 
 ################################################################################
 ### Initialization and Environment Checking
@@ -89,73 +94,41 @@ conf_runs = 1
 conf_show = 0
 conf_trgt = 0
 conf_verb = 0
-
-
-################################################################################
-### Samples Collection and Statistics
-################################################################################
-
-class Stats():
-    def __init__(self):
-        self.ssum   = .0
-        self.ssum2  = .0
-        self.scount =  0
-
-    def do_stats(self):
-        self.savg = (self.ssum  / self.scount)
-        self.svar = (self.ssum2 / self.scount) - (self.savg * self.savg)
-        self.sstd = (math.sqrt(self.svar))
-        self.sste = (self.sstd / math.sqrt(self.scount))
-        self.sc95 = (1.96 * self.sste)
-        self.sc99 = (2.58 * self.sste)
-
-    def set_data(self, ssum, ssum2, scount):
-        self.ssum   = ssum
-        self.ssum2  = ssum2
-        self.scount = scount
-        self.do_stats()
-
-    def add_sample(self, sample):
-        self.ssum   += sample
-        self.ssum2  += (sample * sample)
-        self.scount += 1
-
-    def get_count(self):
-        return self.scount
-
-    def get_avg(self):
-        return self.savg
-
-    def get_var(self):
-        return self.svar
-
-    def get_std(self):
-        return self.std
-
-    def get_ste(self):
-        return self.ste
-
-    def get_c95(self):
-        return self.sc95
-
-    def get_c99(self):
-        return self.sc99
-
-    def get_stats(self):
-        self.do_stats()
-        return (self.scount, self.savg, self.svar, self.sstd, self.sste, self.sc95, self.sc99)
-
+conf_exec = 0
+# Adaptive runs: stop once the CI99 of task and run times, relative to their
+# average, is below this target (0 to always do all the runs)...
+conf_ci99 = 0.0
+# ... but not before this number of runs
+conf_rmin = 3
+# Adaptive sweep: test a geometric series of instances, refining the intervals
+# where the normalized slope of run time or unfairness changes more than this
+# (0 to test each number of instances)
+conf_swep = 0.0
+# The data file of a checkpointed test to resume
+conf_rsme = None
+# The results database tests are stored into, once completed
+conf_rsdb = None
+# 1: keep the raw samples of each instance, 0: keep just their statistics
+conf_keep = 0
+# The sched_debug sampling rate [Hz] while testing, 0 to disable sampling
+conf_sdbg = 0
+# 1: collect the scheduling statistics of each instance, 0: skip them
+conf_sstt = 0
 
 
 ################################################################################
 ### Test Configuration, Execution and Plotting
 ################################################################################
 
+class ResumeError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
 class Test():
     def __init__(
             self, label="A Test Name", description="A Test Description",
-            command=(), instances=-1, runs=30, sched="cfs"):
-        """Configured a new test"""
+            command=(), instances=-1, runs=30, sched="cfs", resume=None):
+        """Configured a new test, or a checkpointed one to be resumed"""
 
         if (instances == -1):
             instances = 4 * cpuCores
@@ -169,14 +142,22 @@ class Test():
         self.sched   = sched.upper()
         if (self.sched == "CFS"):
             self.sched_switch="-o"
+            self.sched_policy=SCHED_NORMAL
         else:
             self.sched_switch="-c"
+            self.sched_policy=SCHED_CBS
+        self.cpus = parse_cpus(conf_trgt)
 
-        # setup temporary data file
-        self.timestamp = datetime.fromtimestamp(time.time())
+        # setup temporary data file, or the one of the resumed test
+        if resume is None:
+            self.timestamp = datetime.fromtimestamp(time.time())
+        else:
+            self.timestamp = datetime.strptime(resume["timestamp"], "%Y%m%d_%H%M%S")
         self.strtstamp  = self.timestamp.strftime("%Y%m%d_%H%M%S")
         self.fname = self.timestamp.strftime("./test_"+self.sched+"_"+self.strtstamp+"_"+self.label+".dat")
-        self.fdata = open(self.fname, "w")
+        if resume is not None:
+            self.fname = resume["fname"]
+        self.fckpt = self.fname.replace(".dat", ".ckpt")
 
         # Setup Test Timestamping report format
         self.time_values =  "Real  CtxF  CtxV  Sig"
@@ -191,23 +172,96 @@ class Test():
         self.cpufreqcur = subprocess.Popen(["cat",
             "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"],
                     stdout=subprocess.PIPE).stdout.readline().rstrip()
+        # The frequency range of the governor, and the frequency set by the
+        # userspace one, which (unlike the current one) do not change at run
+        # time
+        self.cpufreqmin = subprocess.Popen(["cat",
+            "/sys/devices/system/cpu/cpu0/cpufreq/scaling_min_freq"],
+                    stdout=subprocess.PIPE).stdout.readline().rstrip()
+        self.cpufreqmax = subprocess.Popen(["cat",
+            "/sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq"],
+                    stdout=subprocess.PIPE).stdout.readline().rstrip()
+        self.cpufreqset = ""
+        if (self.cpufreqgov == "userspace"):
+            self.cpufreqset = subprocess.Popen(["cat",
+                "/sys/devices/system/cpu/cpu0/cpufreq/scaling_setspeed"],
+                        stdout=subprocess.PIPE).stdout.readline().rstrip()
+        self.kernel = platform.release()
+
+        # The (instances, row, task time, run time) of the completed rows, and
+        # the accumulators of the row being measured
+        self.done = []
+        self.current = None
+        if resume is not None:
+            # A test can be resumed only on the same platform configuration,
+            # but what the checkpoint does not report
+            for (key, value) in self.get_platform().items():
+                if (resume["platform"].get(key, value) != value):
+                    raise ResumeError("Cannot resume %s: %s changed (%s => %s)" % (
+                        self.fname, key, resume["platform"][key], value))
+            self.done = resume["rows"]
+            self.current = resume["current"]
+
+        self.fdata = open(self.fname, "w")
+
+        # The raw samples sidecar, continued after the checkpointed runs
+        self.raw = None
+        if (conf_keep):
+            self.raw = RawWriter(raw_path(self.fname),
+                    resume["raw"] if resume is not None else 0)
 
         self.metrics = ("tt", "rt", "ctxf", "ctxv", "sigc")
+        # Metrics whose percentiles are reported too
+        self.pmetrics = ("tt", "rt")
 
     def __del__(self):
-        self.fdata.close()
+        if hasattr(self, "fdata"):
+            self.fdata.close()
+
+    def get_platform(self):
+        return {
+            "cpus":      self.cpuscount,
+            "governor":  self.cpufreqgov,
+            "min_freq":  self.cpufreqmin,
+            "max_freq":  self.cpufreqmax,
+            "set_freq":  self.cpufreqset,
+            "kernel":    self.kernel,
+        }
+
+    def checkpoint(self):
+        """Save the state required to resume the test after the last run"""
+        state = {
+            "label":     self.label,
+            "desc":      self.desc,
+            "command":   self.command,
+            "insts":     self.insts,
+            "runs":      self.runs,
+            "sched":     self.sched,
+            "timestamp": self.strtstamp,
+            "fname":     self.fname,
+            "conf":      get_conf(),
+            "platform":  self.get_platform(),
+            "rows":      self.done,
+            "current":   self.current,
+            "raw":       self.raw.count if self.raw is not None else 0,
+        }
+        with open(self.fckpt + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.rename(self.fckpt + ".tmp", self.fckpt)
 
     def test(self):
-        """Run one instance of the configured test and collect generated output"""
-        # /usr/bin/time -f "$TIME_FORMAT" <TEST> 2>&1 | tail -n1
-        self.perf_insts.append(subprocess.Popen(
-            ["taskset", "-c", conf_trgt ] +
-            ["/usr/bin/time", "-f", self.time_format ] +
-            ["/home/derkling/bin/chrt", self.sched_switch, "0"] +
-            self.command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=False))
+        """Spawn one instance of the configured test, blocked until the launcher releases it"""
+        if (conf_exec):
+            # /usr/bin/time -f "$TIME_FORMAT" <TEST> 2>&1 | tail -n1
+            self.launcher.add(
+                ["taskset", "-c", str(conf_trgt) ] +
+                ["/usr/bin/time", "-f", self.time_format ] +
+                ["/home/derkling/bin/chrt", self.sched_switch, "0"] +
+                self.command)
+            return
+        # Affinity and policy are set by the instance itself, resources
+        # usage is collected by wait4
+        self.launcher.add(self.command, self.cpus, self.sched_policy)
 
     def dump(self):
         """ Generate a test header and dump it on console"""
@@ -218,7 +272,16 @@ class Test():
         self.fdata.write("# Scheduler              : %s\n" % (self.sched))
         self.fdata.write("# Maximum instances      : %d\n" % (self.insts))
         self.fdata.write("# Number or runs         : %d\n" % (self.runs))
+        if (conf_ci99 > 0):
+            self.fdata.write("# Runs CI99 target       : %.2f%% (min %d runs)\n" % (100 * conf_ci99, conf_rmin))
+        if (conf_swep > 0):
+            self.fdata.write("# Adaptive sweep slope   : %.2f\n" % (conf_swep))
+        if (self.raw is not None):
+            self.fdata.write("# Raw samples            : %s\n" % (self.raw.fname))
+        if (conf_sstt):
+            self.fdata.write("# Scheduling statistics  : /proc/<pid>/schedstat\n")
         self.fdata.write("# Number of CPUs         : %d\n" % (self.cpuscount))
+        self.fdata.write("# Kernel                 : %s\n" % (self.kernel))
         self.fdata.write("# CPUfreq governor       : %s\n" % (self.cpufreqgov))
         self.fdata.write("# CPUfreq frequency (Hz) : %s\n" % (self.cpufreqcur))
         self.fdata.write("# Test date              : %s\n" % (self.timestamp.strftime('./%Y-%m-%d %H:%M:%S')))
@@ -232,6 +295,13 @@ class Test():
         fheader = "# paris"
         for m in self.metrics:
             fheader += " %8.7s_avg %7.6s_var %7.6s_std %7.6s_ste %7.6s_c95 %7.6s_c99" % (m, m, m, m, m, m)
+        for m in self.pmetrics:
+            fheader += " %8.7s_p50 %7.6s_p90 %7.6s_p99 %6.5s_p999 %7.6s_max" % (m, m, m, m, m)
+        fheader += " %8.7s_avg %7.6s_max" % ("skew", "skew")
+        fheader += " %8.7s_avg %7.6s_c99 %7.6s_avg %7.6s_c99 %7.6s_avg %7.6s_max" % ("ut", "ut", "st", "st", "rss", "rss")
+        fheader += " %8.7s_avg %7.6s_c99 %7.6s_max %7.6s_avg %7.6s_max %7.6s_avg %7.6s_avg %7.6s_avg" % (
+                "rqd", "rqd", "rqd", "lat", "lat", "cpu", "slc", "mig")
+        fheader += " %11s" % "runs"
         self.fdata.write(fheader+"\n")
         self.fdata.write("#"+"="*(len(fheader)-1)+"\n")
 
@@ -239,82 +309,330 @@ class Test():
         cheader = "# paris"
         for m in self.metrics:
             cheader += " %8.7s_avg %7.6s_c99" % (m, m)
+        for m in self.pmetrics:
+            cheader += " %8.7s_p50 %7.6s_p90 %7.6s_p99 %6.5s_p999 %7.6s_max" % (m, m, m, m, m)
+        cheader += " %8.7s_avg %7.6s_max" % ("skew", "skew")
+        cheader += " %8.7s_avg %7.6s_c99 %7.6s_avg %7.6s_c99 %7.6s_avg %7.6s_max" % ("ut", "ut", "st", "st", "rss", "rss")
+        cheader += " %8.7s_avg %7.6s_c99 %7.6s_max %7.6s_avg %7.6s_max %7.6s_avg %7.6s_avg %7.6s_avg" % (
+                "rqd", "rqd", "rqd", "lat", "lat", "cpu", "slc", "mig")
+        cheader += " %11s" % "runs"
         print cheader
         print "#"+"="*(len(cheader)-1)
 
+    def converged(self, stats):
+        """Check if the task and run times relative CI99 are below the target"""
+        for s in ('tt', 'rt'):
+            (count, avg, var, std, ste, c95, c99) = stats[s].get_stats()
+            if (count < 2 or avg <= 0 or (c99 / avg) > conf_ci99):
+                return False
+        return True
+
+    def measure(self, insts):
+        """Run the configured test for a number of instances, and report its statistics
+
+        Returns the average task and run times."""
+
+        # Rows completed before resuming the test are not measured again
+        for (done_insts, row, tt_avg, rt_avg) in self.done:
+            if (done_insts == insts):
+                return (tt_avg, rt_avg)
+
+        print "%7d ...\r" % (insts),
+
+        # reset total time counter
+        stats = {}
+        stats["tt"] = Stats()
+        stats["rt"] = Stats()
+        stats["tf"] = Stats()
+        stats["tv"] = Stats()
+        stats["ts"] = Stats()
+        # and task/run time distributions, at [us] resolution
+        hists = {}
+        hists["tt"] = LogHistogram(1e-6)
+        hists["rt"] = LogHistogram(1e-6)
+        # and instances start skew
+        stats["sk"] = Stats()
+        sk_max = 0.0
+        # and task user/system time and max RSS
+        stats["ut"] = Stats()
+        stats["st"] = Stats()
+        stats["rs"] = Stats()
+        rs_max = 0
+        # and task run-queue delay, delay per timeslice, CPU time,
+        # timeslices and migrations
+        stats["rq"] = Stats()
+        stats["lt"] = Stats()
+        stats["cp"] = Stats()
+        stats["sl"] = Stats()
+        stats["mg"] = Stats()
+        (rq_max, lt_max) = (0.0, 0.0)
+
+        # Continue from the last checkpointed run, if resuming this row
+        runs = 0
+        if (self.current is not None and self.current["insts"] == insts):
+            runs = self.current["runs"]
+            for (s, state) in self.current["stats"].items():
+                stats[s].set_state(state)
+            for (s, state) in self.current["hists"].items():
+                hists[s].set_state(state)
+            (sk_max, rs_max) = (self.current["sk_max"], self.current["rs_max"])
+            (rq_max, lt_max) = (self.current["rq_max"], self.current["lt_max"])
+
+        # A row checkpointed after its last run, yet not reported, is not run
+        # again once its restored runs have already converged
+        last = self.runs
+        if (conf_ci99 > 0 and runs >= conf_rmin and self.converged(stats)):
+            last = runs
+
+        # and the raw samples of each run
+        if (self.raw is not None):
+            raw = np.zeros(insts, RECORD)
+
+        for run in range(runs, last):
+            # setup insts list
+            self.launcher = Launcher()
+
+            for task in range(insts):
+                self.test()
+
+            # run time is accounted since all the instances are released
+            rt_start = self.launcher.release()
+
+            # wait for all the tasks to finish and ...
+            self.launcher.wait_all(conf_sstt)
+
+            for (i, p) in enumerate(self.launcher.instances):
+                if (p.returncode != 0):
+                    logging.warning("Instance %d failed (%d): %s",
+                            p.pid, p.returncode, p.stderr.read().strip())
+                    if (self.raw is not None):
+                        raw[i] = (insts, run, i, p.returncode,
+                                p.start or np.nan, p.end, 0.0, np.nan, 0, 0, 0,
+                                p.rusage.ru_utime, p.rusage.ru_stime, p.rusage.ru_maxrss,
+                                0.0, 0.0, 0, 0)
+                    continue
+
+                # ... collect task execution time and their sum
+                if (conf_exec):
+                    time_str = p.stderr.readline()
+                    (ttime, tctxf, tctxv, tsigc) = [t(s) for t,s in zip((float,int,int,int), time_str.split())]
+                else:
+                    ttime = p.get_elapsed()
+                    (tctxf, tctxv, tsigc) = (p.rusage.ru_nivcsw,
+                            p.rusage.ru_nvcsw, p.rusage.ru_nsignals)
+
+                # Add samples to statistics
+                stats["tt"].add_sample(ttime)
+                hists["tt"].add_sample(ttime)
+                stats["tf"].add_sample(tctxf)
+                stats["tv"].add_sample(tctxv)
+                stats["ts"].add_sample(tsigc)
+                stats["ut"].add_sample(p.rusage.ru_utime)
+                stats["st"].add_sample(p.rusage.ru_stime)
+                stats["rs"].add_sample(p.rusage.ru_maxrss)
+                rs_max = max(rs_max, p.rusage.ru_maxrss)
+                (rqd, cpu, slices, migrations) = (0.0, 0.0, 0, 0)
+                if (p.schedstat is not None):
+                    (rqd, cpu, slices, migrations) = (p.schedstat["delay"],
+                            p.schedstat["cpu"], p.schedstat["slices"],
+                            p.schedstat["migrations"])
+                    lat = rqd / max(slices, 1)
+                    stats["rq"].add_sample(rqd)
+                    stats["lt"].add_sample(lat)
+                    stats["cp"].add_sample(cpu)
+                    stats["sl"].add_sample(slices)
+                    stats["mg"].add_sample(migrations)
+                    (rq_max, lt_max) = (max(rq_max, rqd), max(lt_max, lat))
+                if (self.raw is not None):
+                    raw[i] = (insts, run, i, 0, p.start, p.end, 0.0,
+                            ttime, tctxf, tctxv, tsigc,
+                            p.rusage.ru_utime, p.rusage.ru_stime, p.rusage.ru_maxrss,
+                            rqd, cpu, slices, migrations)
+
+                #print "%9f => %9f" % (ttime, tt_sum)
+                #print "="*78
+
+            # Collect run execution time and their sum
+            rt_end   = time.time()
+            rtime    = (rt_end - rt_start)
+            stats["rt"].add_sample(rtime)
+            hists["rt"].add_sample(rtime)
+
+            # Collect the skew between the first and last instance start
+            skew = self.launcher.get_skew()
+            stats["sk"].add_sample(skew)
+            sk_max = max(sk_max, skew)
+
+            if (self.raw is not None):
+                raw["rt"] = rtime
+                self.raw.append(raw)
+                self.raw.flush()
+
+            # Checkpoint the accumulators after each run
+            runs = run+1
+            self.current = {
+                "insts":  insts,
+                "runs":   runs,
+                "stats":  dict((s, stats[s].get_state()) for s in stats),
+                "hists":  dict((s, hists[s].get_state()) for s in hists),
+                "sk_max": sk_max,
+                "rs_max": rs_max,
+                "rq_max": rq_max,
+                "lt_max": lt_max,
+            }
+            self.checkpoint()
+
+            # Stop once the required confidence has been reached
+            if (conf_ci99 > 0 and runs >= conf_rmin and self.converged(stats)):
+                break
+
+        # for run
+
+        fstats = "%7d " % (insts)
+        cstats = "%7d " % (insts)
+
+        for s in ('tt', 'rt', 'tf', 'tv', 'ts'):
+            (count, avg, var, std, ste, c95, c99) = stats[s].get_stats()
+
+            ffmt = "%12.1f %11.1f %11.1f %11.1f %11.1f %11.1f "
+            cfmt = "%12.1f %11.1f "
+            if (s=='tt' or s=='rt'):
+                ffmt = "%12.9f %11.9f %11.9f %11.9f %11.9f %11.9f "
+                cfmt = "%12.9f %11.9f "
+
+            # Format stats for logfile
+            fstats += ffmt % (avg, var, std, ste, c95, c99)
+            # Format stats for console
+            cstats += cfmt % (avg, c99)
+
+        for s in self.pmetrics:
+            # Format percentiles for both logfile and console
+            pstats = "%12.9f %11.9f %11.9f %11.9f %11.9f " % hists[s].get_percentiles()
+            fstats += pstats
+            cstats += pstats
+
+        # Format start skew for both logfile and console
+        sstats = "%12.9f %11.9f " % (stats["sk"].get_stats()[1], sk_max)
+        fstats += sstats
+        cstats += sstats
+
+        # Format resources usage for both logfile and console
+        (count, ut_avg, var, std, ste, c95, ut_c99) = stats["ut"].get_stats()
+        (count, st_avg, var, std, ste, c95, st_c99) = stats["st"].get_stats()
+        ustats = "%12.9f %11.9f %11.9f %11.9f %11.1f %11d " % (ut_avg, ut_c99,
+                st_avg, st_c99, stats["rs"].get_stats()[1], rs_max)
+        fstats += ustats
+        cstats += ustats
+
+        # Format scheduling statistics for both logfile and console
+        (count, rq_avg, var, std, ste, c95, rq_c99) = stats["rq"].get_stats()
+        qstats = "%12.9f %11.9f %11.9f %11.9f %11.9f %11.9f %11.1f %11.1f " % (
+                rq_avg, rq_c99, rq_max, stats["lt"].get_stats()[1], lt_max,
+                stats["cp"].get_stats()[1], stats["sl"].get_stats()[1],
+                stats["mg"].get_stats()[1])
+        fstats += qstats
+        cstats += qstats
+
+        # Format the number of runs used
+        fstats += "%11d " % runs
+        cstats += "%11d " % runs
+
+        self.fdata.write(fstats+"\n")
+        self.fdata.flush()
+        print cstats
+
+        # Checkpoint the completed row
+        (tt_avg, rt_avg) = (stats["tt"].get_stats()[1], stats["rt"].get_stats()[1])
+        self.done.append((insts, fstats, tt_avg, rt_avg))
+        self.current = None
+        self.checkpoint()
+
+        return (tt_avg, rt_avg)
+
+    def sweep(self):
+        """Test a geometric series of instances, refined around slope changes
+
+        Run time and unfairness index are normalized on both axes, i.e. the
+        number of instances over the maximum and the metric over its maximum,
+        and an interval is bisected if the slope at either of its ends
+        changes more than the conf_swep threshold."""
+        points = {}
+
+        # Geometric series, up to the maximum number of instances
+        insts = 1
+        while (insts < self.insts):
+            points[insts] = self.measure(insts)
+            insts *= 2
+        points[self.insts] = self.measure(self.insts)
+
+        while True:
+            xi = sorted(points.keys())
+            refine = set()
+            for metric in (lambda tt, rt: rt, lambda tt, rt: 1 - (tt / rt)):
+                yi = [metric(*points[x]) for x in xi]
+                scale = max([abs(y) for y in yi] + [1e-9])
+                slopes = [((yi[i+1] - yi[i]) / scale) / (float(xi[i+1] - xi[i]) / self.insts)
+                        for i in range(len(xi)-1)]
+                for i in range(1, len(slopes)):
+                    if (abs(slopes[i] - slopes[i-1]) > conf_swep):
+                        refine.add(i-1)
+                        refine.add(i)
+            # Bisect the intervals not yet down to consecutive instances
+            refine = [(xi[i] + xi[i+1]) // 2 for i in refine if xi[i+1] - xi[i] > 1]
+            if not refine:
+                break
+            for insts in sorted(refine):
+                points[insts] = self.measure(insts)
+
+        self.sort_rows()
+
+    def sort_rows(self):
+        """Sort the logfile rows by number of instances"""
+        self.fdata.flush()
+        with open(self.fname) as f:
+            lines = f.readlines()
+        header = [l for l in lines if l.startswith("#")]
+        rows = sorted([l for l in lines if not l.startswith("#")],
+                key=lambda l: int(l.split()[0]))
+        self.fdata.seek(0)
+        self.fdata.truncate()
+        self.fdata.writelines(header + rows)
+
     def run(self):
         """Run the configured test"""
         logging.debug("Test " + self.label + " output on: " + self.fname);
         self.dump()
 
-        for max_insts in range(self.insts):
-            print "%7d ...\r" % (max_insts+1),
-
-            # reset total time counter
-            stats = {}
-            stats["tt"] = Stats()
-            stats["rt"] = Stats()
-            stats["tf"] = Stats()
-            stats["tv"] = Stats()
-            stats["ts"] = Stats()
-
-            for run in range(self.runs):
-                # setup insts list
-                self.perf_insts=[]
-
-                rt_start = time.time()
+        # Sample sched_debug alongside the test
+        if (conf_sdbg):
+            sampler = subprocess.Popen([sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "sched_debug.py"),
+                "-r", str(conf_sdbg), self.fname.replace(".dat", "_sched_debug.col")])
 
-                for task in range(max_insts+1):
-                    self.test()
+        # Rows completed before resuming the test
+        for (insts, row, tt_avg, rt_avg) in self.done:
+            self.fdata.write(row+"\n")
+        if self.done:
+            logging.info("Test " + self.label + " resumed after %d rows", len(self.done))
 
-                for p in self.perf_insts:
-                    # wait for task pair to finish and ...
-                    p.wait()
-
-                    # ... collect task execution time and their sum
-                    time_str = p.stderr.readline()
-                    (ttime, tctxf, tctxv, tsigc) = [t(s) for t,s in zip((float,int,int,int), time_str.split())]
-
-                    # Add samples to statistics
-                    stats["tt"].add_sample(ttime)
-                    stats["tf"].add_sample(tctxf)
-                    stats["tv"].add_sample(tctxv)
-                    stats["ts"].add_sample(tsigc)
-
-                    #print "%9f => %9f" % (ttime, tt_sum)
-                    #print "="*78
-
-                # Collect run execution time and their sum
-                rt_end   = time.time()
-                rtime    = (rt_end - rt_start)
-                stats["rt"].add_sample(rtime)
-
-            # for run
-
-            count = stats['tt'].get_count()
-            fstats = "%7d " % (count/self.runs)
-            cstats = "%7d " % (count/self.runs)
-
-            for s in ('tt', 'rt', 'tf', 'tv', 'ts'):
-                (count, avg, var, std, ste, c95, c99) = stats[s].get_stats()
-
-                ffmt = "%12.1f %11.1f %11.1f %11.1f %11.1f %11.1f "
-                cfmt = "%12.1f %11.1f "
-                if (s=='tt' or s=='rt'):
-                    ffmt = "%12.9f %11.9f %11.9f %11.9f %11.9f %11.9f "
-                    cfmt = "%12.9f %11.9f "
-
-                # Format stats for logfile
-                fstats += ffmt % (avg, var, std, ste, c95, c99)
-                # Format stats for console
-                cstats += cfmt % (avg, c99)
-
-            self.fdata.write(fstats+"\n")
-            print cstats
-
-        # for max_insts
+        if (conf_swep):
+            self.sweep()
+        else:
+            for insts in range(1, self.insts+1):
+                self.measure(insts)
 
         self.fdata.flush()
+        if (conf_sdbg):
+            sampler.terminate()
+            sampler.wait()
+        if (self.raw is not None):
+            self.raw.close()
+        if os.path.exists(self.fckpt):
+            os.remove(self.fckpt)
+        if (conf_rsdb):
+            db = ResultsDB(conf_rsdb)
+            db.add_test(self.fname)
+            db.close()
         logging.info("Test " + self.label + " data: " + self.fname)
         return self.fname
 
@@ -327,7 +645,9 @@ class Test():
         if (conf_verb):
             logging.debug("Parsing " + datafile + "...");
 
-        data = np.loadtxt(datafile)
+        data = np.atleast_2d(np.loadtxt(datafile))
+        # Rows sorted by number of instances
+        data = data[np.argsort(data[:,0], kind='mergesort')]
 
         # Setup graph geometry, axis and legend
 
@@ -386,6 +706,53 @@ class Test():
 ### Tests Utility Functions
 ################################################################################
 
+def get_conf():
+    """Get the configuration which affects the results of a test"""
+    return {
+        "trgt": conf_trgt,
+        "exec": conf_exec,
+        "ci99": conf_ci99,
+        "rmin": conf_rmin,
+        "swep": conf_swep,
+        "keep": conf_keep,
+        "sstt": conf_sstt,
+    }
+
+def resume_test(datafile):
+    """Resume a checkpointed test from where it stopped"""
+    global conf_trgt
+    global conf_exec
+    global conf_ci99
+    global conf_rmin
+    global conf_swep
+    global conf_keep
+    global conf_sstt
+
+    try:
+        with open(datafile.replace(".dat", ".ckpt")) as f:
+            state = json.load(f)
+    except IOError:
+        print >>sys.stderr, "No checkpoint to resume " + datafile
+        return 1
+
+    # Tests are resumed with the configuration they were started with
+    conf = state["conf"]
+    (conf_trgt, conf_exec, conf_ci99, conf_rmin, conf_swep, conf_keep, conf_sstt) = (
+        conf["trgt"], conf["exec"], conf["ci99"], conf["rmin"], conf["swep"],
+        conf["keep"], conf["sstt"])
+
+    state["fname"] = datafile
+    try:
+        test = Test(state["label"], state["desc"], state["command"],
+                state["insts"], state["runs"], state["sched"], resume=state)
+    except ResumeError, err:
+        print >>sys.stderr, err.msg
+        return 1
+    test.run()
+    test.plot()
+
+    return 0
+
 def run_all_tests():
     """Run all the supported tests and plot coresponding data"""
 
@@ -436,13 +803,23 @@ def main(argv=None):
     global conf_show
     global conf_trgt
     global conf_verb
+    global conf_exec
+    global conf_ci99
+    global conf_rmin
+    global conf_swep
+    global conf_rsme
+    global conf_rsdb
+    global conf_keep
+    global conf_sdbg
+    global conf_sstt
 
     if argv is None:
         argv = sys.argv
     try:
         try:
-            opts, args = getopt.getopt(argv[1:], "hci:pr:st:v",
-                    ["help", "cbs", "instances", "plot", "runs", "show", "target-cpus", "verbose"])
+            opts, args = getopt.getopt(argv[1:], "a:d:hci:km:pqr:R:sS:t:vw:x",
+                    ["help", "cbs", "instances", "plot", "runs", "show", "target-cpus", "verbose",
+                     "exec-helpers", "ci-target=", "min-runs=", "sweep=", "resume=", "db=", "keep-raw", "sched-debug=", "schedstat"])
         except getopt.error, msg:
             raise Usage(msg)
         # process options
@@ -471,6 +848,33 @@ def main(argv=None):
             if o in ("-v", "--verbose"):
                 conf_verb = 1
                 continue
+            if o in ("-x", "--exec-helpers"):
+                conf_exec = 1
+                continue
+            if o in ("-a", "--ci-target"):
+                conf_ci99 = float(a)
+                continue
+            if o in ("-m", "--min-runs"):
+                conf_rmin = int(a)
+                continue
+            if o in ("-w", "--sweep"):
+                conf_swep = float(a)
+                continue
+            if o in ("-R", "--resume"):
+                conf_rsme = a
+                continue
+            if o in ("-d", "--db"):
+                conf_rsdb = a
+                continue
+            if o in ("-k", "--keep-raw"):
+                conf_keep = 1
+                continue
+            if o in ("-S", "--sched-debug"):
+                conf_sdbg = float(a)
+                continue
+            if o in ("-q", "--schedstat"):
+                conf_sstt = 1
+                continue
         # process arguments
         for arg in args:
             process(arg) # process() is defined elsewhere
@@ -487,6 +891,9 @@ def main(argv=None):
     if (conf_plot):
         return plot_all_tests()
 
+    if (conf_rsme):
+        return resume_test(conf_rsme)
+
     return run_all_tests()
 
 if __name__ == "__main__":
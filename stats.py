@@ -0,0 +1,303 @@
+""" Samples Statistics
+
+Licensed under the terms of the GNU GPL License version 2
+
+Stats accumulates the (count, mean, M2) moments of a set of samples, M2 being
+the sum of the squared deviations from the mean. Single samples are added by
+Welford's update and arrays of samples, or other accumulators, are merged by
+Chan's pairwise update: unlike a sum of squares, M2 does not lose precision on
+samples with a large mean, and any split of the samples (e.g. across parallel
+workers or table chunks) gives the same statistics. The state of both Stats
+and LogHistogram can be serialized into a JSON-friendly dictionary, to be
+reduced by a different process.
+
+LogHistogram is an HDR-style histogram of non-negative samples: values are
+counted in log-spaced buckets, each power of two range being split into
+2^(bits-1) linear sub-buckets, thus the relative error on the reported
+percentiles is bounded by 2^-(bits-1) (e.g. 1.6% with the default 7 bits)
+whatever the magnitude of the samples.
+
+Samples are converted to integer multiples of a unit before being counted,
+e.g. unit=1e-9 for times in [s] counted at [ns] resolution. The number of
+buckets is bounded by the 64 bit range of such integers (3776 with 7 bits),
+thus a histogram has a fixed memory footprint regardless of the number of
+samples, and histograms of the same shape can be merged, e.g. to reduce the
+histograms collected by parallel workers or multiple runs.
+"""
+
+import math
+import numpy as np
+
+# The percentiles reported by default, in addition to the maximum
+PERCENTILES = (50, 90, 99, 99.9)
+
+################################################################################
+### Moments Accumulator
+################################################################################
+
+def moments(samples):
+    """Get the (count, mean, M2) of an array of samples"""
+    samples = np.asarray(samples, np.float64).ravel()
+    if (samples.size == 0):
+        return (0, 0.0, 0.0)
+    mean = samples.mean()
+    dev = samples - mean
+    return (samples.size, mean, np.dot(dev, dev))
+
+def merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """Merge the (count, mean, M2) of two sets of samples (Chan et al.)
+
+    Moments can be either scalars or arrays, e.g. of the groups of a table."""
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    weight = np.where(count > 0, count_b / np.maximum(count, 1.0), 0)
+    mean = mean_a + delta * weight
+    m2 = m2_a + m2_b + delta * delta * count_a * weight
+    return (count, mean, m2)
+
+class Stats():
+    def __init__(self):
+        self.scount = 0
+        self.smean  = .0
+        self.sm2    = .0
+
+    def do_stats(self):
+        count = max(self.scount, 1)
+        self.savg = self.smean
+        self.svar = (self.sm2 / count)
+        self.sstd = (math.sqrt(self.svar))
+        self.sste = (self.sstd / math.sqrt(count))
+        self.sc95 = (1.96 * self.sste)
+        self.sc99 = (2.58 * self.sste)
+
+    def set_data(self, ssum, ssum2, scount):
+        """Set the statistics from the sum of the samples and of their squares"""
+        self.scount = scount
+        self.smean  = ssum / max(scount, 1)
+        self.sm2    = max(ssum2 - self.smean * ssum, 0)
+        self.do_stats()
+
+    def add_sample(self, sample):
+        self.scount += 1
+        delta = sample - self.smean
+        self.smean += delta / self.scount
+        self.sm2   += delta * (sample - self.smean)
+
+    def add(self, samples):
+        """Add an array of samples"""
+        self.merge_moments(*moments(samples))
+
+    def merge_moments(self, count, mean, m2):
+        (count, mean, m2) = merge_moments(
+                self.scount, self.smean, self.sm2, count, mean, m2)
+        (self.scount, self.smean, self.sm2) = (int(count), float(mean), float(m2))
+
+    def merge(self, other):
+        """Add all the samples of another accumulator"""
+        self.merge_moments(other.scount, other.smean, other.sm2)
+
+    def get_count(self):
+        return self.scount
+
+    def get_avg(self):
+        return self.savg
+
+    def get_var(self):
+        return self.svar
+
+    def get_std(self):
+        return self.sstd
+
+    def get_ste(self):
+        return self.sste
+
+    def get_c95(self):
+        return self.sc95
+
+    def get_c99(self):
+        return self.sc99
+
+    def get_stats(self):
+        self.do_stats()
+        return (self.scount, self.savg, self.svar, self.sstd, self.sste, self.sc95, self.sc99)
+
+    def get_state(self):
+        return {"count": self.scount, "mean": self.smean, "m2": self.sm2}
+
+    def set_state(self, state):
+        (self.scount, self.smean, self.sm2) = (
+                int(state["count"]), float(state["mean"]), float(state["m2"]))
+        return self
+
+################################################################################
+### Significance Tests
+################################################################################
+
+def betacf(a, b, x, eps=1e-12, iters=300):
+    """Continued fraction of the incomplete beta function (Lentz's method)"""
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, iters + 1):
+        for (sign, num) in ((1, m * (b - m) * x / ((a + 2*m - 1) * (a + 2*m))),
+                (-1, -(a + m) * (a + b + m) * x / ((a + 2*m) * (a + 2*m + 1)))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < eps:
+            break
+    return h
+
+def betai(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)"""
+    if (x <= 0):
+        return 0.0
+    if (x >= 1):
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+            a * math.log(x) + b * math.log(1.0 - x))
+    # The continued fraction converges quickly only below (a+1)/(a+b+2)
+    if (x < (a + 1.0) / (a + b + 2.0)):
+        return front * betacf(a, b, x) / a
+    return 1.0 - front * betacf(b, a, 1.0 - x) / b
+
+def t_pvalue(t, df):
+    """Two-sided p-value of a Student's t statistic"""
+    (t, df) = (float(t), float(df))
+    return betai(df / 2.0, 0.5, df / (df + t * t))
+
+def welch_test(count_a, mean_a, var_a, count_b, mean_b, var_b):
+    """Welch's t-test of two sets of samples, given their moments
+
+    The variances are the sample (i.e. unbiased) ones. Returns the t
+    statistic, the Welch-Satterthwaite degrees of freedom and the two-sided
+    p-value of the means being different."""
+    if (count_a < 2 or count_b < 2):
+        return (0.0, 0.0, 1.0)
+    (ea, eb) = (float(var_a) / count_a, float(var_b) / count_b)
+    if (ea + eb == 0):
+        return (0.0, 0.0, 1.0 if mean_a == mean_b else 0.0)
+    t = (mean_b - mean_a) / math.sqrt(ea + eb)
+    df = (ea + eb) ** 2 / (ea * ea / (count_a - 1) + eb * eb / (count_b - 1))
+    return (t, df, t_pvalue(t, df))
+
+def ranks(samples):
+    """Get the ranks of a set of samples, ties getting their average rank"""
+    samples = np.asarray(samples, np.float64)
+    (values, inverse, counts) = np.unique(samples, return_inverse=True,
+            return_counts=True)
+    # The average of the ranks of each group of tied samples
+    last = counts.cumsum()
+    return (((last - counts + 1 + last) / 2.0)[inverse], counts)
+
+def mann_whitney(samples_a, samples_b):
+    """Mann-Whitney U test of two sets of samples
+
+    Uses the normal approximation, with continuity and ties corrections.
+    Returns the U statistic of the B samples, the z score and the two-sided
+    p-value of the samples coming from different distributions."""
+    (na, nb) = (len(samples_a), len(samples_b))
+    if (na == 0 or nb == 0):
+        return (0.0, 0.0, 1.0)
+    (rank, ties) = ranks(np.concatenate((samples_a, samples_b)))
+    u = rank[na:].sum() - nb * (nb + 1) / 2.0
+    n = float(na + nb)
+    var = na * nb / 12.0 * ((n + 1) - (ties ** 3 - ties).sum() / (n * (n - 1)))
+    if (var <= 0):
+        return (u, 0.0, 1.0)
+    delta = u - na * nb / 2.0
+    z = (delta - math.copysign(0.5, delta) if delta else 0.0) / math.sqrt(var)
+    return (u, z, math.erfc(abs(z) / math.sqrt(2)))
+
+################################################################################
+### Log-Bucketed Histogram
+################################################################################
+
+class LogHistogram():
+    def __init__(self, unit=1, bits=7):
+        self.unit = unit
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts = np.zeros(0, np.int64)
+        self.smax = 0
+        self.scount = 0
+
+    def index(self, values):
+        """Get the buckets of a set of samples"""
+        values = np.floor(np.maximum(np.asarray(values, np.float64) / self.unit, 0))
+        values = values.astype(np.int64)
+        # Values up to 2^bits have a bucket each, above that each bucket
+        # spans 2^shift values, shift being the bits exceeding the precision
+        shift = np.maximum(np.frexp(values)[1] - self.bits, 0)
+        return shift * self.half + (values >> shift)
+
+    def upper(self, index):
+        """Get the highest value counted by a set of buckets"""
+        index = np.asarray(index, np.int64)
+        shift = np.maximum(index // self.half - 1, 0)
+        return (((index - shift * self.half + 1) << shift) - 1) * self.unit
+
+    def add(self, samples):
+        """Add an array of samples"""
+        samples = np.asarray(samples)
+        if (samples.size == 0):
+            return
+        counts = np.bincount(self.index(samples).ravel())
+        self.merge_counts(counts, samples.max(), samples.size)
+
+    def add_sample(self, sample):
+        self.add([sample])
+
+    def merge_counts(self, counts, smax, scount):
+        if (len(counts) > len(self.counts)):
+            (counts, self.counts) = (self.counts, counts.copy())
+        self.counts[:len(counts)] += counts
+        self.smax = max(self.smax, smax)
+        self.scount += scount
+
+    def merge(self, other):
+        """Add all the samples of another histogram of the same shape"""
+        if (other.unit != self.unit or other.bits != self.bits):
+            raise ValueError("Merging histograms of different shapes")
+        self.merge_counts(other.counts, other.smax, other.scount)
+
+    def percentiles_of(self, counts, smax, percentiles=PERCENTILES):
+        """Get the percentiles and the maximum of a set of histograms
+
+        The counts of N histograms of this shape are given as an N x buckets
+        matrix, with their maximum samples, and the N x (len(percentiles)+1)
+        matrix of their percentiles and maximum is returned. Each percentile
+        is the highest value of its bucket, but never above the maximum.
+        """
+        counts = np.atleast_2d(counts)
+        smax = np.atleast_1d(np.asarray(smax, np.float64))
+        cumsum = counts.cumsum(axis=1)
+        result = np.zeros((len(counts), len(percentiles) + 1))
+        for (i, p) in enumerate(percentiles):
+            rank = np.maximum(np.ceil(cumsum[:, -1] * (p / 100.0)), 1)
+            index = (cumsum < rank[:, np.newaxis]).sum(axis=1)
+            result[:, i] = np.minimum(self.upper(index), smax)
+        result[:, -1] = smax
+        return result
+
+    def get_percentiles(self, percentiles=PERCENTILES):
+        """Get the percentiles and the maximum of the samples"""
+        if (self.scount == 0):
+            return (0.0,) * (len(percentiles) + 1)
+        return tuple(self.percentiles_of(self.counts, self.smax, percentiles)[0])
+
+    def get_state(self):
+        return {"unit": self.unit, "bits": self.bits, "counts": self.counts.tolist(),
+                "max": float(self.smax), "count": int(self.scount)}
+
+    def set_state(self, state):
+        self.__init__(state["unit"], state["bits"])
+        self.merge_counts(np.asarray(state["counts"], np.int64),
+                state["max"], state["count"])
+        return self
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
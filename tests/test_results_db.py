@@ -0,0 +1,82 @@
+""" Results Store Tests
+
+Licensed under the terms of the GNU GPL License version 2
+
+Ingest a folder of the tables dumped by dump_tables.sh, where the trace tables
+are stored into their table_<KIND> tables while the reports with no schema
+are skipped.
+
+Usage: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import results_db
+import trace_tables
+
+def latencies(count, cpu):
+    return {
+        "Burst" : np.arange(1, count + 1),
+        "Task"  : ["task%d" % (i % 3) for i in range(count)],
+        "Time"  : np.arange(count) / 10.0,
+        "Delay" : np.arange(count) * 1000,
+        "Slice" : np.arange(count) * 2000,
+        "CPU"   : np.zeros(count) + cpu,
+    }
+
+# The reports of dump_tables.sh with no trace_tables schema
+REPORTS = {
+    "ctxrate":  "# CPU Ctx/s\n   0   1200.0\n9999   1200.0\n",
+    "ctxpeaks": "# Context Switches Windows Analysis\n      0    12   120.0\n",
+    "migstats": "# Task Migrations Analysis\n# 0 migrations of 0 tasks\n",
+    "events":   "task-1 [000] 0.100000: sched_switch: prev_pid=1 next_pid=0\n",
+}
+
+class ResultsDBTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = results_db.ResultsDB(os.path.join(self.tmp, "results.db"))
+        self.table = os.path.join(self.tmp, "cbs_table_PerfPIPE")
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_dump_tables(self):
+        trace_tables.write_table(self.table + "_C0_latencies.dat", "latencies",
+                latencies(5, 0))
+        trace_tables.write_table(self.table + "_Call_latencies.dat", "latencies",
+                latencies(7, 1))
+        trace_tables.write_table(self.table + "_Call_wakeup_latencies.dat", "latencies",
+                latencies(4, 2))
+        for (kind, text) in REPORTS.items():
+            with open("%s_Call_%s.dat" % (self.table, kind), "w") as fout:
+                fout.write(text)
+
+        for fname in sorted(os.listdir(self.tmp)):
+            if fname.endswith(".dat"):
+                path = os.path.join(self.tmp, fname)
+                if fname[:-4].rsplit("_", 1)[-1] in REPORTS:
+                    self.assertRaises(ValueError, self.db.add, path)
+                else:
+                    self.db.add(path)
+
+        (names, rows) = self.db.query("SELECT t.kind, t.cpu, COUNT(*), SUM(r.Delay) "
+                "FROM tables t JOIN table_latencies r ON r.table_id = t.id "
+                "GROUP BY t.id ORDER BY t.kind, t.cpu")
+        self.assertEqual(rows, [("latencies", "0", 5, 10000), ("latencies", "all", 7, 21000),
+                ("wakeup_latencies", "all", 4, 6000)])
+        (names, rows) = self.db.query("SELECT DISTINCT Task FROM table_latencies ORDER BY Task")
+        self.assertEqual(rows, [("task0",), ("task1",), ("task2",)])
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
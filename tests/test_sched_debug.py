@@ -0,0 +1,124 @@
+""" Scheduler Debug Sampler Tests
+
+Licensed under the terms of the GNU GPL License version 2
+
+Parse a captured /proc/sched_debug, with the sections of a CPU and of its
+cfs_rq (also of a task group), rt_rq and cbs_rq run queues, and sample it into
+a ring buffer smaller than the samples, whose columnar dump has to report
+the last samples in time order.
+
+Usage: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import sched_debug
+import trace_tables
+
+SCHED_DEBUG = """\
+Sched Debug Version: v0.11, 3.10.0-cbs #1
+ktime                                   : 1234567.890123
+sched_clk                               : 1234571.123456
+
+sysctl_sched
+  .sysctl_sched_latency                    : 6.000000
+  .sysctl_sched_min_granularity            : 0.750000
+
+cpu#0, 2394.230 MHz
+  .nr_running                    : 2
+  .load                          : 2048
+  .nr_switches                   : %(switches)d
+  .nr_load_updates               : 456789
+  .nr_uninterruptible            : -3
+  .curr->pid                     : 1234
+  .clock                         : 1234567.891011
+
+cfs_rq[0]:/autogroup-12
+  .exec_clock                    : 345.678901
+  .MIN_vruntime                  : 0.000001
+  .min_vruntime                  : 901.234567
+  .nr_running                    : 1
+  .load                          : 1024
+
+cfs_rq[0]:/
+  .exec_clock                    : 98765.432101
+  .MIN_vruntime                  : -17179869.184000
+  .min_vruntime                  : 54321.098765
+  .nr_running                    : 1
+  .load                          : 1024
+
+rt_rq[0]:
+  .rt_nr_running                 : 0
+  .rt_throttled                  : 0
+  .rt_time                       : 0.000000
+  .rt_runtime                    : 950.000000
+
+cbs_rq[0]:
+  .nr_running                    : 1
+  .round                         : %(round)d
+
+runnable tasks:
+            task   PID         tree-key  switches  prio     exec-runtime         sum-exec        sum-sleep
+----------------------------------------------------------------------------------------------------------
+R           bash  1234     54321.098765       321   120     54321.098765       123.456789    987654.321098 /
+"""
+
+def fixture(sample):
+    return SCHED_DEBUG % {"switches": 100 + sample, "round": 10 * sample}
+
+class SchedDebugTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp, "sched_debug")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_parse(self):
+        fields = sched_debug.parse(fixture(0))
+        self.assertEqual(fields["cpu0.nr_switches"], 100)
+        self.assertEqual(fields["cpu0.nr_uninterruptible"], -3)
+        self.assertEqual(fields["cpu0.curr->pid"], 1234)
+        self.assertEqual(fields["cfs_rq0.min_vruntime"], 54321.098765)
+        self.assertEqual(fields["cfs_rq0.MIN_vruntime"], -17179869.184)
+        self.assertEqual(fields["cfs_rq0:autogroup-12.min_vruntime"], 901.234567)
+        self.assertEqual(fields["rt_rq0.rt_runtime"], 950.0)
+        self.assertEqual(fields["cbs_rq0.round"], 0)
+        # The global sections and the runnable tasks are not per-CPU fields
+        self.assertEqual(sorted(set(name.split(".")[0] for name in fields)),
+                ["cbs_rq0", "cfs_rq0", "cfs_rq0:autogroup-12", "cpu0", "rt_rq0"])
+        self.assertEqual(len(fields), 7 + 5 + 5 + 4 + 2)
+
+    def test_ring(self):
+        sampler = sched_debug.Sampler(self.fname, samples=3)
+        for sample in range(5):
+            with open(self.fname, "w") as fout:
+                fout.write(fixture(sample))
+            sampler.sample()
+        (stamps, values) = sampler.get_samples()
+        self.assertEqual(len(stamps), 3)
+        self.assertTrue(np.all(np.diff(stamps) >= 0))
+
+        path = os.path.join(self.tmp, "sched_debug_table.col")
+        sampler.dump(path)
+        table = trace_tables.Table(path[:-4] + ".dat", "sched_debug")
+        self.assertTrue(table.mapped)
+        self.assertEqual(table.rows, 3)
+        self.assertEqual(table.names, ["Time"] + sorted(sched_debug.parse(fixture(0))))
+        self.assertEqual(table["Time"].tolist(), stamps.tolist())
+        # The oldest samples have been overwritten
+        self.assertEqual(table["cpu0.nr_switches"].tolist(), [102, 103, 104])
+        self.assertEqual(table["cbs_rq0.round"].tolist(), [20, 30, 40])
+        self.assertEqual(table["rt_rq0.rt_runtime"].tolist(), [950.0] * 3)
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
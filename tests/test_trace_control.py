@@ -0,0 +1,63 @@
+""" Trace Control Tests
+
+Licensed under the terms of the GNU GPL License version 2
+
+Resolve the event specs of the test scripts on a fake tracing folder, whose
+events/SYSTEM/EVENT folders have just their format files, next to the
+per_cpu/cpuN folders of its CPUs.
+
+Usage: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import trace_control
+
+EVENTS = {
+    "sched": ("sched_switch", "sched_wakeup", "sched_process_latency"),
+    "power": ("cpu_frequency", "cpu_migrate_finish"),
+}
+
+class TraceControlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracing = tempfile.mkdtemp()
+        for cpu in range(2):
+            os.makedirs(os.path.join(self.tracing, "per_cpu", "cpu%d" % cpu))
+        for (system, events) in EVENTS.items():
+            for event in events:
+                path = os.path.join(self.tracing, "events", system, event)
+                os.makedirs(path)
+                with open(os.path.join(path, "format"), "w") as fout:
+                    fout.write("name: %s\n" % event)
+            # Not an event, e.g. the enable and filter files of the system
+            with open(os.path.join(self.tracing, "events", system, "enable"), "w") as fout:
+                fout.write("0\n")
+        self.control = trace_control.TraceControl(self.tracing)
+
+    def tearDown(self):
+        shutil.rmtree(self.tracing)
+
+    def test_events(self):
+        self.assertEqual(self.control.events(["sched:sched_switch"]),
+                [("sched", "sched_switch")])
+        # The EVENTS of test_iks and test_hmp, by their bare names
+        self.assertEqual(self.control.events(["cpu_migrate_finish", "sched_process_latency"]),
+                [("power", "cpu_migrate_finish"), ("sched", "sched_process_latency")])
+        for spec in ("power:", "power:*"):
+            self.assertEqual(self.control.events([spec]),
+                    [("power", "cpu_frequency"), ("power", "cpu_migrate_finish")])
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, self.control.events, ["sched"])
+        self.assertRaises(ValueError, self.control.events, ["sched_missing"])
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,143 @@
+""" Trace Recorder Tests
+
+Licensed under the terms of the GNU GPL License version 2
+
+Record a fake tracing folder, whose per_cpu/cpuN/trace_pipe_raw are fixture
+pages of sched_wakeup events, and check the trace assembled by the recorder
+is decoded by trace_reader into the same events.
+
+Usage: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import mmap
+import shutil
+import struct
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import trace_reader
+import trace_recorder
+
+PAGE_SIZE = mmap.PAGESIZE
+
+HEADER_PAGE = """\
+\tfield: u64 timestamp;\toffset:0;\tsize:8;\tsigned:0;
+\tfield: local_t commit;\toffset:8;\tsize:8;\tsigned:1;
+\tfield: int overwrite;\toffset:8;\tsize:1;\tsigned:1;
+\tfield: char data;\toffset:16;\tsize:%d;\tsigned:1;
+""" % (PAGE_SIZE - 16)
+
+HEADER_EVENT = """\
+# compressed entry header
+\ttype_len    :    5 bits
+\ttime_delta  :   27 bits
+\tarray       :   32 bits
+"""
+
+WAKEUP_ID = 301
+WAKEUP_FORMAT = """\
+name: sched_wakeup
+ID: %d
+format:
+\tfield:unsigned short common_type;\toffset:0;\tsize:2;\tsigned:0;
+\tfield:unsigned char common_flags;\toffset:2;\tsize:1;\tsigned:0;
+\tfield:unsigned char common_preempt_count;\toffset:3;\tsize:1;\tsigned:0;
+\tfield:int common_pid;\toffset:4;\tsize:4;\tsigned:1;
+
+\tfield:char comm[16];\toffset:8;\tsize:16;\tsigned:1;
+\tfield:pid_t pid;\toffset:24;\tsize:4;\tsigned:1;
+\tfield:int prio;\toffset:28;\tsize:4;\tsigned:1;
+\tfield:int success;\toffset:32;\tsize:4;\tsigned:1;
+\tfield:int target_cpu;\toffset:36;\tsize:4;\tsigned:1;
+
+print fmt: "comm=%%s pid=%%d"
+""" % WAKEUP_ID
+
+# The events of each page and the pages of each CPU
+EVENTS_PER_PAGE = 50
+PAGES = 3
+
+def write(path, data):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as fout:
+        fout.write(data if isinstance(data, bytes) else data.encode("latin-1"))
+
+def wakeup_pages(cpu, start):
+    """Get the pages of the sched_wakeup events of a CPU, with the timestamps
+    and PIDs of the events"""
+    pages = []
+    (stamps, pids) = ([], [])
+    ts = start
+    for page in range(PAGES):
+        data = []
+        page_ts = ts
+        for event in range(EVENTS_PER_PAGE):
+            pid = 1000 * cpu + len(pids)
+            delta = 1000 + event
+            ts += delta
+            payload = struct.pack("=HBBi16siiii", WAKEUP_ID, 0, 0, pid,
+                    ("task%d" % pid).encode("latin-1"), pid, 120, 1, cpu)
+            # A data event of type_len 10 (40 bytes) and its time delta
+            if sys.byteorder == "little":
+                header = 10 | (delta << 5)
+            else:
+                header = (10 << 27) | delta
+            data.append(struct.pack("=I", header) + payload)
+            stamps.append(ts)
+            pids.append(pid)
+        data = b"".join(data)
+        pages.append((struct.pack("=QQ", page_ts, len(data)) + data).ljust(PAGE_SIZE, b"\0"))
+    return (b"".join(pages), stamps, pids)
+
+class TraceRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.tracing = os.path.join(self.tmp, "tracing")
+        write(os.path.join(self.tracing, "events", "header_page"), HEADER_PAGE)
+        write(os.path.join(self.tracing, "events", "header_event"), HEADER_EVENT)
+        write(os.path.join(self.tracing, "events", "sched", "sched_wakeup", "format"),
+                WAKEUP_FORMAT)
+        write(os.path.join(self.tracing, "set_event"), "sched:sched_wakeup\n")
+        write(os.path.join(self.tracing, "printk_formats"), "")
+        write(os.path.join(self.tracing, "saved_cmdlines"), "1000 task1000\n")
+        self.expected = {}
+        for cpu in (1, 3):
+            (pages, stamps, pids) = wakeup_pages(cpu, 10**9 * cpu)
+            path = os.path.join(self.tracing, "per_cpu", "cpu%d" % cpu)
+            write(os.path.join(path, "trace_pipe_raw"), pages)
+            write(os.path.join(path, "stats"), "overrun: 0\ndropped events: 0\n")
+            self.expected[cpu] = (stamps, pids)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        output = os.path.join(self.tmp, "trace.dat")
+        # CPUs not in id order, whose data must be assembled in id order
+        recorder = trace_recorder.Recorder(output, self.tracing, [3, 1], pages=2)
+        recorder.start()
+        recorder.stop()
+        recorder.assemble()
+        self.assertEqual(recorder.get_lost(), {1: (0, 0), 3: (0, 0)})
+
+        trace = trace_reader.TraceReader(output, ("sched_wakeup",)).parse()
+        self.assertEqual(trace.cpus, 4)
+        self.assertEqual(trace.cmdlines, {1000: "task1000"})
+        for cpu in range(trace.cpus):
+            (ts, cpus, recs) = trace.get("sched_wakeup", [cpu])
+            (stamps, pids) = self.expected.get(cpu, ([], []))
+            self.assertEqual(ts.tolist(), stamps)
+            self.assertEqual(recs["pid"].tolist(), pids)
+            self.assertTrue(np.all(recs["target_cpu"] == cpu))
+        self.assertFalse(os.path.exists(output + ".cpu1"))
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,84 @@
+""" Wakeup Latencies Pairing Tests
+
+Licensed under the terms of the GNU GPL License version 2
+
+Check trace_reader.wakeup_latencies against an event by event per-PID state
+table, on random streams of wakeups and switch-ins/outs.
+
+Usage: python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import trace_reader
+
+(OUT, WAKEUP, IN) = range(3)
+
+def random_events(rng, count, pids):
+    """Get the (timestamps, pids) of the switch-outs, wakeups and switch-ins
+    of a random stream, with timestamp ties"""
+    ts = np.sort(rng.randint(0, count // 2, count)).astype(np.uint64)
+    kinds = rng.randint(0, 3, count)
+    pid = rng.randint(1, pids + 1, count).astype(np.int32)
+    return [(ts[kinds == kind], pid[kinds == kind]) for kind in (OUT, WAKEUP, IN)]
+
+def state_table(switch_outs, wakeups, switch_ins):
+    """Pair the wakeups with the switch-ins by a per-PID state table"""
+    events = []
+    for (kind, (ts, pids)) in ((OUT, switch_outs), (WAKEUP, wakeups), (IN, switch_ins)):
+        events.extend((int(t), kind, int(p), i) for (i, (t, p)) in enumerate(zip(ts, pids)))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    woken = {}
+    running = {}
+    result = []
+    for (ts, kind, pid, index) in events:
+        # The slice of a paired switch-in ends on the next event of its task
+        row = running.pop(pid, None)
+        if (row is not None and kind == OUT):
+            row[2] = ts - row[3]
+        if (kind == WAKEUP):
+            woken.setdefault(pid, ts)
+        elif (kind == IN):
+            if pid in woken:
+                row = [index, ts - woken.pop(pid), 0, ts]
+                result.append(row)
+                running[pid] = row
+        else:
+            woken.pop(pid, None)
+    result.sort()
+    return [tuple(row[:3]) for row in result]
+
+class WakeupLatenciesTest(unittest.TestCase):
+
+    def check(self, switch_outs, wakeups, switch_ins):
+        (index, delay, slice) = trace_reader.wakeup_latencies(
+                wakeups, switch_ins, switch_outs)
+        order = np.argsort(index)
+        result = list(zip(index[order].tolist(), delay[order].tolist(),
+            slice[order].tolist()))
+        self.assertEqual(result, state_table(switch_outs, wakeups, switch_ins))
+
+    def test_empty(self):
+        empty = (np.zeros(0, np.uint64), np.zeros(0, np.int32))
+        self.check(empty, empty, empty)
+
+    def test_sequence(self):
+        # Two wakeups before running, then a switch-in after a preemption
+        self.check((np.array([20], np.uint64), np.array([7], np.int32)),
+                   (np.array([5, 6], np.uint64), np.array([7, 7], np.int32)),
+                   (np.array([10, 30], np.uint64), np.array([7, 7], np.int32)))
+
+    def test_random(self):
+        rng = np.random.RandomState(0)
+        for pids in (1, 3, 50):
+            self.check(*random_events(rng, 5000, pids))
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
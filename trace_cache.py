@@ -0,0 +1,139 @@
+""" Content-Addressed Cache of Trace Derived Files
+
+Licensed under the terms of the GNU GPL License version 2
+
+The files derived from a trace, e.g. the tables dumped by trace_reader.py and
+the plots of plot_tables.py, are stored under a key which is the hash of:
+the content of the files they are derived from, the version of the code which
+derives them and the parameters used (e.g. events and CPU). Thus, a cached
+entry is reused only when all of these are unchanged, and a re-captured trace
+never hits the files derived from the previous one.
+
+The content hash of each input file is memoized on its device, inode, size
+and modification time, thus an unchanged file is read only once.
+
+The cache is kept into the folder defined by the TRACE_CACHE environment
+variable, by default ~/.cache/sched-profile. Setting TRACE_CACHE to an empty
+string disables caching.
+"""
+
+import os
+import json
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+
+# The folder keeping cached files, None if caching is disabled
+CACHE_DIR = os.environ.get("TRACE_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "sched-profile")) or None
+
+# The size of the blocks file content is hashed by
+HASH_BLOCK = 1 << 20
+
+def enabled():
+    return CACHE_DIR is not None
+
+def makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise
+
+def write_atomic(fname, data):
+    """Write a file so that concurrent readers see either all or nothing"""
+    (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(fname))
+    with os.fdopen(fd, "w") as tmp_file:
+        tmp_file.write(data)
+    os.rename(tmp, fname)
+
+def file_digest(fname):
+    """Get the SHA1 of the content of a file, memoized on its stat"""
+    st = os.stat(fname)
+    stamp = "%d %d %d %r" % (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+    if enabled():
+        path = os.path.abspath(fname).encode("utf-8")
+        memo = os.path.join(CACHE_DIR, "digests", hashlib.sha1(path).hexdigest())
+        try:
+            with open(memo) as memo_file:
+                (memo_stamp, digest) = memo_file.read().split("\n")[:2]
+            if memo_stamp == stamp:
+                return digest
+        except (IOError, ValueError):
+            pass
+
+    sha1 = hashlib.sha1()
+    with open(fname, "rb") as in_file:
+        block = in_file.read(HASH_BLOCK)
+        while block:
+            sha1.update(block)
+            block = in_file.read(HASH_BLOCK)
+    digest = sha1.hexdigest()
+
+    if enabled():
+        makedirs(os.path.dirname(memo))
+        write_atomic(memo, "%s\n%s\n" % (stamp, digest))
+    return digest
+
+def cache_key(digests, version, *params):
+    """Get the key of the files derived from some inputs by a code version"""
+    key = json.dumps([list(digests), version, list(params)], sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, "entries", key[:2], key)
+
+def copy(src, dst):
+    if os.path.isdir(src):
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        shutil.copytree(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+def fetch(key, dest="."):
+    """Restore into a folder the files stored under a key
+
+    Return the list of the restored files, or None if the key is not cached.
+    """
+    if not enabled():
+        return None
+    entry = entry_path(key)
+    if not os.path.isdir(entry):
+        return None
+
+    files = []
+    for name in sorted(os.listdir(entry)):
+        fname = os.path.normpath(os.path.join(dest, name))
+        copy(os.path.join(entry, name), fname)
+        files.append(fname)
+    logging.debug("Cache hit [%s]: %s", key, " ".join(files))
+    return files
+
+def store(key, files):
+    """Store a set of files (or folders) under a key
+
+    An entry is made visible at once, complete, and it is never modified:
+    if the key has been stored concurrently by someone else, that entry is
+    kept.
+    """
+    if not enabled():
+        return
+    entry = entry_path(key)
+    makedirs(os.path.dirname(entry))
+
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+    try:
+        for fname in files:
+            copy(fname, os.path.join(tmp, os.path.basename(fname)))
+        os.rename(tmp, entry)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    logging.debug("Cache store [%s]: %s", key, " ".join(files))
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
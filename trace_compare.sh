@@ -23,6 +23,23 @@ TRACER=${TRACER:-""}
 # The FTrace events to trace
 EVENTS=${EVENTS:-"sched:sched_switch sched:sched_process_fork sched:sched_process_latency sched_cbs:*"}
 
+# 1: setup filtered events, CPUs and buffers sizes by trace_control.py,
+# 0: enable the events unfiltered, with fixed size buffers
+CONTROL=${CONTROL:-0}
+
+# The command names of the benchmark tasks, to filter events on (default: no
+# filtering, since the tasks forked by the benchmark have their own names)
+COMMS=${COMMS:-""}
+
+# The expected test duration [s], to size the trace buffers for
+DURATION=${DURATION:-60}
+
+# 1: record the trace buffers while tracing, 0: extract them at the end
+RECORD=${RECORD:-0}
+
+# The sched_debug sampling rate [Hz] while tracing (0 to disable)
+SDEBUG=${SDEBUG:-0}
+
 # The CPUs Sandbox where tests should be run
 SBOX=${SBOX:-"/sys/fs/cgroup/sbox"}
 if [[ ! -f ${SBOX}/cpuset.cpus ]]; then
@@ -212,7 +229,15 @@ trace_setup() {
     done
   fi
   # Events
-  if [ "x$EVENTS" != "x" ]; then
+  if [[ "x$EVENTS" != "x" && $CONTROL != 0 ]]; then
+    log_info "[CONF] Setup FTrace [$EVENTS] event/s on [$COMMS] tasks..."
+    $TESTD/trace_control.py -t $TRACING -s trace_state.json save
+    # The buffers are sized on a short run of the benchmark
+    pushd $TESTD
+    $TESTD/trace_control.py -t $TRACING -e "$EVENTS" -c "$CPUS" \
+      -n "$COMMS" -w "$(echo $CMD)" -d $DURATION setup
+    popd
+  elif [ "x$EVENTS" != "x" ]; then
     log_info "[CONF] Setup FTrace [$EVENTS] event/s..."
     echo > $TRACING/set_event
     echo "$EVENTS" > $TRACING/set_event
@@ -223,9 +248,11 @@ trace_setup() {
 trace_start() {
   log_warn "===== Trace START ====="
   log_info "Command [$1]"
-  echo 1 > $TRACING/free_buffer
-  log_info "[CONF] Setup FTrace [10M] buffer size..."
-  echo 10240 > $TRACING/buffer_size_kb
+  if [[ $CONTROL == 0 ]]; then
+    echo 1 > $TRACING/free_buffer
+    log_info "[CONF] Setup FTrace [10M] buffer size..."
+    echo 10240 > $TRACING/buffer_size_kb
+  fi
   echo 1 > $TRACING/tracing_on
 }
 
@@ -235,6 +262,10 @@ trace_stop() {
 }
 
 trace_reset() {
+  if [[ $CONTROL != 0 ]]; then
+    log_debug "### Restore FTrace state..."
+    $TESTD/trace_control.py -t $TRACING -s trace_state.json restore
+  fi
   # Events
   if [ "x$EVENTS" != "x" ]; then
     log_debug "### Reset FTrace filters..."
@@ -250,8 +281,12 @@ trace_reset() {
 trace_collect() {
   RESULTS=$1 # The basename for trace and report filenames
 
-  trace-cmd extract &>/dev/null
-  mv trace.dat $RESULTS.dat
+  if [[ $RECORD != 0 ]]; then
+    mv $RESULTS.rec $RESULTS.dat
+  else
+    trace-cmd extract &>/dev/null
+    mv trace.dat $RESULTS.dat
+  fi
   cat > $RESULTS.txt <<EOF
 ################################################################################
 # Date:    `date`
@@ -307,6 +342,18 @@ test_sched() {
   # Start tracing
   trace_start "$CMD"
 
+  if [[ $RECORD != 0 ]]; then
+    log_info "[CONF] Recording trace buffers while tracing..."
+    $TESTD/trace_recorder.py -t $TRACING $RESULTS.rec &
+    RECPID=$!
+  fi
+
+  if [[ $SDEBUG != 0 ]]; then
+    log_info "[CONF] Sampling sched_debug at [$SDEBUG] Hz..."
+    $TESTD/sched_debug.py -r $SDEBUG ${RESULTS}_sched_debug.col &
+    SDPID=$!
+  fi
+
   if [[ $SCHED==iks ]]; then
     # Switch back to interactive governor once the trace has been started, thus
     # get all the cluster UP migrations on the trace
@@ -333,6 +380,16 @@ test_sched() {
 
   trace_stop
 
+  if [[ $RECORD != 0 ]]; then
+    kill -TERM $RECPID
+    wait $RECPID || log_warn "Trace events lost, see the recorder report"
+  fi
+
+  if [[ $SDEBUG != 0 ]]; then
+    kill -TERM $SDPID
+    wait $SDPID
+  fi
+
   trace_collect $RESULTS
 
 }
@@ -507,10 +564,8 @@ cd \$DESTDIR
 # Generate the plotting script
 cat > plot_all.sh <<EOS
 #!/bin/bash
-for C in $CPULIST; do
-  echo "Dumping tables for CPU[\\\$C]..."
-  ./dump_tables.sh \\\$C
-done
+echo "Dumping tables for CPUs [$CPULIST]..."
+./dump_tables.sh $CPULIST
 echo "Plotting tables"
 ./plot_tables.py
 EOS
@@ -554,14 +609,21 @@ tar cjf ${SCHED,,}_trace_$TAG.tar.bz2 \
         ${SCHED,,}_trace_$TAG.txt \
         ${SCHED,,}_trace_$TAG.log \
         ${SCHED,,}_trace_$TAG.dat \
+        $([[ $SDEBUG == 0 ]] || echo ${SCHED,,}_trace_${TAG}_sched_debug.col) \
         dump_tables.sh \
+        trace_reader.py \
+        migration_stats.py \
+        trace_tables.py \
+        trace_cache.py \
+        stats.py \
+        ctx_windows.py \
         plot_tables.py
 cat decompressor ${SCHED,,}_trace_$TAG.tar.bz2 > results_${SCHED,,}_$TAG.bsx
 chmod a+x results_${SCHED,,}_$TAG.bsx
 log_info "Test results: results_${SCHED,,}_$TAG.bsx"
 
 # Cleanup packaged files
-rm -f ${SCHED,,}_*
+rm -rf ${SCHED,,}_*
 
 sleep 1
 echo -e "\n\n\n"
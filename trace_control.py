@@ -0,0 +1,361 @@
+#!/usr/bin/python
+""" FTrace Controller
+
+Licensed under the terms of the GNU GPL License version 2
+
+Setup the tracing of just what the analysis looks at, rather than enabling all
+the events unfiltered on all the CPUs:
+- the tracing CPUs are restricted to the test ones, by tracing_cpumask
+- each event is given an in-kernel filter on the benchmark tasks, made of the
+  pid and command name fields of its payload (e.g. prev_pid and next_comm of
+  sched_switch); events which do not report a task (e.g. the per run queue
+  CBS rounds) are not filtered. Filters follow neither the tasks forked by
+  the benchmark nor their command names (e.g. the make and cc1 children of a
+  kernel build), thus the scheduling events of all the tasks (e.g.
+  sched_switch and sched_wakeup) are never filtered
+- the buffer of each CPU is sized on its event rate, measured by a short
+  calibration run of the benchmark (the workload), to hold the events
+  expected for the test duration, but never below the 10 MB of the buffers
+  which are not sized
+
+The previous state of the tracing folder (events, filters, CPU mask, buffer
+sizes and tracer) is saved into a JSON file, to be restored once done.
+
+Usage: trace_control.py [-t TRACING] -s STATE save|restore
+       trace_control.py [-t TRACING] [-e EVENTS] [-c CPUS] [-n COMMS]
+                        [-p PIDS] [-w WORKLOAD] [-k SECONDS] [-d SECONDS] setup
+
+  -t, --tracing    the tracing folder (default: /sys/kernel/debug/tracing)
+  -s, --state      the file the tracing state is saved into
+  -e, --events     the events to trace (e.g. "sched:sched_switch sched_cbs:*")
+  -c, --cpus       the CPUs to trace (e.g. "3-5")
+  -n, --comms      the command names of the benchmark tasks
+  -p, --pids       the pids of the benchmark tasks
+  -w, --workload   the command run while calibrating, e.g. the benchmark
+                   (killed once the calibration completes)
+  -k, --calibrate  the length of the calibration run (default: 1)
+  -d, --duration   the expected test duration (default: 60)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import getopt
+import subprocess
+import logging
+from launcher import parse_cpus
+
+# The tracing folder, also mounted on its own by newer kernels
+TRACING = "/sys/kernel/debug/tracing"
+TRACING_FS = "/sys/kernel/tracing"
+
+# The payload fields which identify the task an event refers to
+PID_FIELDS  = ("pid", "prev_pid", "next_pid", "child_pid")
+COMM_FIELDS = ("comm", "prev_comm", "next_comm", "child_comm")
+
+# The events of all the tasks, which filters would drop for the tasks forked
+# by the benchmark
+UNFILTERED = ("sched_switch", "sched_wakeup", "sched_wakeup_new",
+        "sched_process_fork", "sched_process_exec", "sched_process_exit")
+
+# The buffers size bounds [KB], the minimum being the size of the buffers
+# which are not sized, and the headroom on the expected events
+BUFFER_MIN_KB = 10240
+BUFFER_MAX_KB = 1024 * 1024
+BUFFER_MARGIN = 1.5
+
+# A field of an event format, e.g.
+#   field:pid_t prev_pid;	offset:24;	size:4;	signed:1;
+FORMAT_FIELD = re.compile(r"field:.*?([A-Za-z_][A-Za-z0-9_]*)(\[.*\])?;")
+
+def default_tracing():
+    if os.path.isdir(TRACING) or not os.path.isdir(TRACING_FS):
+        return TRACING
+    return TRACING_FS
+
+def cpumask(cpus):
+    """Get the hexadecimal mask of a list of CPUs, in 32 bit groups"""
+    mask = 0
+    for cpu in cpus:
+        mask |= 1 << cpu
+    groups = []
+    while True:
+        groups.insert(0, "%08x" % (mask & 0xffffffff))
+        mask >>= 32
+        if not mask:
+            break
+    return ",".join(groups)
+
+def build_filter(fields, pids=(), comms=()):
+    """Get the filter of an event on some tasks, given its payload fields
+
+    Returns None if the event does not report any task."""
+    terms = []
+    for field in fields:
+        if field in PID_FIELDS:
+            terms.extend("%s == %d" % (field, pid) for pid in pids)
+        if field in COMM_FIELDS:
+            terms.extend('%s == "%s"' % (field, comm) for comm in comms)
+    if not terms:
+        return None
+    return " || ".join(terms)
+
+class TraceControl():
+    def __init__(self, tracing=None):
+        self.tracing = tracing or default_tracing()
+        self.cpus = sorted(int(d[3:]) for d in os.listdir(self.path("per_cpu"))
+                if re.match(r"cpu\d+$", d))
+
+    def path(self, *names):
+        return os.path.join(self.tracing, *names)
+
+    def read(self, *names):
+        with open(self.path(*names)) as fin:
+            return fin.read()
+
+    def write(self, value, *names):
+        with open(self.path(*names), "w") as fout:
+            fout.write(value + "\n")
+
+    def events(self, specs):
+        """Get the (system, event) of a list of "system:event" specs
+
+        Events can be globbed by "system:" or "system:*", while a bare event
+        name is searched into all the systems, as set_event does."""
+        events = []
+        for spec in specs:
+            (system, sep, event) = spec.partition(":")
+            if not sep:
+                found = [(s, spec) for s in sorted(os.listdir(self.path("events")))
+                        if os.path.isfile(self.path("events", s, spec, "format"))]
+                if not found:
+                    raise ValueError("Unknown event [%s]" % spec)
+                events.extend(found)
+            elif event in ("", "*"):
+                path = self.path("events", system)
+                events.extend((system, e) for e in sorted(os.listdir(path))
+                        if os.path.isfile(os.path.join(path, e, "format")))
+            else:
+                events.append((system, event))
+        return events
+
+    def fields(self, system, event):
+        """Get the payload fields of an event"""
+        fields = []
+        for line in self.read("events", system, event, "format").splitlines():
+            match = FORMAT_FIELD.search(line)
+            if match and not match.group(1).startswith("common_"):
+                fields.append(match.group(1))
+        return fields
+
+    ############################################################################
+    # State save and restore
+    ############################################################################
+
+    def save(self):
+        """Get the current tracing state"""
+        filters = {}
+        for line in self.read("set_event").split():
+            (system, sep, event) = line.partition(":")
+            text = self.read("events", system, event, "filter").strip()
+            if text != "none":
+                filters[line] = text
+        return {
+            "set_event":       self.read("set_event").split(),
+            "filters":         filters,
+            "tracing_cpumask": self.read("tracing_cpumask").strip(),
+            "current_tracer":  self.read("current_tracer").strip(),
+            "tracing_on":      self.read("tracing_on").strip(),
+            "buffer_size_kb":  dict(("%d" % cpu, self.read("per_cpu", "cpu%d" % cpu,
+                "buffer_size_kb").split()[0]) for cpu in self.cpus),
+        }
+
+    def restore(self, state):
+        """Restore a tracing state"""
+        self.write("0", "tracing_on")
+        self.write("", "set_event")
+        for (spec, text) in state["filters"].items():
+            (system, sep, event) = spec.partition(":")
+            self.write(text, "events", system, event, "filter")
+        for spec in state["set_event"]:
+            (system, sep, event) = spec.partition(":")
+            if spec not in state["filters"]:
+                self.write("0", "events", system, event, "filter")
+        self.write("\n".join(state["set_event"]), "set_event")
+        self.write(state["tracing_cpumask"], "tracing_cpumask")
+        self.write(state["current_tracer"], "current_tracer")
+        for (cpu, size) in state["buffer_size_kb"].items():
+            self.write(size, "per_cpu", "cpu%s" % cpu, "buffer_size_kb")
+        self.write(state["tracing_on"], "tracing_on")
+
+    ############################################################################
+    # Events and buffers setup
+    ############################################################################
+
+    def set_events(self, specs, pids=(), comms=()):
+        """Enable some events, filtered on the benchmark tasks if given"""
+        events = self.events(specs)
+        self.write("", "set_event")
+        for (system, event) in events:
+            text = None
+            if (pids or comms) and event not in UNFILTERED:
+                text = build_filter(self.fields(system, event), pids, comms)
+            # Writing 0 clears a previous filter
+            self.write(text or "0", "events", system, event, "filter")
+            logging.debug("Event %s:%s filter: %s", system, event, text)
+        self.write("\n".join("%s:%s" % e for e in events), "set_event")
+        return events
+
+    def set_cpus(self, cpus):
+        self.write(cpumask(cpus), "tracing_cpumask")
+
+    def get_bytes(self, cpus):
+        """Get the bytes of the events traced by each CPU"""
+        result = {}
+        for cpu in cpus:
+            stats = {}
+            for line in self.read("per_cpu", "cpu%d" % cpu, "stats").splitlines():
+                (key, sep, value) = line.partition(":")
+                stats[key.strip()] = value.strip()
+            # The bytes of the overwritten events are estimated from the
+            # entries ones
+            size = int(stats.get("bytes", 0))
+            entries = int(stats.get("entries", 0))
+            overrun = int(stats.get("overrun", 0))
+            if (entries and overrun):
+                size += size * overrun // entries
+            result[cpu] = size
+        return result
+
+    def calibrate(self, cpus, seconds, workload=None):
+        """Measure the event rate of each CPU [bytes/s]
+
+        The rate is measured while a workload runs, if given, for at most the
+        specified seconds; the workload (and its children) is then killed."""
+        self.write("0", "tracing_on")
+        self.write("", "trace")
+        proc = None
+        if workload:
+            proc = subprocess.Popen(workload, shell=True, preexec_fn=os.setsid)
+        self.write("1", "tracing_on")
+        start = time.time()
+        while (time.time() - start < seconds):
+            if (proc is not None and proc.poll() is not None):
+                break
+            time.sleep(min(0.1, seconds))
+        self.write("0", "tracing_on")
+        elapsed = time.time() - start
+        if (proc is not None and proc.poll() is None):
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        rates = dict((cpu, size / elapsed)
+                for (cpu, size) in self.get_bytes(cpus).items())
+        self.write("", "trace")
+        return rates
+
+    def set_buffers(self, rates, duration):
+        """Size the buffer of each CPU to hold the events of a duration"""
+        sizes = {}
+        for (cpu, rate) in rates.items():
+            size = int(rate * duration * BUFFER_MARGIN / 1024)
+            sizes[cpu] = min(max(size, BUFFER_MIN_KB), BUFFER_MAX_KB)
+            self.write("%d" % sizes[cpu], "per_cpu", "cpu%d" % cpu, "buffer_size_kb")
+        return sizes
+
+    def setup(self, specs, cpus=None, pids=(), comms=(), calibrate=1.0, duration=60,
+            workload=None):
+        """Setup the filtered events, CPUs and buffers of a test
+
+        Without a calibration, buffers are given the minimum size."""
+        cpus = cpus or self.cpus
+        self.set_cpus(cpus)
+        events = self.set_events(specs, pids, comms)
+        if calibrate:
+            rates = self.calibrate(cpus, calibrate, workload)
+        else:
+            rates = dict((cpu, 0.0) for cpu in cpus)
+        sizes = self.set_buffers(rates, duration)
+        return (events, rates, sizes)
+
+################################################################################
+#   Main
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    tracing = None
+    state = None
+    specs = ["sched:*"]
+    cpus = None
+    comms = []
+    pids = []
+    calibrate = 1.0
+    duration = 60.0
+    workload = None
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "c:d:e:hk:n:p:s:t:w:",
+                    ["cpus=", "duration=", "events=", "help", "calibrate=",
+                     "comms=", "pids=", "state=", "tracing=", "workload="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-c", "--cpus"):
+                cpus = parse_cpus(a.replace(" ", ","))
+            if o in ("-d", "--duration"):
+                duration = float(a)
+            if o in ("-e", "--events"):
+                specs = a.split()
+            if o in ("-k", "--calibrate"):
+                calibrate = float(a)
+            if o in ("-n", "--comms"):
+                comms = a.split()
+            if o in ("-p", "--pids"):
+                pids = [int(p) for p in a.split()]
+            if o in ("-s", "--state"):
+                state = a
+            if o in ("-t", "--tracing"):
+                tracing = a
+            if o in ("-w", "--workload"):
+                workload = a
+        if len(args) != 1 or args[0] not in ("save", "restore", "setup"):
+            raise Usage("one of save, restore or setup is required")
+        if args[0] != "setup" and state is None:
+            raise Usage("the state file is required")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    control = TraceControl(tracing)
+    if args[0] == "save":
+        with open(state, "w") as fout:
+            json.dump(control.save(), fout)
+        return 0
+    if args[0] == "restore":
+        with open(state) as fin:
+            control.restore(json.load(fin))
+        return 0
+
+    (events, rates, sizes) = control.setup(specs, cpus, pids, comms, calibrate, duration,
+            workload)
+    logging.info("Tracing %d events on CPUs %s", len(events), sorted(sizes))
+    for cpu in sorted(sizes):
+        logging.info("CPU%d: %.0f bytes/s, %d KB buffer", cpu, rates.get(cpu, 0), sizes[cpu])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
@@ -0,0 +1,700 @@
+#!/usr/bin/python
+""" Trace-cmd Binary Trace Reader and Tables Dumper
+
+Licensed under the terms of the GNU GPL License version 2
+
+Decode a trace-cmd (v6) trace.dat file in a single pass and demultiplex the
+records of the events of interest into per-CPU typed columns, i.e. one numpy
+structured array per (event, CPU) built straight from the event format
+descriptions stored into the trace.
+
+The same decode is then used to dump all the tables which dump_tables.sh used
+to generate with a dedicated `trace-cmd report` pass each. Tables already
+dumped from the same trace content are restored from the trace_cache, the
+trace being decoded only if some of the required tables are missing.
+
+Usage: trace_reader.py [-c CPUS] [-b CPU_BASE] [-t TABLES] TRACEFILE
+    -c, --cpus        the CPUs to dump the per-CPU tables for (e.g. "3 4 5")
+    -b, --cpu-base    the CPU id to add to the latency records CPU
+    -t, --tables      the tables to dump (rounds bursts latencies wakeups
+                      migrations migstats)
+    -v, --verbose     report decoding statistics
+"""
+
+import os
+import sys
+import getopt
+import struct
+import mmap
+import logging
+import numpy as np
+import trace_tables
+import trace_cache
+import migration_stats
+
+################################################################################
+### Trace Format Definitions
+################################################################################
+
+# The magic at the beginning of each trace-cmd generated file
+TRACE_MAGIC = b"\027\010\104tracing"
+
+# Ring buffer event types (the type_len field of the event header)
+RB_TYPE_PADDING     = 29
+RB_TYPE_TIME_EXTEND = 30
+RB_TYPE_TIME_STAMP  = 31
+
+# Flags stored into the high bits of a data page commit field
+RB_MISSED_MASK = (1 << 30) - 1
+
+# The events which the tables are built from
+TABLE_EVENTS = (
+    "sched_switch",
+    "sched_process_latency",
+    "sched_migrate_task",
+    "sched_wakeup",
+    "sched_wakeup_new",
+    "cbs_round",
+    "cbs_burst",
+    "cpu_migrate_finish",
+)
+
+# The events each table is dumped from, at least one of each group being
+# required into the trace
+TABLE_REQUIRES = {
+    "rounds":     (("cbs_round",),),
+    "bursts":     (("cbs_burst",),),
+    "latencies":  (("sched_process_latency",),),
+    "wakeups":    (("sched_switch",), ("sched_wakeup", "sched_wakeup_new")),
+    "migrations": (("sched_migrate_task",),),
+    "migstats":   (("sched_migrate_task",),),
+}
+
+# The version of the dumped tables, to be bumped on each change of their
+# content, which invalidates the tables cached by previous versions
+TABLES_VERSION = 1
+
+class TraceError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+
+################################################################################
+### Events Format Parsing
+################################################################################
+
+class EventFormat():
+    def __init__(self, system, text, endian):
+        """Parse the format description of an event"""
+        self.system = system
+        self.name   = ""
+        self.id     = -1
+        # The (name, offset, size, signed, kind) of each field
+        self.fields = []
+
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("name:"):
+                self.name = line.split(":", 1)[1].strip()
+                continue
+            if line.startswith("ID:"):
+                self.id = int(line.split(":", 1)[1])
+                continue
+            if not line.startswith("field:"):
+                continue
+            attrs = {}
+            for attr in line.split(";"):
+                if ":" not in attr:
+                    continue
+                (key, value) = attr.split(":", 1)
+                attrs[key.strip()] = value.strip()
+            decl = attrs["field"]
+            name = decl.split()[-1]
+            kind = "int"
+            if "[" in name:
+                name = name[:name.index("[")]
+                kind = "string" if "char" in decl.split()[:-1] else "array"
+            if decl.startswith("__data_loc"):
+                kind = "dynamic"
+            self.fields.append((name,
+                int(attrs["offset"]), int(attrs["size"]),
+                int(attrs.get("signed", "0")), kind))
+
+        self.dtype = self._build_dtype(endian)
+        self.size  = self.dtype.itemsize
+
+    def _build_dtype(self, endian):
+        """Build the numpy record type mapping the event payload"""
+        names, formats, offsets = [], [], []
+        size = 0
+        for (name, offset, fsize, signed, kind) in self.fields:
+            if kind == "string":
+                fmt = "S%d" % fsize
+            elif kind == "int" and fsize in (1, 2, 4, 8):
+                fmt = "%s%s%d" % (endian, "i" if signed else "u", fsize)
+            elif kind == "dynamic":
+                fmt = "%su4" % endian
+            else:
+                fmt = "V%d" % fsize
+            names.append(name)
+            formats.append(fmt)
+            offsets.append(offset)
+            size = max(size, offset + fsize)
+        return np.dtype({
+            "names"    : names,
+            "formats"  : formats,
+            "offsets"  : offsets,
+            "itemsize" : size,
+        })
+
+    def payload_fields(self):
+        """Get the names of the event specific fields, in declaration order"""
+        return [f[0] for f in self.fields if not f[0].startswith("common_")]
+
+
+################################################################################
+### Trace Reader
+################################################################################
+
+class TraceReader():
+    def __init__(self, path, events=TABLE_EVENTS):
+        """Open a trace and parse its headers"""
+        self.path    = path
+        self.wanted  = events
+        # Event formats by id and by name
+        self.formats = {}
+        self.events  = {}
+        # PID to command name mapping
+        self.cmdlines = {}
+        # Decoded records: (event, cpu) => (timestamps, records)
+        self.columns = {}
+        # Decoding statistics
+        self.records = 0
+        self.missed  = 0
+
+        self.fdata = open(path, "rb")
+        self._parse_headers()
+
+    def __del__(self):
+        self.fdata.close()
+
+    ############################################################################
+    # Headers parsing
+    ############################################################################
+
+    def _read(self, size):
+        data = self.fdata.read(size)
+        if len(data) != size:
+            raise TraceError("Truncated trace [%s]" % self.path)
+        return data
+
+    def _read_int(self, size):
+        fmt = {2: "H", 4: "I", 8: "Q"}[size]
+        return struct.unpack(self.endian + fmt, self._read(size))[0]
+
+    def _read_string(self):
+        chars = []
+        while True:
+            c = self._read(1)
+            if c == b"\0":
+                break
+            chars.append(c)
+        return b"".join(chars).decode("latin-1")
+
+    def _read_section(self, size_bytes):
+        return self._read(self._read_int(size_bytes)).decode("latin-1")
+
+    def _parse_headers(self):
+        if self._read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise TraceError("Not a trace-cmd trace [%s]" % self.path)
+        self.version = self._read_string()
+        if self.version != "6":
+            raise TraceError("Unsupported trace version [%s]" % self.version)
+        self.endian = ">" if self._read(1) != b"\0" else "<"
+        self.long_size = struct.unpack("B", self._read(1))[0]
+        self.page_size = self._read_int(4)
+
+        # Data pages header, to get the commit field geometry
+        if self._read(12) != b"header_page\0":
+            raise TraceError("Missing page header [%s]" % self.path)
+        header_page = EventFormat("header", self._read_section(8), self.endian)
+        self.page_fields = dict((f[0], f) for f in header_page.fields)
+        if self._read(13) != b"header_event\0":
+            raise TraceError("Missing event header [%s]" % self.path)
+        self._read_section(8)
+
+        # FTrace internal events
+        for i in range(self._read_int(4)):
+            self._read_section(8)
+
+        # Events formats
+        for s in range(self._read_int(4)):
+            system = self._read_string()
+            for e in range(self._read_int(4)):
+                fmt = EventFormat(system, self._read_section(8), self.endian)
+                self.formats[fmt.id] = fmt
+                self.events[fmt.name] = fmt
+
+        # Kernel symbols and printk formats
+        self._read_section(4)
+        self._read_section(4)
+
+        # Tasks command names
+        for line in self._read_section(8).splitlines():
+            if not line.strip():
+                continue
+            (pid, comm) = line.split(None, 1)
+            self.cmdlines[int(pid)] = comm
+
+        self.cpus = self._read_int(4)
+
+        # Options, up to the data section
+        tag = self._read(10)
+        if tag == b"options  \0":
+            while self._read_int(2):
+                self._read(self._read_int(4))
+            tag = self._read(10)
+        if tag != b"flyrecord\0":
+            raise TraceError("Unsupported trace data [%s]" % tag.rstrip(b"\0"))
+        self.buffers = []
+        for cpu in range(self.cpus):
+            offset = self._read_int(8)
+            size   = self._read_int(8)
+            self.buffers.append((offset, size))
+
+    ############################################################################
+    # Data pages decoding
+    ############################################################################
+
+    def parse(self):
+        """Decode all the CPUs buffers in a single pass"""
+        wanted = dict((fmt.id, fmt) for fmt in self.formats.values()
+                if fmt.name in self.wanted)
+
+        # Page header geometry
+        (_, commit_offset, commit_size, _, _) = self.page_fields["commit"]
+        data_offset = self.page_fields["data"][1]
+        u16 = struct.Struct(self.endian + "H").unpack_from
+        u32 = struct.Struct(self.endian + "I").unpack_from
+        u64 = struct.Struct(self.endian + "Q").unpack_from
+        commit_fmt = struct.Struct(self.endian +
+                {4: "I", 8: "Q"}[commit_size]).unpack_from
+        if self.endian == "<":
+            type_len_of = lambda h: h & 0x1f
+            delta_of    = lambda h: h >> 5
+        else:
+            type_len_of = lambda h: h >> 27
+            delta_of    = lambda h: h & 0x7ffffff
+
+        fmap = mmap.mmap(self.fdata.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for cpu in range(self.cpus):
+            (offset, size) = self.buffers[cpu]
+            timestamps = dict((eid, []) for eid in wanted)
+            payloads   = dict((eid, []) for eid in wanted)
+
+            for page in range(offset, offset + size, self.page_size):
+                ts = u64(fmap, page)[0]
+                commit = commit_fmt(fmap, page + commit_offset)[0]
+                if commit & ~RB_MISSED_MASK:
+                    self.missed += 1
+                pos = page + data_offset
+                end = pos + (commit & RB_MISSED_MASK)
+
+                while pos < end:
+                    header = u32(fmap, pos)[0]
+                    type_len = type_len_of(header)
+                    delta = delta_of(header)
+                    if type_len == RB_TYPE_PADDING:
+                        if delta == 0:
+                            break
+                        ts += delta
+                        pos += 4 + u32(fmap, pos + 4)[0]
+                        continue
+                    if type_len == RB_TYPE_TIME_EXTEND:
+                        ts += (u32(fmap, pos + 4)[0] << 27) + delta
+                        pos += 8
+                        continue
+                    if type_len == RB_TYPE_TIME_STAMP:
+                        ts = (u32(fmap, pos + 4)[0] << 27) + delta
+                        pos += 8
+                        continue
+                    ts += delta
+                    if type_len == 0:
+                        length = u32(fmap, pos + 4)[0] - 4
+                        start = pos + 8
+                    else:
+                        length = type_len * 4
+                        start = pos + 4
+                    pos = start + length
+
+                    self.records += 1
+                    eid = u16(fmap, start)[0]
+                    if eid not in wanted:
+                        continue
+                    timestamps[eid].append(ts)
+                    payloads[eid].append(
+                        fmap[start:start+wanted[eid].size].ljust(
+                            wanted[eid].size, b"\0"))
+
+            for (eid, fmt) in wanted.items():
+                self.columns[(fmt.name, cpu)] = (
+                    np.array(timestamps[eid], dtype=np.uint64),
+                    np.frombuffer(b"".join(payloads[eid]), dtype=fmt.dtype))
+
+        fmap.close()
+        logging.debug("Decoded %d records from %d CPUs (%d pages with missed events)",
+                self.records, self.cpus, self.missed)
+        return self
+
+    ############################################################################
+    # Decoded data access
+    ############################################################################
+
+    def has_event(self, event):
+        return event in self.events
+
+    def fields(self, event):
+        """Get the payload field names of an event, in declaration order"""
+        return self.events[event].payload_fields()
+
+    def get(self, event, cpus=None):
+        """Get the (timestamps, cpus, records) of an event in time order
+
+        Records are merged across the specified CPUs (all by default), ties
+        being broken by CPU id as `trace-cmd report` does."""
+        if event not in self.events:
+            return (np.zeros(0, np.uint64), np.zeros(0, np.int32),
+                    np.zeros(0, np.dtype([])))
+        if cpus is None:
+            cpus = range(self.cpus)
+        chunks = [(cpu,) + self.columns.get((event, cpu), (
+                    np.zeros(0, np.uint64),
+                    np.zeros(0, self.events[event].dtype)))
+                for cpu in cpus]
+        ts   = np.concatenate([c[1] for c in chunks])
+        cpu  = np.concatenate([np.repeat(np.int32(c[0]), len(c[1])) for c in chunks])
+        recs = np.concatenate([c[2] for c in chunks])
+        order = np.argsort(ts, kind="mergesort")
+        return (ts[order], cpu[order], recs[order])
+
+    def task(self, pid):
+        """Get the trace-cmd like "comm-pid" label of a task"""
+        if pid == 0:
+            return "<idle>-0"
+        return "%s-%d" % (self.cmdlines.get(pid, "<...>"), pid)
+
+    def tasks(self, pids):
+        """Get the labels of an array of PIDs"""
+        labels = dict((pid, self.task(pid)) for pid in np.unique(pids))
+        return [labels[pid] for pid in pids]
+
+
+def seconds(ts):
+    """Convert nanoseconds timestamps into trace-cmd reported seconds"""
+    return (ts // 1000) / 1e6
+
+def strings(values):
+    """Decode a column of fixed size strings"""
+    return [v.decode("latin-1") for v in values]
+
+
+################################################################################
+### Tables Dumping
+################################################################################
+
+def dump_rounds(trace, cpu, fname):
+    """Dump the CBS rounds table of a CPU"""
+    (ts, _, recs) = trace.get("cbs_round", [cpu])
+    columns = dict(zip(
+        [c[0] for c in trace_tables.SCHEMAS["rounds"]["columns"][2:]],
+        [recs[f] for f in trace.fields("cbs_round")[:14]]))
+    columns["Round"] = np.arange(1, len(ts)+1)
+    columns["Time"]  = seconds(ts)
+    trace_tables.write_table(fname, "rounds", columns)
+
+def dump_bursts(trace, cpu, fname):
+    """Dump the CBS bursts table of a CPU"""
+    (ts, _, recs) = trace.get("cbs_burst", [cpu])
+    columns = dict(zip(
+        [c[0] for c in trace_tables.SCHEMAS["bursts"]["columns"][3:]],
+        [recs[f] for f in trace.fields("cbs_burst")[:11]]))
+    columns["Burst"] = np.arange(1, len(ts)+1)
+    columns["Task"]  = trace.tasks(recs["common_pid"])
+    columns["Time"]  = seconds(ts)
+    trace_tables.write_table(fname, "bursts", columns)
+
+def cluster_switches(trace):
+    """Get the (timestamps, CPU base) of the IKS cluster switches"""
+    (ts, _, recs) = trace.get("cpu_migrate_finish")
+    if not len(ts):
+        return (ts, np.zeros(0, np.int32))
+    switcher = np.array([trace.cmdlines.get(pid, "").startswith("kswitcher_0")
+        for pid in recs["common_pid"]], dtype=bool)
+    target = recs[trace.fields("cpu_migrate_finish")[1]][switcher]
+    # Targets below 0x100 are the [big] cluster CPUs
+    return (ts[switcher], np.where(target < 0x100, 0, 4).astype(np.int32))
+
+def cluster_bases(trace, ts, cpu_base=0):
+    """Get the CPU base of the cluster running at each timestamp"""
+    (sw_ts, sw_base) = cluster_switches(trace)
+    bases = np.concatenate(([cpu_base], sw_base))
+    return bases[np.searchsorted(sw_ts, ts, side="right")]
+
+def dump_latencies(trace, fname, cpu_base=0):
+    """Dump the scheduling latency table of all the CPUs"""
+    (ts, cpus, recs) = trace.get("sched_process_latency")
+    (delay, slice) = [recs[f] for f in trace.fields("sched_process_latency")[:2]]
+
+    # Account for IKS cluster switches, which are reported as comments
+    (sw_ts, sw_base) = cluster_switches(trace)
+    splits = np.searchsorted(ts, sw_ts)
+    comments = {}
+    for (i, split) in enumerate(splits):
+        comments.setdefault(split, []).extend([
+            "#" * 80 + "\n",
+            "# kswitcher_0 cpu_migrate_finish @ %.6f\n" % seconds(sw_ts[i]),
+            "# Switched to [%s] cluster\n" % ("big" if sw_base[i] == 0 else "LITTLE"),
+        ])
+
+    trace_tables.write_table(fname, "latencies", {
+        "Burst" : np.arange(1, len(ts)+1),
+        "Task"  : trace.tasks(recs["common_pid"]),
+        "Time"  : seconds(ts),
+        "Delay" : delay,
+        "Slice" : slice,
+        "CPU"   : cpus + cluster_bases(trace, ts, cpu_base),
+    }, comments)
+
+def wakeup_latencies(wakeups, switch_ins, switch_outs):
+    """Pair each wakeup with the following switch-in of the same task
+
+    Given the timestamps and PIDs of the wakeups, switch-ins and switch-outs,
+    returns the (switch-in, delay, slice) of each switch-in which follows a
+    wakeup, its delay being from the first wakeup since the task has last been
+    switched out, and its slice up to the task next switch-out (0 if not
+    traced). Switch-ins without a wakeup, e.g. after a preemption, are not
+    reported.
+
+    Rather than updating a per-PID state table event by event, the events of
+    all the tasks are sorted just once, by PID and time, and each one is
+    paired with the state of its task, i.e. the previous event of its PID."""
+    (ts, pids, kinds, index) = [np.concatenate(c) for c in zip(*[
+        (t, p, np.repeat(np.int8(k), len(t)), np.arange(len(t)))
+        # Switch-outs go first at the same time, then wakeups and switch-ins
+        for (k, (t, p)) in enumerate((switch_outs, wakeups, switch_ins))])]
+    # Events are merged in time order, then grouped by PID by a stable sort
+    order = np.argsort(ts.astype(np.uint64) * 3 + kinds.astype(np.uint64), kind="mergesort")
+    order = order[np.argsort(pids[order], kind="mergesort")]
+    (ts, pids, kinds, index) = (ts[order], pids[order], kinds[order], index[order])
+    same = np.zeros(len(ts), bool)
+    same[1:] = (pids[1:] == pids[:-1])
+
+    (OUT, WAKEUP, IN) = range(3)
+    # The first wakeups of a sleeping task, i.e. not after another wakeup
+    first = (kinds == WAKEUP) & ~(same & (np.roll(kinds, 1) == WAKEUP))
+    # The last first wakeup of each event, which is of the same PID when the
+    # event follows a wakeup
+    last = np.maximum.accumulate(np.where(first, np.arange(len(ts)), 0))
+    woken = (kinds == IN) & same & (np.roll(kinds, 1) == WAKEUP)
+    delay = (ts - ts[last])[woken]
+
+    # The slice ends with the next event of the task, if a switch-out
+    after = np.zeros(len(ts), bool)
+    after[:-1] = same[1:] & (kinds[1:] == OUT)
+    slice = np.where(after, np.roll(ts, -1) - ts, 0)[woken]
+    return (index[woken], delay.astype(np.int64), slice.astype(np.int64))
+
+def dump_wakeup_latencies(trace, fname, cpu_base=0):
+    """Dump the latencies from the wakeup to the switch-in of each task
+
+    The table has the same layout of the sched_process_latency one, but it is
+    built from the stock sched_wakeup(_new) and sched_switch events."""
+    (w_ts, w_pids) = (np.zeros(0, np.uint64), np.zeros(0, np.int32))
+    for event in ("sched_wakeup", "sched_wakeup_new"):
+        (ts, _, recs) = trace.get(event)
+        if not len(ts):
+            continue
+        # Wakeups of tasks already running are not successful on older kernels
+        if "success" in trace.fields(event):
+            (ts, recs) = (ts[recs["success"] != 0], recs[recs["success"] != 0])
+        (w_ts, w_pids) = (np.concatenate((w_ts, ts)), np.concatenate((w_pids, recs["pid"])))
+    if trace.has_event("sched_switch"):
+        (ts, cpus, recs) = trace.get("sched_switch")
+    else:
+        logging.warning("No sched_switch events to pair the wakeups with")
+        (ts, cpus, recs) = (np.zeros(0, np.uint64), np.zeros(0, np.int32),
+                np.zeros(0, [("prev_pid", "i4"), ("next_pid", "i4")]))
+    # The idle tasks are not woken up
+    (switch_in, switch_out) = (recs["next_pid"] != 0, recs["prev_pid"] != 0)
+    (index, delay, slice) = wakeup_latencies((w_ts, w_pids),
+            (ts[switch_in], recs["next_pid"][switch_in]),
+            (ts[switch_out], recs["prev_pid"][switch_out]))
+
+    # Latencies are reported in switch-in order
+    order = np.argsort(index)
+    (index, delay, slice) = (index[order], delay[order], slice[order])
+    (ts, cpus, pids) = (ts[switch_in][index], cpus[switch_in][index],
+            recs["next_pid"][switch_in][index])
+    trace_tables.write_table(fname, "latencies", {
+        "Burst" : np.arange(1, len(ts)+1),
+        "Task"  : trace.tasks(pids),
+        "Time"  : seconds(ts),
+        "Delay" : delay,
+        "Slice" : slice,
+        "CPU"   : cpus + cluster_bases(trace, ts, cpu_base),
+    })
+
+def dump_migrations(trace, cpu, fname):
+    """Dump the migrations in and out of a CPU"""
+    (ts, _, recs) = trace.get("sched_migrate_task", [cpu])
+    src = recs["orig_cpu"]
+    dst = recs["dest_cpu"]
+    # Consider only migrations in or out the current CPU, across CPUs
+    keep = ((src == cpu) | (dst == cpu)) & (src != dst)
+    times = seconds(ts[keep])
+    # The first migration is just the reference for the deltas
+    trace_tables.write_table(fname, "migrations", {
+        "Count" : np.arange(1, len(times)),
+        "Task"  : strings(recs["comm"][keep][1:]),
+        "IO"    : np.where(src[keep][1:] == cpu, "out", "in"),
+        "Time"  : times[1:],
+        "Delta" : np.diff(times),
+        "Src"   : src[keep][1:],
+        "Dst"   : dst[keep][1:],
+    })
+
+def dump_migstats(trace, fname):
+    """Dump the analysis of the migrations of all the CPUs"""
+    (ts, _, recs) = trace.get("sched_migrate_task")
+    migrations = migration_stats.Migrations(ts, recs["pid"],
+            recs["orig_cpu"], recs["dest_cpu"], trace.cpus)
+    labels = dict((pid, "%s-%d" % (comm.decode("latin-1"), pid))
+            for (pid, comm) in zip(recs["pid"], recs["comm"]))
+    with open(fname, "w") as fout:
+        fout.writelines(migrations.report(labels))
+
+def dump_tables(trace_file, cpus, tables, cpu_base=0):
+    """Dump the required tables from a single decode of a trace"""
+    table_file = trace_file.replace("_trace_", "_table_")
+
+    # The (file, dumper, parameters) of each required table
+    dumps = []
+    if "latencies" in tables:
+        dumps.append((table_file.replace(".dat", "_Call_latencies.dat"),
+            lambda trace, fname: dump_latencies(trace, fname, cpu_base),
+            ("latencies", cpu_base)))
+    if "wakeups" in tables:
+        dumps.append((table_file.replace(".dat", "_Call_wakeup_latencies.dat"),
+            lambda trace, fname: dump_wakeup_latencies(trace, fname, cpu_base),
+            ("wakeups", cpu_base)))
+    if "migstats" in tables:
+        dumps.append((table_file.replace(".dat", "_Call_migstats.dat"),
+            dump_migstats, ("migstats",)))
+    for cpu in cpus:
+        cpu_file = table_file.replace(".dat", "_C%02d" % cpu)
+        if "rounds" in tables:
+            dumps.append((cpu_file + "_rounds.dat",
+                lambda trace, fname, cpu=cpu: dump_rounds(trace, cpu, fname),
+                ("rounds", cpu)))
+        if "bursts" in tables:
+            dumps.append((cpu_file + "_bursts.dat",
+                lambda trace, fname, cpu=cpu: dump_bursts(trace, cpu, fname),
+                ("bursts", cpu)))
+        if "migrations" in tables:
+            dumps.append((cpu_file + "_migrations.dat",
+                lambda trace, fname, cpu=cpu: dump_migrations(trace, cpu, fname),
+                ("migrations", cpu)))
+
+    # Tables are restored from the cache, if dumped from the same trace
+    # content, and the trace is decoded only for the missing ones. Tables
+    # whose events are not in the trace (e.g. the CBS ones, on a stock
+    # kernel) are skipped
+    trace = TraceReader(trace_file)
+    decoded = False
+    digest = trace_cache.file_digest(trace_file)
+    for (fname, dump, params) in dumps:
+        missing = [" or ".join(group) for group in TABLE_REQUIRES[params[0]]
+                if not any(trace.has_event(event) for event in group)]
+        if missing:
+            logging.warning("Skipped [%s]: missing %s events", fname, ", ".join(missing))
+            continue
+        key = trace_cache.cache_key([digest], TABLES_VERSION,
+                os.path.basename(fname), *params)
+        if trace_cache.fetch(key, os.path.dirname(fname) or "."):
+            logging.debug("Restored [%s] from cache", fname)
+            continue
+        if not decoded:
+            trace.parse()
+            decoded = True
+        dump(trace, fname)
+        # Reports (e.g. migstats) have no columnar format
+        trace_cache.store(key, [f for f in (fname, trace_tables.columnar_path(fname))
+            if os.path.exists(f)])
+
+    return trace if decoded else None
+
+
+################################################################################
+### Main and Command Line Processing
+################################################################################
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    cpus = [3]
+    tables = ("rounds", "bursts", "latencies", "wakeups", "migrations", "migstats")
+    cpu_base = 0
+    verbose = 0
+
+    if argv is None:
+        argv = sys.argv
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "hb:c:t:v",
+                    ["help", "cpu-base=", "cpus=", "tables=", "verbose"])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                print(__doc__)
+                return 0
+            if o in ("-b", "--cpu-base"):
+                cpu_base = int(a)
+                continue
+            if o in ("-c", "--cpus"):
+                cpus = [int(c) for c in a.split()]
+                continue
+            if o in ("-t", "--tables"):
+                tables = a.split()
+                continue
+            if o in ("-v", "--verbose"):
+                verbose = 1
+                continue
+        if len(args) != 1:
+            raise Usage("A single trace file is required")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    if (verbose):
+        logging.basicConfig(format="%(asctime)s %(message)s", level=logging.DEBUG)
+    else:
+        logging.basicConfig(format="WARNING: %(message)s", level=logging.WARNING)
+
+    try:
+        dump_tables(args[0], cpus, tables, cpu_base)
+    except TraceError as err:
+        sys.stderr.write("ERROR: %s\n" % err.msg)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
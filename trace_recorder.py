@@ -0,0 +1,308 @@
+#!/usr/bin/python
+""" Streaming Per-CPU FTrace Recorder
+
+Licensed under the terms of the GNU GPL License version 2
+
+Record the FTrace ring buffers while a benchmark runs, rather than extracting
+them once it completes, which loses the events overwritten meanwhile when the
+buffers are not big enough.
+
+A reader thread for each CPU drains its per_cpu/cpuN/trace_pipe_raw into a
+per-CPU file: once the buffer has pages available, these are read until it is
+empty, which takes a read for each page, since trace_pipe_raw returns at most
+a page per read. Once stopped (e.g. by SIGINT or
+SIGTERM), the readers drain the pages left into the buffers, and the per-CPU
+files are assembled into a trace-cmd (v6) trace.dat, with the headers, event
+formats and command names read from the same tracing folder. Such a trace
+can be decoded both by trace-cmd and by trace_reader.py.
+
+The overrun and dropped events counts of each CPU, reported by its
+per_cpu/cpuN/stats, are reported once the recording completes: events are
+lost only when these are not zero.
+
+Any folder with the same layout as the tracing one can be recorded too, e.g.
+to check the recorder against fixture pages.
+
+Usage: trace_recorder.py [-t TRACING] [-c CPUS] [-p PAGES] [-k] OUTPUT
+
+  -t, --tracing  the tracing folder (default: /sys/kernel/debug/tracing)
+  -c, --cpus     the CPUs to record (default: all the per_cpu ones)
+  -p, --pages    the maximum number of pages of each read (default: 64),
+                 which trace_pipe_raw returns at most a page of
+  -k, --keep     keep the per-CPU files (OUTPUT.cpuN)
+"""
+
+import os
+import re
+import sys
+import mmap
+import time
+import errno
+import select
+import signal
+import struct
+import getopt
+import logging
+import threading
+
+# The tracing folder, also mounted on its own by newer kernels
+TRACING = "/sys/kernel/debug/tracing"
+TRACING_FS = "/sys/kernel/tracing"
+
+# The magic at the beginning of each trace-cmd generated file
+TRACE_MAGIC = b"\027\010\104tracing"
+
+# The time to wait for new pages when a buffer is empty [s]
+POLL_TIMEOUT = 0.1
+
+def default_tracing():
+    if os.path.isdir(TRACING) or not os.path.isdir(TRACING_FS):
+        return TRACING
+    return TRACING_FS
+
+def read_file(fname, default=b""):
+    try:
+        with open(fname, "rb") as fin:
+            return fin.read()
+    except IOError:
+        return default
+
+def read_stats(tracing, cpu):
+    """Get the counters of the per_cpu/cpuN/stats of a CPU"""
+    stats = {}
+    text = read_file(os.path.join(tracing, "per_cpu", "cpu%d" % cpu, "stats"))
+    for line in text.decode("latin-1").splitlines():
+        (key, sep, value) = line.partition(":")
+        try:
+            stats[key.strip()] = int(value)
+        except ValueError:
+            pass
+    return stats
+
+class CpuReader(threading.Thread):
+    def __init__(self, tracing, cpu, fname, chunk):
+        threading.Thread.__init__(self, name="cpu%d" % cpu)
+        self.daemon = True
+        self.cpu = cpu
+        self.fname = fname
+        self.chunk = chunk
+        self.size = 0
+        self.stopping = threading.Event()
+        self.fd = os.open(os.path.join(tracing, "per_cpu", "cpu%d" % cpu,
+            "trace_pipe_raw"), os.O_RDONLY | os.O_NONBLOCK)
+
+    def drain(self, fout):
+        """Copy all the pages available, returning False if there are none"""
+        copied = False
+        while True:
+            try:
+                data = os.read(self.fd, self.chunk)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    return copied
+                raise
+            if not data:
+                return copied
+            fout.write(data)
+            self.size += len(data)
+            copied = True
+
+    def run(self):
+        with open(self.fname, "wb") as fout:
+            while not self.stopping.is_set():
+                if not self.drain(fout):
+                    # Wait for new pages, or a timeout to check for stopping
+                    (ready, _, _) = select.select([self.fd], [], [], POLL_TIMEOUT)
+                    if ready and not self.drain(fout):
+                        time.sleep(POLL_TIMEOUT)
+            # The pages left into the buffer
+            self.drain(fout)
+        os.close(self.fd)
+
+    def stop(self):
+        self.stopping.set()
+
+class Recorder():
+    def __init__(self, output, tracing=None, cpus=None, pages=64):
+        self.output = output
+        self.tracing = tracing or default_tracing()
+        if cpus is None:
+            cpus = sorted(int(d[3:]) for d in os.listdir(os.path.join(self.tracing, "per_cpu"))
+                    if re.match(r"cpu\d+$", d))
+        # The CPUs data are assembled in CPU id order
+        self.cpus = sorted(cpus)
+        self.page_size = mmap.PAGESIZE
+        # The trace is in the host byte order, which the pages are in
+        self.endian = "<" if sys.byteorder == "little" else ">"
+        self.readers = [CpuReader(self.tracing, cpu, "%s.cpu%d" % (output, cpu),
+            pages * self.page_size) for cpu in self.cpus]
+        self.stats = {}
+
+    def start(self):
+        self.stats = dict((cpu, read_stats(self.tracing, cpu)) for cpu in self.cpus)
+        for reader in self.readers:
+            reader.start()
+
+    def stop(self):
+        """Stop the readers, once the buffers have been drained"""
+        for reader in self.readers:
+            reader.stop()
+        for reader in self.readers:
+            reader.join()
+
+    def get_lost(self):
+        """Get the (overrun, dropped) events of each CPU, since the start"""
+        lost = {}
+        for cpu in self.cpus:
+            (start, end) = (self.stats[cpu], read_stats(self.tracing, cpu))
+            lost[cpu] = tuple(end.get(key, 0) - start.get(key, 0)
+                    for key in ("overrun", "dropped events"))
+        return lost
+
+    ############################################################################
+    # trace.dat assembling
+    ############################################################################
+
+    def section(self, data, size_bytes):
+        return struct.pack(self.endian + {4: "I", 8: "Q"}[size_bytes], len(data)) + data
+
+    def event_systems(self):
+        """Get the enabled events, grouped by system"""
+        systems = {}
+        for line in read_file(os.path.join(self.tracing, "set_event")).decode("latin-1").split():
+            (system, sep, event) = line.partition(":")
+            if sep and system != "ftrace":
+                systems.setdefault(system, []).append(event)
+        return systems
+
+    def formats(self, system, events=None):
+        path = os.path.join(self.tracing, "events", system)
+        if events is None:
+            events = sorted(e for e in os.listdir(path)
+                    if os.path.isfile(os.path.join(path, e, "format")))
+        return [read_file(os.path.join(path, e, "format")) for e in events]
+
+    def headers(self):
+        """Get the headers of the trace, up to the CPUs data offsets"""
+        events = os.path.join(self.tracing, "events")
+        data = [TRACE_MAGIC, b"6\0",
+                struct.pack(self.endian + "BBI", int(self.endian == ">"),
+                    struct.calcsize("l"), self.page_size)]
+        data.append(b"header_page\0" + self.section(
+            read_file(os.path.join(events, "header_page")), 8))
+        data.append(b"header_event\0" + self.section(
+            read_file(os.path.join(events, "header_event")), 8))
+
+        ftrace = self.formats("ftrace") if os.path.isdir(os.path.join(events, "ftrace")) else []
+        data.append(struct.pack(self.endian + "I", len(ftrace)))
+        data.extend(self.section(fmt, 8) for fmt in ftrace)
+
+        systems = self.event_systems()
+        data.append(struct.pack(self.endian + "I", len(systems)))
+        for (system, names) in sorted(systems.items()):
+            formats = self.formats(system, None if "*" in names else names)
+            data.append(system.encode("latin-1") + b"\0" +
+                    struct.pack(self.endian + "I", len(formats)))
+            data.extend(self.section(fmt, 8) for fmt in formats)
+
+        # Kernel symbols are not required to decode the tables
+        data.append(self.section(b"", 4))
+        data.append(self.section(read_file(os.path.join(self.tracing, "printk_formats")), 4))
+        data.append(self.section(read_file(os.path.join(self.tracing, "saved_cmdlines")), 8))
+        data.append(struct.pack(self.endian + "I", max(self.cpus) + 1))
+        data.append(b"flyrecord\0")
+        return b"".join(data)
+
+    def assemble(self, keep=False):
+        """Assemble the per-CPU files into a trace.dat
+
+        The data of the CPUs not recorded are empty."""
+        headers = self.headers()
+        sizes = [0] * (max(self.cpus) + 1)
+        for reader in self.readers:
+            sizes[reader.cpu] = reader.size
+        # The CPUs data are page aligned, after their offsets and sizes
+        offset = len(headers) + 16 * len(sizes)
+        offset += -offset % self.page_size
+        with open(self.output, "wb") as fout:
+            fout.write(headers)
+            for size in sizes:
+                fout.write(struct.pack(self.endian + "QQ", offset, size))
+                offset += size + (-size % self.page_size)
+            for reader in self.readers:
+                fout.write(b"\0" * (-fout.tell() % self.page_size))
+                with open(reader.fname, "rb") as fin:
+                    block = fin.read(1 << 20)
+                    while block:
+                        fout.write(block)
+                        block = fin.read(1 << 20)
+                if not keep:
+                    os.remove(reader.fname)
+
+################################################################################
+#   Main
+################################################################################
+
+# Set by SIGINT and SIGTERM, to stop recording
+terminated = threading.Event()
+
+def terminate(signum, frame):
+    terminated.set()
+
+class Usage(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    tracing = None
+    cpus = None
+    pages = 64
+    keep = False
+    try:
+        try:
+            opts, args = getopt.getopt(argv[1:], "c:hkp:t:",
+                    ["cpus=", "help", "keep", "pages=", "tracing="])
+        except getopt.error as msg:
+            raise Usage(msg)
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                sys.stdout.write(__doc__)
+                return 0
+            if o in ("-c", "--cpus"):
+                cpus = [int(c) for c in a.replace(",", " ").split()]
+            if o in ("-k", "--keep"):
+                keep = True
+            if o in ("-p", "--pages"):
+                pages = int(a)
+            if o in ("-t", "--tracing"):
+                tracing = a
+        if len(args) != 1:
+            raise Usage("the output trace is required")
+    except Usage as err:
+        sys.stderr.write("%s\nfor help use --help\n" % err.msg)
+        return 2
+
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    signal.signal(signal.SIGINT, terminate)
+    signal.signal(signal.SIGTERM, terminate)
+
+    recorder = Recorder(args[0], tracing, cpus, pages)
+    recorder.start()
+    while not terminated.is_set():
+        terminated.wait(1)
+    recorder.stop()
+    recorder.assemble(keep)
+
+    lost = recorder.get_lost()
+    for cpu in recorder.cpus:
+        reader = recorder.readers[recorder.cpus.index(cpu)]
+        logging.info("CPU%d: %d bytes recorded, %d overrun and %d dropped events",
+                cpu, reader.size, lost[cpu][0], lost[cpu][1])
+    return 1 if any(o or d for (o, d) in lost.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4
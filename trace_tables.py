@@ -0,0 +1,314 @@
+""" Trace Tables Storage
+
+Licensed under the terms of the GNU GPL License version 2
+
+Each trace table is stored both as the usual text file, e.g.
+    cbs_table_TAG_Call_latencies.dat
+and in a typed columnar format, into a directory alongside it, e.g.
+    cbs_table_TAG_Call_latencies.col/
+        header          the JSON metadata: table, rows, columns and strings
+        <Column>.bin    the raw array of each column
+
+String columns (e.g. task names) are interned into an integer dictionary, the
+codes being stored in the column array and the dictionary in the header.
+
+Columnar tables are loaded by memory mapping just the columns being accessed,
+while text tables are parsed according to the same schemas. Both can also be
+read in fixed size chunks, to process tables of any length in bounded memory.
+"""
+
+import os
+import json
+import numpy as np
+
+################################################################################
+### Tables Schemas
+################################################################################
+
+# Column types: numpy dtypes, or "str" for interned strings
+SCHEMAS = {
+ "rounds": {
+    "title":  "# CBS Rounds\n",
+    "header": "# Round %13s %13s %8s %8s %3s %8s | %3s %8s %8s %3s %12s %12s %12s %14s %14s\n" % (
+        "Time[s]", "RQTime[ns]", "Lw" , "Rt", "Clp", "Re", "Nr", "Lw", "Rt_SP", "Sat", "Rt_corr", "Rt_cold", "Rt_next", "RStart", "REnd"),
+    "row":    " %6d %13.6f %13d %8d %8d %3s %8d | %3d %8d %8d %3s %12d %12d %12d %14d %14d\n",
+    "columns": (
+        ("Round",    "i4"),
+        ("Time",     "f8"),
+        ("RQ_time",  "i8"),
+        ("Lw_prev",  "i8"),
+        ("Rt_prev",  "i8"),
+        ("Rc_prev",  "str"),
+        ("Re_prev",  "i8"),
+        ("Nr_next",  "i8"),
+        ("Lw_next",  "i8"),
+        ("Sp_next",  "i8"),
+        ("Sa_next",  "str"),
+        ("Co_next",  "i8"),
+        ("Cd_next",  "i8"),
+        ("Rt_next",  "i8"),
+        ("Rt_start", "i8"),
+        ("Rt_end",   "i8"),
+    ),
+ },
+ "bursts": {
+    "title":  "# CBS Bursts\n",
+    "header": "# Burst %19s %13s %13s | %8s %3s %8s %8s %8s %8s %3s %8s %14s %14s\n" % (
+        "Task", "Time[s]", "SETime[ns]", "Rquota", "Rei", "Tt_SP", "Te", "Tn", "Tb", "Src", "Tt", "BStart", "BStop"),
+    "row":    " %5d %20s %13.6f %13d | %8d %3s %8d %8d %8d %8d %3s %8d %14d %14d\n",
+    "columns": (
+        ("Burst",     "i4"),
+        ("Task",      "str"),
+        ("Time",      "f8"),
+        ("SE_time",   "i8"),
+        ("Tr_quota",  "i8"),
+        ("Tb_reinit", "str"),
+        ("Tb_sp",     "i8"),
+        ("Tb_error",  "i8"),
+        ("Tb_next",   "i8"),
+        ("Tb_timer",  "i8"),
+        ("Tb_src",    "str"),
+        ("Tb",        "i8"),
+        ("Tb_start",  "i8"),
+        ("Tb_stop",   "i8"),
+    ),
+ },
+ "latencies": {
+    "title":  "# Scheduling Latency\n",
+    "header": "# %5s %25s %13s %13s %13s %3s\n" % (
+        "Burst", "Task", "Time[s]", "Delay[ns]", "Slice[ns]", "CPU"),
+    "row":    "%7d %25s %13.6f %13d %13d %3d\n",
+    "columns": (
+        ("Burst", "i4"),
+        ("Task",  "str"),
+        ("Time",  "f8"),
+        ("Delay", "i8"),
+        ("Slice", "i8"),
+        ("CPU",   "i4"),
+    ),
+ },
+ "migrations": {
+    "title":  "# Task Migrations\n",
+    "header": "# %5s %19s %3s %14s %14s %3s %3s\n" % (
+        "Count", "Task", "I/O", "Time[s]", "Delta[us]", "Src", "Dst"),
+    "row":    " %5d %20s %3s %14.6f %14.6f %03d %03d\n",
+    "columns": (
+        ("Count", "i4"),
+        ("Task",  "str"),
+        ("IO",    "str"),
+        ("Time",  "f8"),
+        ("Delta", "f8"),
+        ("Src",   "i4"),
+        ("Dst",   "i4"),
+    ),
+ },
+}
+
+def columnar_path(fname):
+    """Get the columnar directory of a text table"""
+    return os.path.splitext(fname)[0] + ".col"
+
+def intern_strings(values):
+    """Intern a sequence of strings into (codes, dictionary)"""
+    (strings, codes) = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return (codes.astype(np.int32), [str(s) for s in strings])
+
+
+################################################################################
+### Tables Writing
+################################################################################
+
+def write_table(fname, table, columns, comments=None):
+    """Write a table both in text and columnar format
+
+    The columns are a dictionary of arrays, one for each schema column, where
+    string columns are either sequences of strings or (codes, dictionary)
+    tuples. Comments are optional lists of lines to be reported in the text
+    table just before the row with the specified index."""
+    schema = SCHEMAS[table]
+    names = [c[0] for c in schema["columns"]]
+
+    # Intern string columns
+    arrays  = {}
+    strings = {}
+    for (name, ctype) in schema["columns"]:
+        values = columns[name]
+        if ctype == "str":
+            if not isinstance(values, tuple):
+                values = intern_strings(values)
+            (arrays[name], strings[name]) = values
+        else:
+            arrays[name] = np.asarray(values, dtype=ctype)
+    rows = len(arrays[names[0]])
+
+    # Text format
+    views = []
+    for name in names:
+        if name in strings:
+            views.append(np.asarray(strings[name], dtype=object)[arrays[name]]
+                    if rows else [])
+        else:
+            views.append(arrays[name].tolist())
+    with open(fname, "w") as fout:
+        fout.write(schema["title"])
+        fout.write(schema["header"])
+        start = 0
+        for stop in sorted(comments or {}) + [rows]:
+            fout.writelines(schema["row"] % values
+                    for values in zip(*[v[start:stop] for v in views]))
+            if stop < rows:
+                fout.writelines(comments[stop])
+            start = stop
+
+    # Columnar format
+    write_columnar(columnar_path(fname), table, names, arrays, strings)
+
+def write_columnar(path, table, names, arrays, strings=None):
+    """Write the columnar format of a table, given its column arrays
+
+    Tables without a schema, e.g. with columns known only at run time, can
+    be written and loaded in columnar format only."""
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for name in names:
+        arrays[name].tofile(os.path.join(path, name + ".bin"))
+    header = {
+        "table":   table,
+        "rows":    len(arrays[names[0]]) if names else 0,
+        "columns": [(name, arrays[name].dtype.str) for name in names],
+        "strings": strings or {},
+    }
+    with open(os.path.join(path, "header"), "w") as fout:
+        json.dump(header, fout)
+
+
+################################################################################
+### Tables Loading
+################################################################################
+
+class Table():
+    def __init__(self, fname, table):
+        """Open a table, preferring its columnar format when available"""
+        self.fname  = fname
+        self.table  = table
+        self.schema = SCHEMAS.get(table)
+        self.path   = columnar_path(fname)
+        self.arrays = {}
+
+        if os.path.isfile(os.path.join(self.path, "header")):
+            with open(os.path.join(self.path, "header")) as fin:
+                header = json.load(fin)
+            self.rows    = header["rows"]
+            self.names   = [name for (name, dtype) in header["columns"]]
+            self.dtypes  = dict((name, np.dtype(str(dtype)))
+                    for (name, dtype) in header["columns"])
+            self.dicts   = dict((name, [str(s) for s in strings])
+                    for (name, strings) in header["strings"].items())
+            self.mapped  = True
+        else:
+            self._parse_text()
+            self.mapped  = False
+
+    def _parse_text(self):
+        """Load a text table into typed columns"""
+        columns = self.schema["columns"]
+        self.names = [c[0] for c in columns]
+        values = [[] for c in columns]
+        with open(self.fname) as fin:
+            for line in fin:
+                if line[0] == '#':
+                    continue
+                fields = [f for f in line.split() if f != '|']
+                for (i, v) in enumerate(fields[:len(columns)]):
+                    values[i].append(v)
+        self.rows   = len(values[0])
+        self.dtypes = {}
+        self.dicts  = {}
+        for ((name, ctype), v) in zip(columns, values):
+            if ctype == "str":
+                (self.arrays[name], self.dicts[name]) = intern_strings(v) if v else \
+                        (np.zeros(0, np.int32), [])
+            else:
+                self.arrays[name] = np.array(v, dtype=ctype)
+            self.dtypes[name] = self.arrays[name].dtype
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        """Get a column, mapping it from the columnar storage on first use"""
+        if name not in self.arrays:
+            if self.rows == 0:
+                self.arrays[name] = np.zeros(0, self.dtypes[name])
+            else:
+                self.arrays[name] = np.memmap(
+                        os.path.join(self.path, name + ".bin"),
+                        dtype=self.dtypes[name], mode="r", shape=(self.rows,))
+        return self.arrays[name]
+
+    def strings(self, name):
+        """Get the dictionary of an interned string column"""
+        return self.dicts[name]
+
+    def labels(self, name):
+        """Get the decoded values of an interned string column"""
+        return np.asarray(self.dicts[name], dtype=object)[self[name]]
+
+def read_chunks(fname, table, columns, size):
+    """Read some columns of a table in chunks of (at most) size rows
+
+    Yields (chunk, dicts) tuples, where chunk maps each column into an array
+    and dicts maps each string column into its dictionary. The dictionaries
+    of text tables grow while new strings are found, previous codes being
+    preserved, thus codes are consistent across all the chunks."""
+    path = columnar_path(fname)
+    if os.path.isfile(os.path.join(path, "header")):
+        with open(os.path.join(path, "header")) as fin:
+            header = json.load(fin)
+        dtypes = dict((name, np.dtype(str(dtype)))
+                for (name, dtype) in header["columns"])
+        dicts  = dict((name, [str(s) for s in strings])
+                for (name, strings) in header["strings"].items())
+        files  = dict((name, open(os.path.join(path, name + ".bin"), "rb"))
+                for name in columns)
+        for start in range(0, header["rows"], size):
+            count = min(size, header["rows"] - start)
+            yield (dict((name, np.fromfile(files[name], dtypes[name], count))
+                for name in columns), dicts)
+        for fin in files.values():
+            fin.close()
+        return
+
+    ctypes = dict(SCHEMAS[table]["columns"])
+    index  = dict((c[0], i) for (i, c) in enumerate(SCHEMAS[table]["columns"]))
+    dicts  = dict((name, []) for name in columns if ctypes[name] == "str")
+    codes  = dict((name, {}) for name in dicts)
+    with open(fname) as fin:
+        while True:
+            values = dict((name, []) for name in columns)
+            lines = 0
+            for line in fin:
+                if line[0] == '#':
+                    continue
+                fields = [f for f in line.split() if f != '|']
+                for name in columns:
+                    values[name].append(fields[index[name]])
+                lines += 1
+                if lines == size:
+                    break
+            if lines == 0:
+                return
+            chunk = {}
+            for name in columns:
+                if name not in dicts:
+                    chunk[name] = np.array(values[name], dtype=ctypes[name])
+                    continue
+                for v in values[name]:
+                    if v not in codes[name]:
+                        codes[name][v] = len(dicts[name])
+                        dicts[name].append(v)
+                chunk[name] = np.array([codes[name][v] for v in values[name]],
+                        dtype=np.int32)
+            yield (chunk, dicts)
+
+# vim: tabstop=8 expandtab shiftwidth=4 softtabstop=4